@@ -0,0 +1,274 @@
+"""
+Pipeline and API benchmarks on synthetic data, fully offline.
+
+    python -m benchmarks.run --days 30 --locations 20
+    python -m benchmarks.run --compare benchmarks/results/a.json benchmarks/results/b.json
+
+Each benchmark is timed over `--repeat` runs, then run once more under tracemalloc
+for its peak traced allocation (Python objects and NumPy buffers; Arrow's own memory
+pool is not traced). Results go to benchmarks/results/<timestamp>.json.
+Everything runs in a throwaway working directory (the project's paths are relative),
+so the real data/ and models/ folders are never touched.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def measure(name: str, fn, repeat: int = 3, **extra) -> dict:
+    """Wall time over `repeat` runs + tracemalloc peak of one extra run."""
+    walls = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        walls.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {
+        "name": name,
+        "wall_s": {
+            "min": min(walls),
+            "median": statistics.median(walls),
+            "mean": statistics.fmean(walls),
+        },
+        "peak_mem_mb": round(peak / 2**20, 3),
+        **extra,
+    }
+    print(f"{name:<28} median={result['wall_s']['median']:.4f}s peak={result['peak_mem_mb']}MB")
+    return result
+
+
+# ---------- Benchmarks ----------
+def bench_openaq(rows: int, repeat: int) -> dict:
+    from src.pipelines import ingest
+    from src.utils import http_cache
+    from src.utils.stub_server import start_stub_server, stub_urls
+
+    server, base_url = start_stub_server(openaq_rows=rows)
+    ingest.OPENAQ_BASE_URL = stub_urls(base_url)["OPENAQ_BASE_URL"]
+    days = rows // 48 + 1
+    # measure the fetch + parse, not the response cache
+    previous = http_cache.set_default_cache(http_cache.HttpCache("", mode="off"))
+    try:
+        return measure(
+            "fetch_openaq", lambda: ingest.fetch_openaq(48.85, 2.35, days=days), repeat, rows=rows
+        )
+    finally:
+        http_cache.set_default_cache(previous)
+        server.shutdown()
+
+
+def bench_features(days: int, locations: int, repeat: int) -> list[dict]:
+    from benchmarks.synthetic import write_raw_store, write_snapshots
+    from src.pipelines import features
+
+    write_snapshots(str(features.RAW_DIR), days)
+    write_raw_store(str(features.RAW_STORE_DIR), days, locations)
+
+    def incremental_from_scratch():
+        features._reset_incremental_state()
+        features.build_features_incremental()
+
+    out = [
+        measure("build_features", features.build_features, repeat, days=days),
+        measure(
+            "build_features_incremental",
+            incremental_from_scratch,
+            repeat,
+            days=days,
+            locations=locations,
+        ),
+    ]
+    features._reset_incremental_state()
+    return out
+
+
+def bench_train(repeat: int) -> dict:
+    from src.pipelines import train
+
+    return measure("train_model", train.train_model, repeat)
+
+
+def bench_predict(repeat: int) -> dict:
+    from src.pipelines import predict
+
+    return measure("batch_predict", predict.batch_predict, repeat)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_api(name: str, n_requests: int, concurrency: int, horizon: int = 24) -> dict:
+    """Throughput/latency of POST /forecast on a real uvicorn server, N concurrent clients."""
+    import requests
+    import uvicorn
+
+    from src.api.main import app
+    from src.utils.http import make_session
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(f"{url}/health", timeout=1)
+            break
+        except requests.ConnectionError:
+            time.sleep(0.05)
+
+    session = make_session(pool_size=concurrency)
+    body = {"lat": 48.85, "lon": 2.35, "horizon_hours": horizon}
+
+    def one(_):
+        t0 = time.perf_counter()
+        r = session.post(f"{url}/forecast", json=body, timeout=30)
+        r.raise_for_status()
+        return time.perf_counter() - t0
+
+    try:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = sorted(pool.map(one, range(n_requests)))
+        wall = time.perf_counter() - t0
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    result = {
+        "name": name,
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(n_requests / wall, 2),
+        "latency_s": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)},
+    }
+    print(
+        f"{name:<28} {result['throughput_rps']} req/s "
+        f"p50={pct(0.5) * 1000:.1f}ms p99={pct(0.99) * 1000:.1f}ms"
+    )
+    return result
+
+
+def bench_startup(runs: int = 3) -> list[dict]:
+    from benchmarks.startup import BUDGETS_MS, profile_import, report
+
+    results = [profile_import(module, runs) for module in BUDGETS_MS]
+    for r in results:
+        report(r)
+    return results
+
+
+# ---------- Runner ----------
+def _git_sha() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> Path:
+    started = datetime.now(timezone.utc)
+    meta = {
+        "started_at": started.isoformat(),
+        "git_sha": _git_sha(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+    }
+    results = []
+    with tempfile.TemporaryDirectory(prefix="tempo-bench-") as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)  # src.config paths are relative: data/, models/
+        try:
+            results.append(bench_openaq(args.openaq_rows, args.repeat))
+            results.extend(bench_features(args.days, args.locations, args.repeat))
+            results.append(bench_train(args.repeat))
+            # serve live inference first, then from the precomputed table
+            results.append(bench_api("api_forecast_live", args.requests, args.concurrency))
+            results.append(bench_predict(args.repeat))
+            results.append(bench_api("api_forecast_table", args.requests, args.concurrency))
+            results.extend(bench_startup())
+        finally:
+            os.chdir(cwd)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{started.strftime('%Y%m%dT%H%M%SZ')}.json"
+    path.write_text(json.dumps({"meta": meta, "results": results}, indent=2))
+    print(f"Results -> {path}")
+    return path
+
+
+def _headline(result: dict) -> float | None:
+    if "wall_s" in result:
+        return result["wall_s"]["median"]
+    if "latency_s" in result:
+        return result["latency_s"]["p50"]
+    return None
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """Print median wall time (or p50 latency) per benchmark and the new/old ratio."""
+    old = {r["name"]: r for r in json.loads(Path(old_path).read_text())["results"]}
+    new = {r["name"]: r for r in json.loads(Path(new_path).read_text())["results"]}
+    print(f"{'benchmark':<28}{'old':>12}{'new':>12}{'ratio':>8}")
+    for name in sorted(old.keys() | new.keys()):
+        a = _headline(old[name]) if name in old else None
+        b = _headline(new[name]) if name in new else None
+        ratio = f"{b / a:.2f}" if a and b else "-"
+        fmt = lambda v: f"{v:.4f}" if v is not None else "-"  # noqa: E731
+        print(f"{name:<28}{fmt(a):>12}{fmt(b):>12}{ratio:>8}")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--days", type=int, default=30, help="days of hourly history")
+    parser.add_argument("--locations", type=int, default=10, help="locations in the raw store")
+    parser.add_argument("--openaq-rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=200, help="API requests per run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return
+    run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
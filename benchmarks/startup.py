@@ -0,0 +1,118 @@
+"""
+Cold-start import benchmark for the project's entry points.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --modules src.api.main --runs 5
+
+Each module is imported in a fresh interpreter under `python -X importtime`; its
+cumulative import time (median of `--runs`) is checked against a budget, and the
+report lists the slowest imports plus any heavy library (pandas, scikit-learn, ...)
+loaded eagerly. The interpreter runs in an empty directory, so an import that
+writes to disk (e.g. creating data/ folders) is reported as a side effect.
+Exit status is 1 when a module is over budget or writes to disk on import.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cumulative import budget per entry point, in milliseconds. The API budget is
+# mostly FastAPI/pydantic themselves (~350 ms on a laptop).
+BUDGETS_MS = {
+    "src.config": 20,
+    "src.api.main": 600,
+    "src.pipelines.ingest": 250,
+    "src.pipelines.features": 150,
+    "src.pipelines.train": 150,
+    "src.pipelines.predict": 150,
+    "src.pipelines.backtest": 150,
+    "src.pipelines.run": 150,
+    "src.pipelines.monitor": 150,
+    "src.pipelines.alerts": 150,
+}
+
+HEAVY = ("pandas", "numpy", "pyarrow", "sklearn", "joblib", "scipy", "streamlit", "plotly")
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every `-X importtime` line."""
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:") :].split("|")
+        out.append((name.strip(), int(self_us), int(cum_us)))
+    return out
+
+
+def profile_import(module: str, runs: int = 3, top: int = 5) -> dict:
+    """Import `module` `runs` times in fresh interpreters; summarize the timings."""
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(ROOT), os.environ.get("PYTHONPATH", "")]),
+    }
+    totals, entries = [], []
+    with tempfile.TemporaryDirectory(prefix="tempo-import-") as cwd:
+        for _ in range(runs):
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                cwd=cwd,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            entries = parse_importtime(proc.stderr)
+            totals.append(next(cum for name, _, cum in entries if name == module) / 1e6)
+        side_effects = sorted(os.listdir(cwd))
+
+    loaded = {name for name, _, _ in entries}
+    slowest = sorted(entries, key=lambda e: e[1], reverse=True)[:top]
+    return {
+        "name": f"import {module}",
+        "wall_s": {
+            "min": min(totals),
+            "median": statistics.median(totals),
+            "mean": statistics.fmean(totals),
+        },
+        "budget_s": BUDGETS_MS.get(module, 0) / 1000 or None,
+        "heavy_modules": [m for m in HEAVY if m in loaded],
+        "slowest_self_us": [{"module": n, "self_us": s} for n, s, _ in slowest],
+        "side_effects": side_effects,
+    }
+
+
+def report(result: dict) -> bool:
+    """Print one result; True when it is within budget and import had no side effect."""
+    median, budget = result["wall_s"]["median"], result["budget_s"]
+    within = budget is None or median <= budget
+    ok = within and not result["side_effects"]
+    status = "ok" if within else "OVER BUDGET"
+    limit = f"{budget * 1000:.0f}ms" if budget else "-"
+    print(f"{result['name']:<32} median={median * 1000:7.1f}ms budget={limit:>6} {status}")
+    if result["heavy_modules"]:
+        print(f"{'':<32} eager heavy imports: {', '.join(result['heavy_modules'])}")
+    if result["side_effects"]:
+        print(f"{'':<32} import wrote to disk: {', '.join(result['side_effects'])}")
+    return ok
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold-start import time.")
+    parser.add_argument("--modules", nargs="+", default=list(BUDGETS_MS))
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+    results = [profile_import(m, args.runs) for m in args.modules]
+    return 0 if all([report(r) for r in results]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Synthetic raw data shaped like the real upstream dumps: hourly Open-Meteo weather
+and air-quality series with daily cycles, weather-driven pollution and noise.
+"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pandas as pd
+
+WEATHER_COLS = (
+    "temperature_2m",
+    "relative_humidity_2m",
+    "pressure_msl",
+    "wind_speed_10m",
+    "wind_direction_10m",
+)
+AQ_COLS = ("pm25", "pm10", "no2", "ozone", "carbon_monoxide", "sulphur_dioxide")
+
+
+def make_series(
+    days: int, seed: int = 0, end: pd.Timestamp | None = None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(weather, air_quality) hourly frames indexed by UTC 'time' for one location."""
+    rng = np.random.default_rng(seed)
+    n = days * 24
+    end = end or pd.Timestamp.now(tz="UTC").floor("h")
+    time = pd.date_range(end=end, periods=n, freq="h", name="time")
+    hour = np.arange(n) % 24
+    day_cycle = np.sin((hour - 6) * 2 * np.pi / 24)
+
+    wind = np.clip(
+        12 + 4 * rng.standard_normal(n).cumsum() / np.sqrt(n) + rng.normal(0, 2, n), 0, None
+    )
+    weather = pd.DataFrame(
+        {
+            "temperature_2m": 12 + 6 * day_cycle + rng.normal(0, 1.5, n),
+            "relative_humidity_2m": np.clip(70 - 15 * day_cycle + rng.normal(0, 5, n), 5, 100),
+            "pressure_msl": 1013 + np.cumsum(rng.normal(0, 0.3, n)),
+            "wind_speed_10m": wind,
+            "wind_direction_10m": rng.uniform(0, 360, n),
+        },
+        index=time,
+    )
+
+    # traffic peaks at 8h and 19h, diluted by wind
+    rush = np.exp(-((hour - 8) ** 2) / 4) + np.exp(-((hour - 19) ** 2) / 4)
+    dilution = 1 / (1 + wind / 10)
+    no2 = np.clip(15 + 40 * rush * dilution + rng.normal(0, 4, n), 0, None)
+    pm25 = np.clip(8 + 0.3 * no2 + rng.normal(0, 2, n), 0, None)
+    aq = pd.DataFrame(
+        {
+            "pm25": pm25,
+            "pm10": pm25 * 1.6 + rng.normal(0, 2, n),
+            "no2": no2,
+            "ozone": np.clip(60 + 25 * day_cycle - 0.5 * no2 + rng.normal(0, 5, n), 0, None),
+            "carbon_monoxide": 200 + 3 * no2 + rng.normal(0, 10, n),
+            "sulphur_dioxide": np.clip(3 + rng.normal(0, 1, n), 0, None),
+        },
+        index=time,
+    )
+    return weather, aq
+
+
+def write_snapshots(raw_dir: str, days: int, seed: int = 0, stamp: str = "20000101") -> None:
+    """Write openmeteo_<stamp>.parquet / air_quality_<stamp>.parquet like `ingest` does."""
+    os.makedirs(raw_dir, exist_ok=True)
+    weather, aq = make_series(days, seed)
+    weather.reset_index().to_parquet(f"{raw_dir}/openmeteo_{stamp}.parquet", index=False)
+    aq.reset_index().to_parquet(f"{raw_dir}/air_quality_{stamp}.parquet", index=False)
+
+
+def write_raw_store(store_dir: str, days: int, locations: int, seed: int = 0) -> list[str]:
+    """Fill a RawStore with `locations` synthetic series; returns the location names."""
+    from src.utils.raw_store import RawStore
+
+    store = RawStore(store_dir)
+    names = []
+    for i in range(locations):
+        name = f"loc{i:04d}"
+        weather, aq = make_series(days, seed + i)
+        store.append("weather", name, weather)
+        store.append("air_quality", name, aq)
+        names.append(name)
+    return names
@@ -0,0 +1,139 @@
+"""
+Response encodings for forecast payloads, chosen from the `Accept` header.
+
+All encoders start from the prediction arrays (times, values) and never build one
+Python object per row except for the legacy row-oriented JSON layout.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+
+from fastapi import Response
+
+from src.config import ALERT_AQI_THRESHOLD
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+
+try:  # optional fast JSON encoder
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.tempo.columnar+json"
+ARROW = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+SUPPORTED = (JSON, COLUMNAR_JSON, ARROW, PARQUET)
+
+# short tags so each representation gets its own ETag
+MEDIA_TAGS = {JSON: "json", COLUMNAR_JSON: "cols", ARROW: "arrow", PARQUET: "parquet"}
+
+
+def negotiate(accept: str | None) -> str:
+    """Pick the best supported media type from an Accept header (JSON by default)."""
+    if not accept:
+        return JSON
+    ranked = []
+    for pos, part in enumerate(accept.split(",")):
+        media, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for p in params:
+            if p.startswith("q="):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    q = 0.0
+        ranked.append((-q, pos, media.lower()))
+    for neg_q, _, media in sorted(ranked):
+        if neg_q == 0:
+            break
+        if media in SUPPORTED:
+            return media
+        if media in ("*/*", "application/*"):
+            return JSON
+    return JSON
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=lambda o: o.tolist()).encode()
+
+
+def _utc_naive(times) -> np.ndarray:
+    """datetime64[ns] array in UTC, whatever the input (tz-aware index, Timestamps, ...)."""
+    idx = pd.DatetimeIndex(pd.to_datetime(times, utc=True))
+    return idx.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+
+
+def iso_times(times) -> list[str]:
+    """ISO-8601 strings with an explicit UTC offset, formatted in one NumPy call."""
+    stamps = np.datetime_as_string(_utc_naive(times), unit="s")
+    return np.char.add(stamps, "+00:00").tolist()
+
+
+def alerts_for(preds) -> np.ndarray:
+    return (np.asarray(preds) >= ALERT_AQI_THRESHOLD).astype(np.int8)
+
+
+def rows(times, preds, bands: dict | None = None) -> list[dict]:
+    """Legacy row layout: [{"time", "forecast", "alert", <band>...}, ...]."""
+    values = np.asarray(preds, dtype=float).tolist()
+    alerts = alerts_for(preds).tolist()
+    out = [
+        {"time": t, "forecast": v, "alert": a} for t, v, a in zip(iso_times(times), values, alerts)
+    ]
+    # quantile bands ("p10", ...) as extra fields of each row
+    for name, band in (bands or {}).items():
+        for row, v in zip(out, np.asarray(band, dtype=float).tolist()):
+            row[name] = v
+    return out
+
+
+def encode_forecast(
+    media: str, times, preds, meta: dict, headers: dict | None = None, bands: dict | None = None
+) -> Response:
+    """
+    Encode one forecast series (plus scalar `meta` fields) as `media`. `bands` maps
+    quantile names ("p10", ...) to values aligned with `preds`; each becomes a column.
+    """
+    preds = np.asarray(preds, dtype=float)
+    bands = {name: np.asarray(v, dtype=float) for name, v in (bands or {}).items()}
+    headers = {**(headers or {}), "Vary": "Accept"}
+
+    if media == COLUMNAR_JSON:
+        body = dumps(
+            {
+                **meta,
+                "time": iso_times(times),
+                "forecast": preds,
+                **bands,
+                "alert": alerts_for(preds),
+            }
+        )
+    elif media in (ARROW, PARQUET):
+        table = pa.table(
+            {
+                "time": pa.array(_utc_naive(times), type=pa.timestamp("ns", tz="UTC")),
+                "forecast": pa.array(preds),
+                **{name: pa.array(v) for name, v in bands.items()},
+                "alert": pa.array(alerts_for(preds)),
+            }
+        ).replace_schema_metadata({k: str(v) for k, v in meta.items()})
+        sink = io.BytesIO()
+        if media == ARROW:
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            pq.write_table(table, sink)
+        body = sink.getvalue()
+    else:
+        media = JSON
+        body = dumps({**meta, "items": rows(times, preds, bands)})
+    return Response(content=body, media_type=media, headers=headers)
@@ -1,14 +1,57 @@
 from __future__ import annotations
 
-import joblib
-import pandas as pd
-from fastapi import FastAPI
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from src.api import encoding
+from src.api.registry import (
+    Artifacts,
+    LoadedForecasts,
+    active_alerts,
+    forecast_table,
+    locations,
+    registry,
+)
+from src.api.schemas import BatchForecastRequest, ForecastRequest
+from src.api.serving import InferencePool, Overloaded
+from src.config import (
+    FORECAST_QUANTILES,
+    GEO_NEIGHBOURS,
+    INFERENCE_MAX_PENDING,
+    INFERENCE_WORKERS,
+    MAX_HORIZON_HOURS,
+)
+from src.pipelines.predict import rows_needed, to_bands, to_series
+from src.utils.forest import predict_intervals, quantile_name
+from src.utils.instrument import REGISTRY, timer
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Dedicated, bounded executor for forecast work (see src/api/serving.py)
+inference = InferencePool(workers=INFERENCE_WORKERS, max_pending=INFERENCE_MAX_PENDING)
+
 
-from src.api.schemas import ForecastRequest
-from src.config import ALERT_AQI_THRESHOLD, MODELS_DIR, PROCESSED_DIR
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the registry and the spatial index so the first /forecast pays neither
+    locations.get()
+    try:
+        registry.get()
+    except FileNotFoundError as e:
+        print(f"[WARN] Artifacts not loaded at startup: {e}")
+    yield
+    inference.shutdown()
 
-app = FastAPI(title="TEMPO Air Forecast API", version="0.1.0")
+
+app = FastAPI(title="TEMPO Air Forecast API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,26 +62,266 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    # label by route template, not raw path, to keep cardinality bounded
+    route = request.scope.get("route")
+    REGISTRY.histogram("tempo_http_request_seconds", "API request latency").observe(
+        time.perf_counter() - t0,
+        method=request.method,
+        path=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    return response
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "model": registry.info(), "inference": inference.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/alerts")
+def alerts(subscriber: str | None = None, location: str | None = None):
+    """Active alerts from the last alert-engine run, optionally for one subscriber/location."""
+    active = active_alerts.get()
+    if active is None:
+        return {"alerts": []}
+    if subscriber is not None:
+        active = active[active["subscriber"] == subscriber]
+    if location is not None:
+        active = active[active["location"] == location]
+    out = active.assign(since=encoding.iso_times(active["since"]) if len(active) else [])
+    return {"alerts": out.to_dict(orient="records")}
+
+
+def _artifacts() -> Artifacts:
+    try:
+        return registry.get()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=f"Artifacts not available: {e}") from e
+
+
+def _validate_item(item: ForecastRequest) -> str | None:
+    if not -90 <= item.lat <= 90 or not -180 <= item.lon <= 180:
+        return "lat/lon out of range"
+    if item.horizon_hours < 1:
+        return "horizon_hours must be >= 1"
+    return None
+
+
+def _neighbours(item: ForecastRequest, available, fallback: str) -> list[tuple[str, float]]:
+    """
+    (location, weight) pairs serving the item's coordinates, among `available`: the
+    nearest location, or an inverse-distance blend of the GEO_NEIGHBOURS nearest.
+    """
+    hits = locations.get().weights(item.lat, item.lon, k=GEO_NEIGHBOURS, allowed=available)
+    return hits or [(fallback, 1.0)]
+
+
+def _neighbours_tag(neighbours: list[tuple[str, float]]) -> str:
+    if len(neighbours) == 1:
+        return neighbours[0][0]
+    return hashlib.sha1(repr(neighbours).encode()).hexdigest()[:12]
+
+
+def _blend(parts: list[tuple[float, object, object]]) -> tuple:
+    """
+    Weighted mean of (weight, times, values) series, on the first series' times.
+    `values` may stack several rows over the times (see `_with_bands`).
+    """
+    _, times, values = parts[0]
+    if len(parts) == 1:
+        return times, values
+    acc, total = 0.0, 0.0
+    for w, t, v in parts:
+        # a neighbour whose series is misaligned (e.g. older origin) is left out
+        if len(t) == len(times) and (t == times).all():
+            acc, total = acc + w * v, total + w
+    return times, acc / total
+
+
+def _with_bands(values, bands) -> np.ndarray:
+    """(1 + quantiles, hours): the point series over its bands, blended as one array."""
+    values = np.asarray(values, dtype=float)
+    return values[None] if bands is None else np.vstack([values, bands])
+
+
+def _band_names() -> list[str]:
+    return [quantile_name(q) for q in FORECAST_QUANTILES]
+
+
+def _predict_blocks(art: Artifacts, need: dict[str, int], component: str) -> dict[str, tuple]:
+    """
+    location -> (index, predictions, quantile bands or None) for the last
+    `need[location]` feature rows of each location, scored with a single pass of the
+    model over the stacked tails (point forecast and FORECAST_QUANTILES bands together).
+    """
+    tails = {loc: art.blocks[loc].tail(n) for loc, n in need.items()}
+    stacked = pd.concat(tails.values())
+    with timer("tempo_predict_seconds", "Model predict time", component=component):
+        preds, bands = predict_intervals(art.model, stacked, FORECAST_QUANTILES)
+    out, pos = {}, 0
+    for loc, tail in tails.items():
+        rows = slice(pos, pos + len(tail))
+        out[loc] = (stacked.index[rows], preds[rows], None if bands is None else bands[:, rows])
+        pos += len(tail)
+    return out
+
+
+def _scored_series(art: Artifacts, scored: tuple, horizon: int) -> tuple:
+    """(times, `_with_bands` values) of one location's scored rows."""
+    index, preds, bands = scored
+    times, values = to_series(art.model, index, preds, horizon)
+    return times, _with_bands(values, to_bands(art.model, index, bands, horizon))
+
+
+async def _offload(key, fn, *args) -> Response:
+    """Run `fn` on the inference pool (coalescing on `key`); 503 when the queue is full."""
+    try:
+        shared = await inference.run(key, fn, *args)
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503, detail=f"Server busy: {e}", headers={"Retry-After": "1"}
+        ) from e
+    # coalesced callers get their own copy: middlewares mutate response headers in place
+    return Response(
+        content=shared.body,
+        status_code=shared.status_code,
+        headers=dict(shared.headers),
+        media_type=shared.media_type,
+    )
+
+
+def _not_modified(inm: str | None, ims: str | None, etag: str, table: LoadedForecasts) -> bool:
+    """Conditional request check: If-None-Match wins over If-Modified-Since (RFC 9110)."""
+    if inm is not None:
+        return inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]
+    if ims:
+        try:
+            return table.issue_time.to_pydatetime() <= parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+    return False
 
 
 @app.post("/forecast")
-def forecast(req: ForecastRequest):
-    df = pd.read_parquet(f"{PROCESSED_DIR}/features.parquet").set_index("time")
-    X = df.select_dtypes(include=["number"]).drop(
-        columns=[c for c in df.columns if c == "y_next_24h"], errors="ignore"
+async def forecast(req: ForecastRequest, request: Request):
+    """
+    Forecast for one location. The body encoding follows the Accept header: row JSON
+    (default), columnar JSON, Arrow IPC stream or Parquet (see src/api/encoding.py).
+    Each hour carries the FORECAST_QUANTILES bands of a forest model ("p10", "p50",
+    "p90" by default) next to the point forecast.
+
+    The work runs on the inference pool; identical concurrent requests share one
+    computation, and a full queue answers 503 with Retry-After.
+    """
+    error = _validate_item(req)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
+    horizon = min(req.horizon_hours, MAX_HORIZON_HOURS)
+    media = encoding.negotiate(request.headers.get("accept"))
+    inm = request.headers.get("if-none-match")
+    ims = request.headers.get("if-modified-since")
+    key = ("forecast", req.lat, req.lon, horizon, media, inm, ims)
+    return await _offload(key, _forecast, req, horizon, media, inm, ims)
+
+
+def _forecast(
+    req: ForecastRequest, horizon: int, media: str, inm: str | None, ims: str | None
+) -> Response:
+    # Serve from the precomputed table when `predict` has written one
+    table = forecast_table.get()
+    if table is not None:
+        neighbours = _neighbours(req, table.index, table.default_location())
+        tag = _neighbours_tag(neighbours)
+        headers = {
+            "ETag": f'"{table.version}-{tag}-{horizon}-{encoding.MEDIA_TAGS[media]}"',
+            "Last-Modified": table.last_modified,
+            "Vary": "Accept",
+        }
+        if _not_modified(inm, ims, headers["ETag"], table):
+            return Response(status_code=304, headers=headers)
+        meta = {
+            "horizon": horizon,
+            "location": neighbours[0][0],
+            "forecast_version": table.version,
+        }
+        parts = []
+        for loc, w in neighbours:
+            times, preds = table.series(loc, horizon)
+            parts.append((w, times, _with_bands(preds, table.band(loc, horizon))))
+        times, values = _blend(parts)
+        bands = dict(zip(table.quantiles, values[1:]))
+        return encoding.encode_forecast(media, times, values[0], meta, headers, bands)
+
+    art = _artifacts()
+    neighbours = _neighbours(req, art.blocks, art.default_location())
+    n = rows_needed(art.model, horizon)
+    scored = _predict_blocks(art, {loc: n for loc, _ in neighbours}, "forecast")
+    times, values = _blend(
+        [(w, *_scored_series(art, scored[loc], horizon)) for loc, w in neighbours]
+    )
+    meta = {"horizon": horizon, "location": neighbours[0][0], "model_version": art.version}
+    bands = dict(zip(_band_names(), values[1:]))
+    return encoding.encode_forecast(media, times, values[0], meta, bands=bands)
+
+
+@app.post("/forecast/batch")
+async def forecast_batch(req: BatchForecastRequest):
+    """
+    Forecast many locations in one call.
+
+    Each item resolves to its nearest location(s); the feature tails of all the
+    locations involved are stacked into one matrix and scored with a single
+    `model.predict`, then sliced back (and blended) per item. Invalid items get an
+    `error` entry without failing the batch.
+    Runs on the inference pool like /forecast, without coalescing.
+    """
+    return await _offload(None, _forecast_batch, req)
+
+
+def _forecast_batch(req: BatchForecastRequest) -> Response:
+    art = _artifacts()
+    fallback = art.default_location()
+    results: list[dict | None] = [None] * len(req.items)
+    need: dict[str, int] = {}
+    plan: list[tuple[int, list[tuple[str, float]], int]] = []
+    for i, item in enumerate(req.items):
+        error = _validate_item(item)
+        if error:
+            results[i] = {"index": i, "error": error}
+            continue
+        horizon = min(item.horizon_hours, MAX_HORIZON_HOURS)
+        neighbours = _neighbours(item, art.blocks, fallback)
+        for loc, _ in neighbours:
+            # one tail per location, long enough for the largest horizon asked of it
+            need[loc] = max(rows_needed(art.model, horizon), need.get(loc, 0))
+        plan.append((i, neighbours, horizon))
+
+    if plan:
+        scored = _predict_blocks(art, need, "batch")
+        for i, neighbours, horizon in plan:
+            times, values = _blend(
+                [(w, *_scored_series(art, scored[loc], horizon)) for loc, w in neighbours]
+            )
+            item = req.items[i]
+            results[i] = {
+                "index": i,
+                "lat": item.lat,
+                "lon": item.lon,
+                "location": neighbours[0][0],
+                "horizon": horizon,
+                "items": encoding.rows(times, values[0], dict(zip(_band_names(), values[1:]))),
+            }
+
+    return Response(
+        content=encoding.dumps({"model_version": art.version, "results": results}),
+        media_type=encoding.JSON,
     )
-    model = joblib.load(f"{MODELS_DIR}/model.pkl")
-    preds = model.predict(X)
-    horizon = min(req.horizon_hours, 48)
-    out = pd.DataFrame({"time": X.index, "y_pred": preds}).tail(horizon)
-    out["alert"] = (out["y_pred"] >= ALERT_AQI_THRESHOLD).astype(int)
-    return {
-        "horizon": horizon,
-        "items": [
-            {"time": pd.to_datetime(t).isoformat(), "forecast": float(v), "alert": int(a)}
-            for t, v, a in zip(out["time"], out["y_pred"], out["alert"])
-        ],
-    }
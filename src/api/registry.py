@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from src.config import (
+    ALERTS_DIR,
+    DEFAULT_LAT,
+    DEFAULT_LON,
+    FEATURE_PARTS_DIR,
+    FORECASTS_DIR,
+    FOREST_PATH,
+    GEO_CELL_DEG,
+    LATEST_FEATURES_PATH,
+    LOCATIONS_PATH,
+    MODELS_DIR,
+    PROCESSED_DIR,
+)
+from src.pipelines.features import read_features, target_columns
+from src.utils.forest import load_model
+from src.utils.geo import LocationIndex
+from src.utils.instrument import timer
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+@dataclass(frozen=True)
+class Artifacts:
+    """Model + feature matrix loaded together; swapped as a whole, never mutated."""
+
+    model: object
+    features: pd.DataFrame
+    X: pd.DataFrame
+    version: str
+    loaded_at: str
+    load_seconds: float
+    # per-location feature rows (time-indexed, time-sorted); {"default": X} when the
+    # features carry no location column
+    blocks: dict[str, pd.DataFrame]
+
+    def default_location(self) -> str:
+        return "default" if "default" in self.blocks else next(iter(self.blocks))
+
+
+def _stat_signature(paths: tuple[str, ...], optional: tuple[str, ...] = ()) -> tuple:
+    """Cheap change detector: (mtime_ns, size) of every artifact file."""
+    sig = []
+    for p in paths:
+        st = os.stat(p)
+        sig.append((p, st.st_mtime_ns, st.st_size))
+    for p in optional:
+        # e.g. the incremental parts directory: its mtime moves when a part is added
+        if p and os.path.exists(p):
+            st = os.stat(p)
+            sig.append((p, st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+
+class ArtifactRegistry:
+    """
+    Keep the model and features in memory and reload them only when the files change.
+
+    `get()` stats the artifact files on each call (a couple of syscalls) and, if their
+    mtime/size changed since the last load, loads the new pair and swaps it in under a
+    lock. Requests already holding the previous `Artifacts` keep using it untouched.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        features_path: str,
+        parts_dir: str | None = None,
+        latest_path: str | None = None,
+        forest_path: str | None = None,
+    ):
+        self.model_path = model_path
+        # compact export of the model, memory-mapped and shared by all workers
+        self.forest_path = forest_path
+        self.features_path = features_path
+        self.parts_dir = parts_dir
+        # newest feature rows (incl. those whose targets are not observed yet); preferred
+        # for serving when present
+        self.latest_path = latest_path
+        self._lock = threading.Lock()
+        self._current: Artifacts | None = None
+        self._signature: tuple | None = None
+
+    @property
+    def current(self) -> Artifacts | None:
+        return self._current
+
+    def get(self) -> Artifacts:
+        """Return the loaded artifacts, reloading first if the files on disk changed."""
+        signature = _stat_signature(
+            (self.model_path,),
+            optional=(
+                self.features_path,
+                self.parts_dir or "",
+                self.latest_path or "",
+                self.forest_path or "",
+            ),
+        )
+        if signature != self._signature or self._current is None:
+            with self._lock:
+                # another thread may have reloaded while we waited
+                if signature != self._signature or self._current is None:
+                    self._current = self._load(signature)
+                    self._signature = signature
+        return self._current
+
+    def _load(self, signature: tuple) -> Artifacts:
+        t0 = time.perf_counter()
+        if self.latest_path and os.path.exists(self.latest_path):
+            features = pd.read_parquet(self.latest_path)
+        else:
+            # serving never needs the 48 target columns: skip them at read time
+            features = read_features(self.features_path, self.parts_dir, targets=False)
+        features = features.set_index("time")
+        X = features.drop(columns=target_columns(features)).select_dtypes(include=["number"])
+        if "location" in features.columns:
+            names = features["location"].astype(str)
+            blocks = {
+                loc: X.iloc[pos].sort_index() for loc, pos in names.groupby(names).indices.items()
+            }
+        else:
+            blocks = {"default": X}
+        with timer("tempo_model_load_seconds", "Model load time", component="api"):
+            model = load_model(self.model_path, self.forest_path)
+        version = hashlib.sha1(repr(signature).encode()).hexdigest()[:12]
+        return Artifacts(
+            model=model,
+            features=features,
+            X=X,
+            version=version,
+            loaded_at=datetime.now(timezone.utc).isoformat(),
+            load_seconds=round(time.perf_counter() - t0, 4),
+            blocks=blocks,
+        )
+
+    def info(self) -> dict | None:
+        art = self._current
+        if art is None:
+            return None
+        return {
+            "version": art.version,
+            "loaded_at": art.loaded_at,
+            "load_seconds": art.load_seconds,
+            "n_rows": int(art.X.shape[0]),
+            "n_locations": len(art.blocks),
+        }
+
+
+@dataclass(frozen=True)
+class LoadedForecasts:
+    """A forecast table indexed by location: location -> (times, predictions), time-sorted."""
+
+    version: str
+    issue_time: pd.Timestamp
+    last_modified: str
+    index: dict[str, tuple[np.ndarray, np.ndarray]]
+    # True when each series is a trajectory after its origin (multi-horizon model): a
+    # horizon h is then its first h values, otherwise its last h values
+    trajectory: bool = False
+    # quantile band names ("p10", ...) and location -> (bands, hours) values, aligned
+    # with `index`; empty for tables written without bands
+    quantiles: tuple[str, ...] = ()
+    bands: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def default_location(self) -> str:
+        return "default" if "default" in self.index else next(iter(self.index))
+
+    def _window(self, horizon: int) -> slice:
+        return slice(None, horizon) if self.trajectory else slice(-horizon, None)
+
+    def series(self, location: str, horizon: int) -> tuple[np.ndarray, np.ndarray]:
+        times, preds = self.index[location]
+        window = self._window(horizon)
+        return times[window], preds[window]
+
+    def band(self, location: str, horizon: int) -> np.ndarray | None:
+        """(quantiles, hours) band values over the same hours as `series`, if any."""
+        bands = self.bands.get(location)
+        return None if bands is None else bands[:, self._window(horizon)]
+
+
+class ForecastTable:
+    """
+    Serve the newest table written by `predict.batch_predict`, reloaded when a new
+    version appears. Lookups are dictionary hits on pre-split NumPy arrays.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._current: LoadedForecasts | None = None
+        self._path: str | None = None
+
+    def get(self) -> LoadedForecasts | None:
+        paths = sorted(glob.glob(f"{self.directory}/forecast_*.parquet"))
+        if not paths:
+            return None
+        if paths[-1] != self._path:
+            with self._lock:
+                if paths[-1] != self._path:
+                    self._current = self._load(paths[-1])
+                    self._path = paths[-1]
+        return self._current
+
+    @staticmethod
+    def _load(path: str) -> LoadedForecasts:
+        table = pd.read_parquet(path).sort_values(["location", "time"])
+        # y_p10, y_p50, ... (not y_pred)
+        band_cols = [c for c in table.columns if c.startswith("y_p") and c[3:4].isdigit()]
+        index, bands = {}, {}
+        for loc, grp in table.groupby("location", sort=False):
+            index[str(loc)] = (grp["time"].to_numpy(), grp["y_pred"].to_numpy())
+            if band_cols:
+                bands[str(loc)] = grp[band_cols].to_numpy(dtype="float64").T
+        issue_time = pd.Timestamp(table["issue_time"].max())
+        version = os.path.basename(path)[len("forecast_") : -len(".parquet")]
+        return LoadedForecasts(
+            version=version,
+            issue_time=issue_time,
+            last_modified=format_datetime(
+                issue_time.to_pydatetime().astimezone(timezone.utc), usegmt=True
+            ),
+            index=index,
+            trajectory=bool(
+                "origin_time" in table.columns and (table["time"] > table["origin_time"]).all()
+            ),
+            quantiles=tuple(c[len("y_") :] for c in band_cols),
+            bands=bands,
+        )
+
+
+class ActiveAlerts:
+    """The alert engine's active alerts (ALERTS_DIR/active.parquet), reloaded on change."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._frame: pd.DataFrame | None = None
+        self._mtime: int | None = None
+
+    def get(self) -> pd.DataFrame | None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._frame = pd.read_parquet(self.path)
+                    self._mtime = mtime
+        return self._frame
+
+
+registry = ArtifactRegistry(
+    model_path=f"{MODELS_DIR}/model.pkl",
+    features_path=f"{PROCESSED_DIR}/features.parquet",
+    parts_dir=FEATURE_PARTS_DIR,
+    latest_path=LATEST_FEATURES_PATH,
+    forest_path=FOREST_PATH,
+)
+
+forecast_table = ForecastTable(FORECASTS_DIR)
+
+active_alerts = ActiveAlerts(f"{ALERTS_DIR}/active.parquet")
+
+# Spatial index over the ingested locations; resolves request coordinates
+locations = LocationIndex(LOCATIONS_PATH, {"default": (DEFAULT_LAT, DEFAULT_LON)}, GEO_CELL_DEG)
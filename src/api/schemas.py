@@ -1,7 +1,15 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from src.config import FORECAST_BATCH_MAX_ITEMS
 
 
 class ForecastRequest(BaseModel):
     lat: float
     lon: float
     horizon_hours: int = 24
+
+
+class BatchForecastRequest(BaseModel):
+    # Items are validated one by one in the handler so a bad item yields a per-item
+    # error instead of rejecting the whole batch; only the batch size is enforced here.
+    items: list[ForecastRequest] = Field(..., min_length=1, max_length=FORECAST_BATCH_MAX_ITEMS)
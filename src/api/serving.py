@@ -0,0 +1,103 @@
+"""
+Off-loop execution of forecast work: bounded executor, single-flight, backpressure.
+
+    pool = InferencePool(workers=4, max_pending=64)
+    result = await pool.run(key, compute, *args)
+
+- `compute` runs on a dedicated thread pool, never on the event loop nor on the
+  threadpool FastAPI uses for sync endpoints and file responses. Threads (not
+  processes) so the loaded model and features are shared; NumPy and the forest
+  traversal release the GIL for most of the work.
+- Concurrent calls with the same `key` share one computation (single-flight): the
+  first caller submits it, the others await the same future.
+- At most `max_pending` computations are queued or running; beyond that `run` raises
+  `Overloaded` immediately instead of letting latency grow without bound.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from src.utils.instrument import count
+
+
+class Overloaded(Exception):
+    """The inference queue is full; callers should answer 503 and let clients retry."""
+
+
+class InferencePool:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: ThreadPoolExecutor | None = None
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # created on first use (and again after shutdown, e.g. across app lifespans)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="tempo-inference"
+                )
+            return self._executor
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                count("tempo_inference_requests_total", 1, "Inference calls", outcome="rejected")
+                raise Overloaded(f"{self._pending} forecasts already queued")
+            self._pending += 1
+
+    def _release(self, key: Hashable | None, fut: asyncio.Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if key is not None and self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    async def run(self, key: Hashable | None, fn: Callable[..., Any], *args) -> Any:
+        """
+        Run `fn(*args)` on the pool, or join the identical in-flight call for `key`.
+        `key=None` never coalesces (the call is still bounded by `max_pending`).
+        """
+        fut = self._inflight.get(key) if key is not None else None
+        if fut is not None:
+            count("tempo_inference_requests_total", 1, "Inference calls", outcome="coalesced")
+        else:
+            self._acquire()
+            try:
+                fut = asyncio.wrap_future(self.executor.submit(fn, *args))
+            except BaseException:
+                with self._lock:
+                    self._pending -= 1
+                raise
+            if key is not None:
+                self._inflight[key] = fut
+            fut.add_done_callback(lambda f, key=key: self._release(key, f))
+            count("tempo_inference_requests_total", 1, "Inference calls", outcome="computed")
+        # shield: a caller that disconnects must not cancel the work others wait on
+        return await asyncio.shield(fut)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "inflight_keys": len(self._inflight),
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -1,5 +1,29 @@
+"""
+Shared UI helpers and cached data access for the Streamlit pages.
+
+Streamlit re-runs the whole page script on every widget interaction, so anything
+read here is cached:
+
+- parquet reads are keyed on the file's mtime, so a new pipeline run is picked up on
+  the next rerun and every other rerun is a memory hit; only the requested columns
+  and the tail of the file are read;
+- the API is called through one pooled keep-alive session to `API_BASE_URL`;
+- forecast responses are kept for `FORECAST_CACHE_TTL_SEC` seconds per
+  (lat, lon, horizon), so repeated clicks and slider moves do not hit the API.
+"""
+
+from __future__ import annotations
+
+import os
+
+import pandas as pd
 import streamlit as st
 
+from src.config import API_BASE_URL, FEATURES_PATH, FORECAST_CACHE_TTL_SEC, HTTP_TIMEOUT_SEC
+from src.utils.io import read_parquet_tail
+
+COLUMNAR_JSON = "application/vnd.tempo.columnar+json"
+
 
 def alert_banner(alert_any: bool, threshold: int):
     if alert_any:
@@ -8,3 +32,67 @@ def alert_banner(alert_any: bool, threshold: int):
         )
     else:
         st.success("✅ Forecast under threshold in the selected horizon.")
+
+
+# ---------- Parquet ----------
+def _mtime_ns(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _cached_tail(path: str, mtime_ns: int, rows: int, columns: tuple | None) -> pd.DataFrame:
+    # mtime_ns is only part of the cache key: a rewritten file gets a new entry
+    return read_parquet_tail(path, rows, columns)
+
+
+def load_tail(path: str, rows: int, columns: tuple | None = None) -> pd.DataFrame:
+    """Last `rows` rows of a parquet file (empty frame if it does not exist yet)."""
+    mtime_ns = _mtime_ns(path)
+    if mtime_ns is None:
+        return pd.DataFrame()
+    return _cached_tail(path, mtime_ns, rows, columns)
+
+
+def load_features(rows: int, columns: tuple = ("no2", "pm25")) -> pd.DataFrame:
+    """Recent feature rows, time-indexed, restricted to `columns` that exist."""
+    df = load_tail(FEATURES_PATH, rows, ("time", *columns))
+    if df.empty or "time" not in df.columns:
+        return pd.DataFrame()
+    df = df.set_index("time")
+    df.index = pd.to_datetime(df.index)
+    return df
+
+
+# ---------- API ----------
+@st.cache_resource(show_spinner=False)
+def api_session():
+    """One keep-alive session per server process, shared by all sessions and reruns."""
+    from src.utils.http import make_session
+
+    return make_session(pool_size=4)
+
+
+@st.cache_data(ttl=FORECAST_CACHE_TTL_SEC, max_entries=256, show_spinner=False)
+def _cached_forecast(lat: float, lon: float, horizon: int) -> pd.DataFrame:
+    resp = api_session().post(
+        f"{API_BASE_URL}/forecast",
+        json={"lat": lat, "lon": lon, "horizon_hours": horizon},
+        headers={"Accept": COLUMNAR_JSON},
+        timeout=min(HTTP_TIMEOUT_SEC, 15),
+    )
+    # raising keeps errors out of the cache: the next click retries
+    resp.raise_for_status()
+    body = resp.json()
+    return pd.DataFrame(
+        {"forecast": body["forecast"], "alert": body["alert"]},
+        index=pd.DatetimeIndex(pd.to_datetime(body["time"]), name="time"),
+    ).sort_index()
+
+
+def fetch_forecast(lat: float, lon: float, horizon: int) -> pd.DataFrame:
+    """Forecast frame (time index; forecast, alert) from the API, cached for a short TTL."""
+    # coordinates rounded to ~10 m so nearby clicks share a cache entry
+    return _cached_forecast(round(float(lat), 4), round(float(lon), 4), int(horizon))
@@ -1,8 +1,9 @@
 from glob import glob
 
-import pandas as pd
 import streamlit as st
 
+from src.app.components import load_tail
+
 st.title("🧪 Compare Sources (Raw)")
 
 
@@ -18,13 +19,13 @@ col1, col2 = st.columns(2)
 with col1:
     st.subheader("OpenAQ (raw)")
     if aq:
-        st.dataframe(pd.read_parquet(aq).head(30))
+        st.dataframe(load_tail(aq, rows=30))
     else:
         st.info("No OpenAQ file yet.")
 
 with col2:
     st.subheader("Open-Meteo (raw)")
     if meteo:
-        st.dataframe(pd.read_parquet(meteo).head(30))
+        st.dataframe(load_tail(meteo, rows=30))
     else:
         st.info("No Open-Meteo file yet.")
@@ -1,14 +1,24 @@
 # src/config.py
+"""
+Réglages du projet, évalués paresseusement.
+
+Importer ce module ne fait aucune I/O : le fichier .env n'est lu qu'au premier accès
+à un réglage, et chaque valeur d'environnement n'est lue qu'une fois. Les dossiers de
+données ne sont plus créés à l'import ; chaque écriture crée son dossier parent
+(`src.utils.io.atomic_write`, `save_json`, ...), et `ensure_dirs()` reste disponible.
+
+    from src.config import MAX_HORIZON_HOURS      # inchangé pour les appelants
+    from src.config import get_settings
+    get_settings().API_BASE_URL
+"""
+
 from __future__ import annotations
 
 import os
+import threading
+from functools import cached_property
 from pathlib import Path
 
-from dotenv import load_dotenv
-
-# Charge .env si présent
-load_dotenv()
-
 
 # ---------- Helpers ----------
 def _get_env_str(name: str, default: str) -> str:
@@ -35,45 +45,279 @@ def _get_env_bool(name: str, default: bool) -> bool:
     return raw in {"1", "true", "yes", "y", "on"}
 
 
-# ---------- API endpoints ----------
-OPENAQ_BASE_URL = _get_env_str("OPENAQ_BASE_URL", "https://api.openaq.org/v2")
-# Météo (température, vent, humidité, etc.)
-OPEN_METEO_BASE_URL = _get_env_str("OPEN_METEO_BASE_URL", "https://api.open-meteo.com/v1/forecast")
-# Qualité de l'air (fallback : pm2_5, no2, etc.)
-OPEN_METEO_AIR_BASE_URL = _get_env_str(
-    "OPEN_METEO_AIR_BASE_URL", "https://air-quality-api.open-meteo.com/v1/air-quality"
-)
-
-# ---------- App defaults ----------
-DEFAULT_LAT = _get_env_float("DEFAULT_LAT", 48.8566)
-DEFAULT_LON = _get_env_float("DEFAULT_LON", 2.3522)
-ALERT_AQI_THRESHOLD = _get_env_int("ALERT_AQI_THRESHOLD", 100)
-DATA_WINDOW_DAYS = _get_env_int("DATA_WINDOW_DAYS", 7)
-
-# L’URL de l’API à laquelle la webapp (Streamlit) parle ; local par défaut
-API_BASE_URL = _get_env_str("API_BASE_URL", "http://localhost:8000")
-
-# (Optionnel) Clé Google Maps si tu l’utilises côté front
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "").strip()
-
-# Timeouts réseau (en secondes) pour requests
-HTTP_TIMEOUT_SEC = _get_env_int("HTTP_TIMEOUT_SEC", 45)
-
-# ---------- Dossiers projet ----------
-DATA_DIR = Path("data")
-RAW_DIR = DATA_DIR / "raw"
-INTERIM_DIR = DATA_DIR / "interim"
-PROCESSED_DIR = DATA_DIR / "processed"
-MODELS_DIR = Path("models")
-NOTEBOOKS_DIR = Path("notebooks")
-
-# Création des dossiers si non existants
-for d in (DATA_DIR, RAW_DIR, INTERIM_DIR, PROCESSED_DIR, MODELS_DIR, NOTEBOOKS_DIR):
-    d.mkdir(parents=True, exist_ok=True)
-
-# ---------- Patterns utiles ----------
-AIR_QUALITY_RAW_PATTERN = str(RAW_DIR / "air_quality_*.parquet")
-OPENMETEO_RAW_PATTERN = str(RAW_DIR / "openmeteo_*.parquet")
-FEATURES_PATH = str(PROCESSED_DIR / "features.parquet")
-MODEL_PATH = str(MODELS_DIR / "model.pkl")
-METRICS_PATH = str(MODELS_DIR / "metrics.json")
+class Settings:
+    """Réglages lus depuis l'environnement (et .env) au premier accès de chacun."""
+
+    def __init__(self, env_file: str | None = ".env"):
+        if env_file:
+            from dotenv import load_dotenv
+
+            # Charge .env si présent (sans écraser les variables déjà définies)
+            load_dotenv(env_file)
+
+    # ---------- API endpoints ----------
+    @cached_property
+    def OPENAQ_BASE_URL(self) -> str:
+        return _get_env_str("OPENAQ_BASE_URL", "https://api.openaq.org/v2")
+
+    # Météo (température, vent, humidité, etc.)
+    @cached_property
+    def OPEN_METEO_BASE_URL(self) -> str:
+        return _get_env_str("OPEN_METEO_BASE_URL", "https://api.open-meteo.com/v1/forecast")
+
+    # Qualité de l'air (fallback : pm2_5, no2, etc.)
+    @cached_property
+    def OPEN_METEO_AIR_BASE_URL(self) -> str:
+        return _get_env_str(
+            "OPEN_METEO_AIR_BASE_URL", "https://air-quality-api.open-meteo.com/v1/air-quality"
+        )
+
+    # Archives météo (historique pluriannuel, utilisé par le backfill)
+    @cached_property
+    def OPEN_METEO_ARCHIVE_URL(self) -> str:
+        return _get_env_str(
+            "OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive"
+        )
+
+    # ---------- App defaults ----------
+    @cached_property
+    def DEFAULT_LAT(self) -> float:
+        return _get_env_float("DEFAULT_LAT", 48.8566)
+
+    @cached_property
+    def DEFAULT_LON(self) -> float:
+        return _get_env_float("DEFAULT_LON", 2.3522)
+
+    @cached_property
+    def ALERT_AQI_THRESHOLD(self) -> int:
+        return _get_env_int("ALERT_AQI_THRESHOLD", 100)
+
+    # Moteur d'alertes : seuil de retour au calme = seuil x ce ratio (hystérésis), et
+    # polluant prévu quand la table de prévisions ne le précise pas
+    @cached_property
+    def ALERT_CLEAR_RATIO(self) -> float:
+        return _get_env_float("ALERT_CLEAR_RATIO", 0.9)
+
+    @cached_property
+    def ALERT_POLLUTANT(self) -> str:
+        return _get_env_str("ALERT_POLLUTANT", "no2")
+
+    @cached_property
+    def DATA_WINDOW_DAYS(self) -> int:
+        return _get_env_int("DATA_WINDOW_DAYS", 7)
+
+    # Horizon max servi par l'API et taille max d'un appel /forecast/batch
+    @cached_property
+    def MAX_HORIZON_HOURS(self) -> int:
+        return _get_env_int("MAX_HORIZON_HOURS", 48)
+
+    # Quantiles des intervalles de prévision (valeurs des feuilles de tous les arbres),
+    # ex. "0.1,0.5,0.9" ; "none" = prévisions ponctuelles seules
+    @cached_property
+    def FORECAST_QUANTILES(self) -> tuple[float, ...]:
+        raw = _get_env_str("FORECAST_QUANTILES", "0.1,0.5,0.9")
+        if raw.lower() == "none":
+            return ()
+        qs = []
+        for x in raw.split(","):
+            try:
+                qs.append(float(x))
+            except ValueError:
+                continue
+        return tuple(sorted({q for q in qs if 0 <= q <= 1})) or (0.1, 0.5, 0.9)
+
+    @cached_property
+    def FORECAST_BATCH_MAX_ITEMS(self) -> int:
+        return _get_env_int("FORECAST_BATCH_MAX_ITEMS", 1000)
+
+    # Threads dédiés à l'inférence de l'API et taille max de la file (au-delà : 503)
+    @cached_property
+    def INFERENCE_WORKERS(self) -> int:
+        return _get_env_int("INFERENCE_WORKERS", min(4, os.cpu_count() or 1))
+
+    @cached_property
+    def INFERENCE_MAX_PENDING(self) -> int:
+        return _get_env_int("INFERENCE_MAX_PENDING", 64)
+
+    # Lignes par row group du feature store (granularité du filtrage par plage de temps)
+    @cached_property
+    def FEATURE_ROW_GROUP_ROWS(self) -> int:
+        return _get_env_int("FEATURE_ROW_GROUP_ROWS", 50_000)
+
+    # Résolution des coordonnées d'une requête : 1 = location la plus proche, k > 1 =
+    # moyenne des k plus proches pondérée par l'inverse du carré de la distance
+    @cached_property
+    def GEO_NEIGHBOURS(self) -> int:
+        return max(1, _get_env_int("GEO_NEIGHBOURS", 1))
+
+    # Taille (degrés) des cellules de l'index spatial des locations
+    @cached_property
+    def GEO_CELL_DEG(self) -> float:
+        return _get_env_float("GEO_CELL_DEG", 1.0)
+
+    # Recouvrement (heures) redemandé avant le dernier point connu en ingestion incrémentale
+    @cached_property
+    def INGEST_OVERLAP_HOURS(self) -> int:
+        return _get_env_int("INGEST_OVERLAP_HOURS", 3)
+
+    # Taille (jours) des tranches d'un backfill historique (ingestion et features)
+    @cached_property
+    def BACKFILL_CHUNK_DAYS(self) -> int:
+        return max(1, _get_env_int("BACKFILL_CHUNK_DAYS", 30))
+
+    # Fenêtres glissantes (jours) du suivi de précision en ligne, ex. "1,7,30"
+    @cached_property
+    def MONITOR_WINDOWS_DAYS(self) -> tuple[int, ...]:
+        raw = [x.strip() for x in _get_env_str("MONITOR_WINDOWS_DAYS", "1,7,30").split(",")]
+        days = sorted({int(x) for x in raw if x.isdigit() and int(x) > 0})
+        return tuple(days) or (1, 7, 30)
+
+    # Demi-vie (heures) des histogrammes de features servant à détecter la dérive
+    @cached_property
+    def DRIFT_HALF_LIFE_HOURS(self) -> float:
+        return _get_env_float("DRIFT_HALF_LIFE_HOURS", 168.0)
+
+    # Seuil de PSI (population stability index) au-delà duquel une feature a dérivé
+    @cached_property
+    def DRIFT_PSI_THRESHOLD(self) -> float:
+        return _get_env_float("DRIFT_PSI_THRESHOLD", 0.2)
+
+    # L’URL de l’API à laquelle la webapp (Streamlit) parle ; local par défaut
+    @cached_property
+    def API_BASE_URL(self) -> str:
+        return _get_env_str("API_BASE_URL", "http://localhost:8000")
+
+    # Durée (secondes) pendant laquelle la webapp réutilise une prévision déjà reçue
+    @cached_property
+    def FORECAST_CACHE_TTL_SEC(self) -> int:
+        return _get_env_int("FORECAST_CACHE_TTL_SEC", 60)
+
+    # (Optionnel) Clé Google Maps si tu l’utilises côté front
+    @cached_property
+    def GOOGLE_MAPS_API_KEY(self) -> str:
+        return os.getenv("GOOGLE_MAPS_API_KEY", "").strip()
+
+    # Timeouts réseau (en secondes) pour requests
+    @cached_property
+    def HTTP_TIMEOUT_SEC(self) -> int:
+        return _get_env_int("HTTP_TIMEOUT_SEC", 45)
+
+    # Cache disque des réponses amont : use (TTL), refresh (toujours refetch),
+    # replay (cache seul, aucun accès réseau) ou off
+    @cached_property
+    def HTTP_CACHE_MODE(self) -> str:
+        mode = _get_env_str("HTTP_CACHE_MODE", "use").lower()
+        return mode if mode in {"use", "refresh", "replay", "off"} else "use"
+
+    @cached_property
+    def HTTP_CACHE_MAX_MB(self) -> int:
+        return _get_env_int("HTTP_CACHE_MAX_MB", 256)
+
+    # Durée de vie (secondes) par source, surchargeable : "openaq=900,open_meteo=1800"
+    @cached_property
+    def HTTP_CACHE_TTLS(self) -> dict[str, int]:
+        ttls = {"open_meteo": 3600, "open_meteo_air": 3600, "openaq": 1800, "default": 3600}
+        for item in _get_env_str("HTTP_CACHE_TTLS", "").split(","):
+            source, _, sec = item.partition("=")
+            try:
+                ttls[source.strip()] = int(sec)
+            except ValueError:
+                continue
+        return ttls
+
+    # ---------- Dossiers projet (chemins relatifs, aucun accès disque) ----------
+    DATA_DIR = Path("data")
+    RAW_DIR = DATA_DIR / "raw"
+    # Stockage brut incrémental, partitionné source/location/date
+    RAW_STORE_DIR = RAW_DIR / "store"
+    # Coordonnées des locations ingérées (nom -> lat/lon), lues par l'index spatial de l'API
+    LOCATIONS_PATH = str(RAW_DIR / "locations.json")
+    INTERIM_DIR = DATA_DIR / "interim"
+    PROCESSED_DIR = DATA_DIR / "processed"
+    MODELS_DIR = Path("models")
+    NOTEBOOKS_DIR = Path("notebooks")
+
+    # ---------- Patterns utiles ----------
+    AIR_QUALITY_RAW_PATTERN = str(RAW_DIR / "air_quality_*.parquet")
+    OPENMETEO_RAW_PATTERN = str(RAW_DIR / "openmeteo_*.parquet")
+    FEATURES_PATH = str(PROCESSED_DIR / "features.parquet")
+    # Dernières lignes (features complètes, cibles encore inconnues) servant à prévoir
+    LATEST_FEATURES_PATH = str(PROCESSED_DIR / "latest_features.parquet")
+    # Lignes ajoutées par le mode incrémental (fusionnées par `features --compact`)
+    FEATURE_PARTS_DIR = str(PROCESSED_DIR / "features_parts")
+    # Features du backfill, une part par tranche : location=<loc>/part-<jour>.parquet
+    FEATURE_HISTORY_DIR = str(PROCESSED_DIR / "features_history")
+    # Historique minimal conservé entre deux runs incrémentaux
+    FEATURE_STATE_PATH = str(INTERIM_DIR / "feature_state.parquet")
+    # Tables de prévisions versionnées écrites par `predict`, servies par l'API
+    FORECASTS_DIR = str(PROCESSED_DIR / "forecasts")
+    MODEL_PATH = str(MODELS_DIR / "model.pkl")
+    METRICS_PATH = str(MODELS_DIR / "metrics.json")
+    # Histogrammes de référence des features d'entraînement (dérive, voir src.utils.sketch)
+    FEATURE_SKETCH_PATH = str(MODELS_DIR / "feature_sketch.json")
+    # Export compact (tableaux plats memory-mappés) du modèle, chargé en priorité
+    FOREST_PATH = str(MODELS_DIR / "model.forest")
+    # Rapports JSON (timings, compteurs) écrits par chaque étape du pipeline
+    RUN_REPORTS_DIR = str(INTERIM_DIR / "reports")
+    # Réponses amont compressées (voir src.utils.http_cache)
+    HTTP_CACHE_DIR = str(DATA_DIR / "cache" / "http")
+    # Manifeste de l'orchestrateur (empreintes des entrées, statut de chaque étape)
+    PIPELINE_MANIFEST_PATH = str(INTERIM_DIR / "pipeline_manifest.json")
+    # Backtest walk-forward : matrices memmap, cache des folds, leaderboard
+    BACKTEST_DIR = str(INTERIM_DIR / "backtest")
+    # Règles d'alerte des abonnés (liste JSON, voir src.pipelines.alerts)
+    ALERT_RULES_PATH = str(DATA_DIR / "alert_rules.json")
+    # Alertes actives (état entre deux runs) et changements d'état émis à chaque run
+    ALERTS_DIR = str(PROCESSED_DIR / "alerts")
+    # Suivi en ligne : sommes d'erreurs par jour, histogrammes récents, rapport
+    MONITOR_DIR = str(INTERIM_DIR / "monitor")
+    # Matrices memmap de l'entraînement hors mémoire (`train --out-of-core`)
+    TRAIN_ARRAYS_DIR = str(INTERIM_DIR / "train_arrays")
+
+    def ensure_dirs(self) -> None:
+        """Crée les dossiers projet (ce que faisait l'import de ce module auparavant)."""
+        for d in (
+            self.DATA_DIR,
+            self.RAW_DIR,
+            self.INTERIM_DIR,
+            self.PROCESSED_DIR,
+            self.MODELS_DIR,
+            self.NOTEBOOKS_DIR,
+        ):
+            d.mkdir(parents=True, exist_ok=True)
+
+
+_settings: Settings | None = None
+_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """Le singleton `Settings`, créé (et .env lu) au premier appel."""
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                _settings = Settings()
+    return _settings
+
+
+def reset_settings() -> None:
+    """Oublie les valeurs lues (tests, ou après avoir changé l'environnement)."""
+    global _settings
+    with _lock:
+        _settings = None
+
+
+def ensure_dirs() -> None:
+    get_settings().ensure_dirs()
+
+
+def __getattr__(name: str):
+    # `from src.config import X` / `cfg.X` : les réglages sont les noms en MAJUSCULES
+    if name.isupper() and hasattr(Settings, name):
+        return getattr(get_settings(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | {n for n in dir(Settings) if n.isupper()})
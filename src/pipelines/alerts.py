@@ -0,0 +1,341 @@
+"""
+Alert engine: every subscriber rule evaluated against the whole forecast table at once.
+
+Rules live in ALERT_RULES_PATH, a JSON list (without it, one rule reproduces the old
+global ALERT_AQI_THRESHOLD check for every location):
+
+    [{"rule_id": "asthma-paris", "subscriber": "alice", "pollutant": "no2",
+      "threshold": 80, "clear_threshold": 60, "min_hours": 3, "horizon_hours": 24,
+      "locations": ["paris", "lyon"]}]            # omitted or "*" = every location
+
+A rule raises for a location when the forecast stays >= `threshold` for `min_hours`
+consecutive hours within the next `horizon_hours`. Once raised it clears only when no
+hour of that window reaches `clear_threshold` (default: threshold x ALERT_CLEAR_RATIO),
+so a forecast hovering around the threshold does not flap.
+
+Each run:
+  1) pivots the newest forecast table into a (locations x lead hours) matrix per pollutant;
+  2) expands the rules into (rule, location) rows and evaluates all of them with a few
+     whole-array operations: thresholds broadcast against the gathered forecast rows,
+     consecutive-hour runs from cumulative sums, hysteresis against the previous state;
+  3) keeps the active alerts in ALERTS_DIR/active.parquet and writes only the state
+     changes (raised / cleared) to ALERTS_DIR/events/events_<version>.parquet.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import src.config as cfg
+from src.utils.instrument import count, run_stage
+from src.utils.io import load_json, save_parquet
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+ACTIVE_COLUMNS = ["rule_id", "subscriber", "location", "pollutant", "threshold", "since", "peak"]
+# (rule, location) rows evaluated per block: bounds the (rows x hours) temporaries
+BLOCK_CELLS = 4_000_000
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    rule_id: str
+    threshold: float
+    subscriber: str = "default"
+    # None: the forecast table's pollutant (ALERT_POLLUTANT when it does not say)
+    pollutant: str | None = None
+    clear_threshold: float | None = None
+    min_hours: int = 1
+    horizon_hours: int = 24
+    # None: every forecast location
+    locations: tuple[str, ...] | None = None
+
+    @property
+    def clear_level(self) -> float:
+        if self.clear_threshold is not None:
+            return self.clear_threshold
+        return self.threshold * cfg.ALERT_CLEAR_RATIO
+
+
+def default_rules() -> list[AlertRule]:
+    return [
+        AlertRule("default", float(cfg.ALERT_AQI_THRESHOLD), horizon_hours=cfg.MAX_HORIZON_HOURS)
+    ]
+
+
+def load_rules(path: str | None = None) -> list[AlertRule]:
+    path = path or cfg.ALERT_RULES_PATH
+    if not os.path.exists(path):
+        return default_rules()
+    rules = []
+    for raw in load_json(path):
+        locs = raw.get("locations")
+        rules.append(
+            AlertRule(**{**raw, "locations": None if locs in (None, "*") else tuple(locs)})
+        )
+    ids = [r.rule_id for r in rules]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"duplicate rule_id in {path}")
+    return rules
+
+
+# ---------- Forecast matrix ----------
+@dataclass(frozen=True)
+class ForecastMatrix:
+    """One pollutant's forecasts: row i = locations[i], column j = its (j+1)-th hour."""
+
+    locations: np.ndarray
+    values: np.ndarray  # (locations, hours) float64, NaN where a location has fewer hours
+    times: np.ndarray  # same shape, datetime64[ns] UTC
+
+    @classmethod
+    def from_table(cls, table: pd.DataFrame) -> ForecastMatrix:
+        table = table.sort_values(["location", "time"])
+        codes, locations = pd.factorize(table["location"].astype(str), sort=True)
+        cols = table.groupby(codes).cumcount().to_numpy()
+        shape = (len(locations), int(cols.max()) + 1 if len(cols) else 0)
+        values = np.full(shape, np.nan)
+        values[codes, cols] = table["y_pred"].to_numpy(dtype="float64")
+        times = np.full(shape, np.datetime64("NaT"), dtype="datetime64[ns]")
+        stamps = pd.DatetimeIndex(pd.to_datetime(table["time"], utc=True)).tz_localize(None)
+        times[codes, cols] = stamps.to_numpy(dtype="datetime64[ns]")
+        return cls(np.asarray(locations, dtype=object), values, times)
+
+
+def forecast_matrices(table: pd.DataFrame) -> dict[str, ForecastMatrix]:
+    if "pollutant" not in table.columns:
+        return {cfg.ALERT_POLLUTANT: ForecastMatrix.from_table(table)}
+    return {str(p): ForecastMatrix.from_table(t) for p, t in table.groupby("pollutant")}
+
+
+# ---------- Evaluation ----------
+def _run_lengths(hits: np.ndarray) -> np.ndarray:
+    """Length of the run of consecutive True ending at each cell, row-wise."""
+    total = np.cumsum(hits, axis=1, dtype=np.int16)
+    reset = np.maximum.accumulate(np.where(hits, np.int16(0), total), axis=1)
+    return total - reset
+
+
+def _expand(rules: list[AlertRule], pollutant: str, matrix: ForecastMatrix):
+    """(rule index, location index) of every (rule, location) row for `pollutant`."""
+    position = {loc: i for i, loc in enumerate(matrix.locations)}
+    every = np.arange(len(matrix.locations))
+    rule_idx, loc_idx = [], []
+    for i, rule in enumerate(rules):
+        if (rule.pollutant or cfg.ALERT_POLLUTANT) != pollutant:
+            continue
+        if rule.locations is None:
+            locs = every
+        else:
+            locs = np.array([position[x] for x in rule.locations if x in position], dtype=int)
+        rule_idx.append(np.full(len(locs), i))
+        loc_idx.append(locs)
+    if not rule_idx:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    return np.concatenate(rule_idx), np.concatenate(loc_idx)
+
+
+def evaluate(
+    rules: list[AlertRule], matrices: dict[str, ForecastMatrix], active: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    The (rule, location) rows that were or are now active: their previous (`was`) and
+    new (`active`) state, the window peak and the onset time of the sustained
+    exceedance. Rows inactive before and after are evaluated but not returned.
+    """
+    thr = np.array([r.threshold for r in rules], dtype="float64")
+    clear = np.array([r.clear_level for r in rules], dtype="float64")
+    min_hours = np.array([max(1, r.min_hours) for r in rules])
+    horizon = np.array([r.horizon_hours for r in rules])
+    rule_ids = np.array([r.rule_id for r in rules], dtype=object)
+    subscribers = np.array([r.subscriber for r in rules], dtype=object)
+    # previously active (rule, location) pairs as positions (-1: unknown)
+    prev_rule = pd.Index(rule_ids).get_indexer(active["rule_id"].astype(str))
+
+    frames = []
+    for pollutant, m in matrices.items():
+        rule_idx, loc_idx = _expand(rules, pollutant, m)
+        if not len(rule_idx):
+            continue
+        # previous state as integer (rule, location) keys: one np.isin, no string joins
+        n_loc = len(m.locations)
+        prev_loc = pd.Index(m.locations).get_indexer(active["location"].astype(str))
+        known = (prev_rule >= 0) & (prev_loc >= 0)
+        prev = prev_rule[known] * n_loc + prev_loc[known]
+        was_all = np.isin(rule_idx * n_loc + loc_idx, prev)
+        # no rule looks past its own horizon: skip the columns none of them reads
+        n_hours = min(m.values.shape[1], int(horizon[np.unique(rule_idx)].max()))
+        hours = np.arange(n_hours)
+        block = max(1, BLOCK_CELLS // max(1, n_hours))
+        keep, on, still, peak, onset = [], [], [], [], []
+        for start in range(0, len(rule_idx), block):
+            sl = slice(start, start + block)
+            r, loc, was = rule_idx[sl], loc_idx[sl], was_all[sl]
+            V = m.values[loc, :n_hours]
+            window = hours < horizon[r][:, None]
+            exceed = (V >= thr[r][:, None]) & window
+            sustained = _run_lengths(exceed) >= min_hours[r][:, None]
+            hit = sustained.any(axis=1)
+            rows = np.flatnonzero(hit | was)
+            if not len(rows):
+                continue
+            r, loc, V, window, sustained = (
+                r[rows],
+                loc[rows],
+                V[rows],
+                window[rows],
+                sustained[rows],
+            )
+            keep.append(rows + start)
+            on.append(hit[rows])
+            still.append(((V >= clear[r][:, None]) & window).any(axis=1))
+            peak.append(np.where(window & ~np.isnan(V), V, -np.inf).max(axis=1))
+            first = np.maximum(sustained.argmax(axis=1) - min_hours[r] + 1, 0)
+            onset.append(m.times[loc, first])
+        if not keep:
+            continue
+
+        keep = np.concatenate(keep)
+        r, was = rule_idx[keep], was_all[keep]
+        on, still, peak = np.concatenate(on), np.concatenate(still), np.concatenate(peak)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "rule_id": rule_ids[r],
+                    "subscriber": subscribers[r],
+                    "location": m.locations[loc_idx[keep]],
+                    "pollutant": pollutant,
+                    "threshold": thr[r],
+                    "was": was,
+                    # hysteresis: raise on the threshold, clear below the clear level
+                    "active": np.where(was, still, on),
+                    # -inf: no forecast hour in the window
+                    "peak": np.where(np.isinf(peak), np.nan, peak),
+                    "onset": np.concatenate(onset),
+                }
+            )
+        )
+    if not frames:
+        # same columns as the frames above, typed, so boolean masks on `active` still
+        # select rows
+        return (
+            _empty_active()
+            .drop(columns="since")
+            .assign(
+                was=pd.Series(dtype="bool"),
+                active=pd.Series(dtype="bool"),
+                onset=pd.Series(dtype="datetime64[ns]"),
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def step(
+    rules: list[AlertRule], table: pd.DataFrame, active: pd.DataFrame, issue_time
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(new active alerts, state-change events) for one forecast table."""
+    issue_time = pd.Timestamp(issue_time)
+    rows = evaluate(rules, forecast_matrices(table), active)
+    # alerts not evaluated this time (location missing from the table) keep their
+    # state; those of rules that were removed are dropped. Every evaluated alert that
+    # was active comes back in `rows`.
+    evaluated = pd.MultiIndex.from_frame(rows[["rule_id", "location"]].astype(str))
+    keys = pd.MultiIndex.from_frame(active[["rule_id", "location"]].astype(str))
+    known = active["rule_id"].isin([r.rule_id for r in rules]).to_numpy()
+    kept = active[known & ~keys.isin(evaluated)]
+
+    now_active = rows[rows["active"]].merge(
+        active[["rule_id", "location", "since"]], on=["rule_id", "location"], how="left"
+    )
+    now_active["since"] = now_active["since"].fillna(issue_time)
+    new_active = pd.concat(
+        [kept, now_active[ACTIVE_COLUMNS]] if len(kept) else [now_active[ACTIVE_COLUMNS]],
+        ignore_index=True,
+    )
+
+    changed = rows[rows["was"] != rows["active"]]
+    events = changed.assign(
+        event=np.where(changed["active"], "raised", "cleared"),
+        issue_time=issue_time,
+        onset=changed["onset"].where(changed["active"]),
+    )[
+        [
+            "event",
+            "rule_id",
+            "subscriber",
+            "location",
+            "pollutant",
+            "threshold",
+            "peak",
+            "onset",
+            "issue_time",
+        ]
+    ]
+    return new_active.reset_index(drop=True), events.reset_index(drop=True)
+
+
+# ---------- Run ----------
+def _empty_active() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "rule_id": pd.Series(dtype="object"),
+            "subscriber": pd.Series(dtype="object"),
+            "location": pd.Series(dtype="object"),
+            "pollutant": pd.Series(dtype="object"),
+            "threshold": pd.Series(dtype="float64"),
+            "since": pd.Series(dtype="datetime64[ns, UTC]"),
+            "peak": pd.Series(dtype="float64"),
+        }
+    )
+
+
+def run_alerts(
+    rules: list[AlertRule] | None = None,
+    directory: str | None = None,
+    keep_versions: int = 24 * 7,
+) -> pd.DataFrame:
+    """Evaluate the newest forecast table; returns (and writes) the state changes."""
+    rules = load_rules() if rules is None else rules
+    directory = directory or cfg.ALERTS_DIR
+    paths = sorted(glob.glob(f"{cfg.FORECASTS_DIR}/forecast_*.parquet"))
+    if not paths:
+        print("[WARN] No forecast table yet. Run: python -m src.pipelines.predict first.")
+        return pd.DataFrame()
+    version = os.path.basename(paths[-1])[len("forecast_") : -len(".parquet")]
+    table = pd.read_parquet(paths[-1])
+    issue_time = (
+        table["issue_time"].max() if "issue_time" in table.columns else datetime.now(timezone.utc)
+    )
+
+    active_path = f"{directory}/active.parquet"
+    active = pd.read_parquet(active_path) if os.path.exists(active_path) else _empty_active()
+    active, events = step(rules, table, active, issue_time)
+    save_parquet(active, active_path)
+    if len(events):
+        save_parquet(events, f"{directory}/events/events_{version}.parquet")
+    for old in sorted(glob.glob(f"{directory}/events/events_*.parquet"))[:-keep_versions]:
+        os.remove(old)
+
+    for kind in ("raised", "cleared"):
+        n = int((events["event"] == kind).sum()) if len(events) else 0
+        count("tempo_alert_events_total", n, "Alert state changes", event=kind)
+    print(f"Alerts OK: {len(active)} active, {len(events)} changes, {len(rules)} rules")
+    return events
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Evaluate alert rules on the newest forecast.")
+    parser.add_argument("--rules", help=f"JSON rules file (default: {cfg.ALERT_RULES_PATH})")
+    args = parser.parse_args(argv)
+    with run_stage("alerts", cfg.RUN_REPORTS_DIR):
+        run_alerts(load_rules(args.rules))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# src/pipelines/backtest.py
+"""
+Walk-forward backtest and hyperparameter search for the forecasting forest.
+
+    python -m src.pipelines.backtest --folds 5 --mode expanding --workers 4
+    python -m src.pipelines.backtest --grid '{"n_estimators": [100, 300], "max_depth": [null, 16]}'
+
+Every (params, fold) cell is fitted in a process pool. The feature matrix is written
+once as .npy files and memory-mapped by the workers, so it is not pickled to each of
+them. Each finished cell is cached as JSON under its content hash (data, params,
+fold bounds): re-running the same grid only fits the new cells. Per-fold metrics are
+averaged into a leaderboard ranked by RMSE on the headline (24h) lead.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+
+import src.config as cfg
+from src.pipelines.features import read_features
+from src.pipelines.train import lead_hours, make_model, xy
+from src.utils.instrument import count, run_stage
+from src.utils.io import atomic_write, save_json
+from src.utils.lazy import lazy_import
+from src.utils.metrics import compute_metrics
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+BACKTEST_DIR = cfg.BACKTEST_DIR
+
+DEFAULT_GRID = {"n_estimators": [100, 200], "max_depth": [None, 12], "min_samples_leaf": [1, 5]}
+
+
+# ---------- Folds ----------
+@dataclass(frozen=True)
+class Fold:
+    index: int
+    train: tuple[int, int]  # [start, stop) row positions
+    test: tuple[int, int]
+
+
+def walk_forward_folds(
+    n: int,
+    n_folds: int = 5,
+    test_size: int | None = None,
+    mode: str = "expanding",
+    gap: int = 0,
+) -> list[Fold]:
+    """
+    Consecutive test blocks at the end of the series, each trained on the rows before it.
+
+    `gap` rows are left out between train and test: a row's targets look `gap` hours
+    ahead, so without it the last training targets would overlap the test period.
+    "expanding" trains from the first row; "sliding" keeps the first fold's train length.
+    """
+    if mode not in ("expanding", "sliding"):
+        raise ValueError(f"mode must be 'expanding' or 'sliding', got {mode!r}")
+    test_size = test_size or (n - gap) // (n_folds + 1)
+    first_test = n - n_folds * test_size
+    window = first_test - gap
+    if test_size < 1 or window < 1:
+        raise ValueError(f"{n} rows are too few for {n_folds} folds (gap={gap})")
+    folds = []
+    for k in range(n_folds):
+        test_start = first_test + k * test_size
+        train_stop = test_start - gap
+        train_start = 0 if mode == "expanding" else train_stop - window
+        folds.append(Fold(k, (train_start, train_stop), (test_start, test_start + test_size)))
+    return folds
+
+
+def time_folds(
+    times,
+    n_folds: int = 5,
+    test_hours: int | None = None,
+    mode: str = "expanding",
+    gap_hours: int = 0,
+) -> list[Fold]:
+    """
+    `walk_forward_folds` on timestamps, for rows sorted by time that may hold several
+    locations per hour. Test blocks are runs of whole hours (every location), and
+    training rows stop `gap_hours` hours before each block, so no training target
+    reaches into it. Folds are still [start, stop) row positions.
+    """
+    times = np.asarray(times, dtype="datetime64[ns]")
+    hours = np.unique(times)
+    gap = np.timedelta64(int(gap_hours), "h")
+    # block sizes in distinct hours; the gap itself is applied on times below
+    blocks = walk_forward_folds(len(hours), n_folds, test_hours, mode, gap_hours)
+    window = hours[blocks[0].test[0]] - gap - hours[0]
+    folds = []
+    for b in blocks:
+        start, last = hours[b.test[0]], hours[b.test[1] - 1]
+        cut = start - gap
+        train_start = 0 if mode == "expanding" else np.searchsorted(times, cut - window, "left")
+        folds.append(
+            Fold(
+                b.index,
+                (int(train_start), int(np.searchsorted(times, cut, "left"))),
+                (
+                    int(np.searchsorted(times, start, "left")),
+                    int(np.searchsorted(times, last, "right")),
+                ),
+            )
+        )
+    return folds
+
+
+def param_grid(grid: dict) -> list[dict]:
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+# ---------- Shared arrays ----------
+def _digest(*parts) -> str:
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else json.dumps(p, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
+def share_arrays(X: pd.DataFrame, Y: pd.DataFrame, directory: str) -> tuple[str, str]:
+    """
+    Write X and Y as .npy under <directory>/arrays/<content hash>/ (once) for the
+    workers to memory-map. Returns (arrays dir, data key).
+    """
+    x = np.ascontiguousarray(X.to_numpy(dtype=np.float64))
+    y = np.ascontiguousarray(Y.to_numpy(dtype=np.float64))
+    key = _digest(list(X.columns), list(Y.columns), x.tobytes(), y.tobytes())
+    arrays_dir = os.path.join(directory, "arrays", key)
+    for name, arr in (("X.npy", x), ("Y.npy", y)):
+        path = os.path.join(arrays_dir, name)
+        if not os.path.exists(path):
+            with atomic_write(path) as tmp, open(tmp, "wb") as f:
+                np.save(f, arr)
+    return arrays_dir, key
+
+
+# per-process cache: each worker maps the arrays once, not once per cell
+_MAPPED: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+
+def _mapped(arrays_dir: str) -> tuple[np.ndarray, np.ndarray]:
+    if arrays_dir not in _MAPPED:
+        _MAPPED[arrays_dir] = (
+            np.load(os.path.join(arrays_dir, "X.npy"), mmap_mode="r"),
+            np.load(os.path.join(arrays_dir, "Y.npy"), mmap_mode="r"),
+        )
+    return _MAPPED[arrays_dir]
+
+
+# ---------- Cells ----------
+def _run_cell(arrays_dir: str, params: dict, fold: Fold, main_idx: int) -> dict:
+    """Fit one (params, fold) cell in a worker and score it on the fold's test block."""
+    X, Y = _mapped(arrays_dir)
+    (a, b), (c, d) = fold.train, fold.test
+    # one core per model: the parallelism is across cells
+    model = make_model(params, n_jobs=1)
+    t0 = time.perf_counter()
+    model.fit(X[a:b], Y[a:b] if Y.shape[1] > 1 else Y[a:b, 0])
+    fit_seconds = time.perf_counter() - t0
+    y_true = np.asarray(Y[c:d])
+    y_pred = model.predict(X[c:d]).reshape(d - c, -1)
+    metrics = compute_metrics(y_true[:, main_idx], y_pred[:, main_idx])
+    metrics["RMSE_all_leads"] = float(np.sqrt(np.mean((y_true - y_pred) ** 2)))
+    return {
+        "params": params,
+        "fold": fold.index,
+        "train": list(fold.train),
+        "test": list(fold.test),
+        **metrics,
+        "fit_seconds": round(fit_seconds, 4),
+    }
+
+
+def run_backtest(
+    df: pd.DataFrame | None = None,
+    grid: dict | None = None,
+    n_folds: int = 5,
+    mode: str = "expanding",
+    test_size: int | None = None,
+    gap: int | None = None,
+    workers: int | None = None,
+    directory: str = BACKTEST_DIR,
+) -> pd.DataFrame:
+    """
+    Evaluate every grid point on every fold; return (and save) the leaderboard.
+    With a `time` column, `test_size` and `gap` are in hours and folds are cut on
+    timestamps across all locations; otherwise they are in rows.
+    """
+    df = read_features() if df is None else df
+    if "time" in df.columns:
+        # the locations of one hour are adjacent, so every time cut is a row position
+        order = [c for c in ("time", "location") if c in df.columns]
+        df = df.sort_values(order, kind="stable", ignore_index=True)
+    X, Y, target_cols = xy(df)
+    leads = lead_hours(target_cols)
+    main_idx = target_cols.index("y_next_24h") if "y_next_24h" in target_cols else 0
+    gap = max(leads) if gap is None else gap
+
+    if "time" in df.columns:
+        times = pd.to_datetime(df.loc[X.index, "time"], utc=True).dt.tz_localize(None)
+        folds = time_folds(times.to_numpy(), n_folds, test_size, mode, gap)
+    else:
+        folds = walk_forward_folds(len(X), n_folds, test_size, mode, gap)
+    arrays_dir, data_key = share_arrays(X, Y, directory)
+    cells_dir = os.path.join(directory, "cells")
+    os.makedirs(cells_dir, exist_ok=True)
+
+    results, pending = [], {}
+    for params in param_grid(grid or DEFAULT_GRID):
+        for fold in folds:
+            key = _digest(data_key, params, asdict(fold), main_idx)
+            path = os.path.join(cells_dir, f"{key}.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    results.append(json.load(f))
+            else:
+                pending[key] = (params, fold)
+    count("tempo_backtest_cells_total", len(results), "Backtest cells", status="cached")
+    print(f"[INFO] Backtest: {len(pending)} cells to fit, {len(results)} cached")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_run_cell, arrays_dir, params, fold, main_idx): key
+                for key, (params, fold) in pending.items()
+            }
+            for fut in as_completed(futures):
+                cell = fut.result()
+                # cached as soon as it finishes: an interrupted run keeps its progress
+                with atomic_write(os.path.join(cells_dir, f"{futures[fut]}.json")) as tmp:
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        json.dump(cell, f)
+                results.append(cell)
+        count("tempo_backtest_cells_total", len(pending), "Backtest cells", status="computed")
+
+    board = leaderboard(results)
+    save_json(
+        {
+            "target_col": target_cols[main_idx],
+            "mode": mode,
+            "gap": gap,
+            "folds": [asdict(f) for f in folds],
+            "leaderboard": board.to_dict(orient="records"),
+        },
+        os.path.join(directory, "leaderboard.json"),
+    )
+    return board
+
+
+def leaderboard(results: list[dict]) -> pd.DataFrame:
+    """Mean/std of the per-fold metrics for each parameter set, best RMSE first."""
+    cells = pd.DataFrame(results)
+    cells["params"] = [json.dumps(p, sort_keys=True) for p in cells["params"]]
+    board = cells.groupby("params").agg(
+        RMSE_mean=("RMSE", "mean"),
+        RMSE_std=("RMSE", "std"),
+        MAE_mean=("MAE", "mean"),
+        MAPE_mean=("MAPE", "mean"),
+        RMSE_all_leads_mean=("RMSE_all_leads", "mean"),
+        folds=("fold", "nunique"),
+        fit_seconds=("fit_seconds", "sum"),
+    )
+    board = board.sort_values("RMSE_mean").reset_index()
+    board.insert(0, "rank", np.arange(1, len(board) + 1))
+    return board
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Walk-forward backtest + grid search.")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--mode", choices=("expanding", "sliding"), default="expanding")
+    parser.add_argument(
+        "--test-size",
+        type=int,
+        default=None,
+        help="test fold length: hours when the features have a time column, else rows",
+    )
+    parser.add_argument(
+        "--gap",
+        type=int,
+        default=None,
+        help="gap between train and test: hours with a time column, else rows "
+        "(default: the longest lead)",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--grid", type=json.loads, default=None, help="JSON {param: [values]}")
+    args = parser.parse_args(argv)
+
+    with run_stage("backtest", cfg.RUN_REPORTS_DIR, folds=args.folds, mode=args.mode):
+        board = run_backtest(
+            grid=args.grid,
+            n_folds=args.folds,
+            mode=args.mode,
+            test_size=args.test_size,
+            gap=args.gap,
+            workers=args.workers,
+        )
+    print("Backtest OK:")
+    print(board.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Declarative lag/rolling/calendar/wind features, computed in one vectorized pass.
+
+    spec = FeatureSpec(
+        groups=(ColumnGroup(("no2", "pm25"), lags=(1, 3), windows=(6,), aggs=("mean", "std")),),
+        calendar=True,
+        wind=("wind_speed_10m", "wind_direction_10m"),
+    )
+    feats = spec.apply(hourly)      # new columns only, same index as `hourly`
+
+Each group's source columns (those present) are taken as one 2-D NumPy block; every
+lag is one shifted slice of the block and every window reduction a few whole-block
+operations on its aligned slices, written straight into a preallocated (rows, columns,
+features) array. The cost of an operation is therefore independent of how many columns
+it covers, and the output frame is built once instead of one column insert at a time.
+
+Names follow the historical scheme: `{col}_lag{h}`, `{col}_roll{w}_{agg}`,
+`hour_sin`/`hour_cos`/`dow_sin`/`dow_cos` and `wind_u`/`wind_v`. Windows are
+trailing and need `w` complete hours (pandas `rolling(w)` semantics, std with ddof=1).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+AGGREGATIONS = ("mean", "std", "min", "max")
+CALENDAR_COLUMNS = ("hour_sin", "hour_cos", "dow_sin", "dow_cos")
+
+
+@dataclass(frozen=True)
+class ColumnGroup:
+    columns: tuple[str, ...]
+    lags: tuple[int, ...] = ()
+    windows: tuple[int, ...] = ()
+    aggs: tuple[str, ...] = ("mean",)
+
+    def __post_init__(self):
+        unknown = set(self.aggs) - set(AGGREGATIONS)
+        if unknown:
+            raise ValueError(f"unknown aggregation(s) {sorted(unknown)}; use {AGGREGATIONS}")
+
+    @property
+    def kinds(self) -> list[str]:
+        """Feature suffixes, in output order, for each column of the group."""
+        return [f"lag{h}" for h in self.lags] + [
+            f"roll{w}_{agg}" for w in self.windows for agg in self.aggs
+        ]
+
+    def compute(self, block: np.ndarray) -> np.ndarray:
+        """(rows, columns) float block -> (rows, columns * len(kinds)), column-major names."""
+        n, c = block.shape
+        out = np.full((n, c, len(self.kinds)), np.nan)
+        k = 0
+        for h in self.lags:
+            if h < n:
+                out[h:, :, k] = block[:-h]
+            k += 1
+        for w in self.windows:
+            if w > n:
+                k += len(self.aggs)
+                continue
+            # the w aligned (rows - w + 1, columns) slices of each window, as views: every
+            # reduction is w whole-block NumPy ops, summed in the same order wherever the
+            # block starts (incremental and full builds agree bit for bit)
+            m = n - w + 1
+            slices = [block[j : j + m] for j in range(w)]
+            mean = sum(slices[1:], slices[0].copy()) / w
+            for agg in self.aggs:
+                if agg == "mean":
+                    values = mean
+                elif agg == "std":
+                    values = np.sqrt(sum((x - mean) ** 2 for x in slices) / (w - 1))
+                else:
+                    reduce = np.maximum if agg == "max" else np.minimum
+                    values = slices[0].copy()
+                    for x in slices[1:]:
+                        reduce(values, x, out=values)
+                out[w - 1 :, :, k] = values
+                k += 1
+        return out.reshape(n, c * len(self.kinds))
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    groups: tuple[ColumnGroup, ...] = ()
+    # hour-of-day and day-of-week as sin/cos pairs
+    calendar: bool = False
+    # (speed, direction in degrees) -> u/v wind components
+    wind: tuple[str, str] | None = None
+
+    @property
+    def lookback(self) -> int:
+        """Rows of history a new hour needs for complete lag/window features."""
+        return max((max((*g.lags, *g.windows), default=0) for g in self.groups), default=0)
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """The spec's feature columns for hourly, time-indexed `df` (one frame, one pass)."""
+        blocks, names = [], []
+        for group in self.groups:
+            cols = [c for c in group.columns if c in df.columns]
+            if not cols or not group.kinds:
+                continue
+            block = df[cols].to_numpy(dtype="float64")
+            blocks.append(group.compute(block))
+            names += [f"{col}_{kind}" for col in cols for kind in group.kinds]
+
+        if self.calendar and isinstance(df.index, pd.DatetimeIndex):
+            hour = df.index.hour.to_numpy() + df.index.minute.to_numpy() / 60
+            dow = df.index.dayofweek.to_numpy() + hour / 24
+            # (rows, 2) angles -> sin block and cos block in one call each
+            angles = np.column_stack([hour * (2 * np.pi / 24), dow * (2 * np.pi / 7)])
+            sin, cos = np.sin(angles), np.cos(angles)
+            blocks.append(np.column_stack([sin[:, 0], cos[:, 0], sin[:, 1], cos[:, 1]]))
+            names += list(CALENDAR_COLUMNS)
+
+        if self.wind and all(c in df.columns for c in self.wind):
+            speed, direction = (df[c].to_numpy(dtype="float64") for c in self.wind)
+            theta = np.deg2rad(direction)
+            # meteorological convention: direction the wind blows from
+            blocks.append(np.column_stack([-speed * np.sin(theta), -speed * np.cos(theta)]))
+            names += ["wind_u", "wind_v"]
+
+        if not blocks:
+            return pd.DataFrame(index=df.index)
+        return pd.DataFrame(np.hstack(blocks), index=df.index, columns=names)
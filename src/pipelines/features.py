@@ -1,17 +1,58 @@
 # src/pipelines/features.py
 from __future__ import annotations
 
+import argparse
 import glob
-
-import pandas as pd
+import os
+import re
+import shutil
+from datetime import datetime, timezone
 
 # Import config safely (works with or without FEATURES_PATH in config)
 import src.config as cfg
+from src.pipelines.feature_spec import ColumnGroup, FeatureSpec
+from src.utils.instrument import count, run_stage, timer
+from src.utils.io import load_json, save_json, save_parquet
+from src.utils.lazy import lazy_import
+from src.utils.raw_store import RawStore
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pq = lazy_import("pyarrow.parquet")
 
 RAW_DIR = cfg.RAW_DIR
 PROCESSED_DIR = cfg.PROCESSED_DIR
 # default output path if FEATURES_PATH not present in config
 FEATURES_PATH = getattr(cfg, "FEATURES_PATH", str(PROCESSED_DIR / "features.parquet"))
+FEATURE_PARTS_DIR = cfg.FEATURE_PARTS_DIR
+LATEST_FEATURES_PATH = cfg.LATEST_FEATURES_PATH
+FEATURE_STATE_PATH = cfg.FEATURE_STATE_PATH
+FEATURE_HISTORY_DIR = cfg.FEATURE_HISTORY_DIR
+RAW_STORE_DIR = cfg.RAW_STORE_DIR
+
+# Upstream pollutant names -> the names features are built on
+AQ_ALIASES = {
+    "pm2.5": "pm25",
+    "pm2_5": "pm25",
+    "nitrogen_dioxide": "no2",
+    "ozone": "o3",
+    "carbon_monoxide": "co",
+    "sulphur_dioxide": "so2",
+}
+# Derived columns of every hourly block; a group only uses the columns it finds
+FEATURE_SPEC = FeatureSpec(
+    groups=(
+        ColumnGroup(("no2", "pm25"), lags=(1, 3, 6), windows=(6,), aggs=("mean", "std")),
+        ColumnGroup(("o3", "pm10", "co", "so2"), lags=(1, 6), windows=(6,), aggs=("mean",)),
+    ),
+    calendar=True,
+    wind=("wind_speed_10m", "wind_direction_10m"),
+)
+# rows of history a new hour needs to get complete lag/rolling features
+LOOKBACK_HOURS = FEATURE_SPEC.lookback
+# one target column y_next_{h}h per lead time; a single multi-output model learns them all
+HORIZONS = tuple(range(1, cfg.MAX_HORIZON_HOURS + 1))
+TARGET_RE = re.compile(r"y_next_(\d+)?h")
 
 
 # ---------------------------------------------------------------------
@@ -37,12 +78,130 @@ def _resample_hourly_mean(df: pd.DataFrame, ts_col: str, tz_aware: bool = True)
     return out
 
 
+def target_columns(df: pd.DataFrame) -> list[str]:
+    """Target columns (y_next_{h}h, legacy y_next_h) ordered by lead time."""
+    cols = [c for c in df.columns if TARGET_RE.fullmatch(c)]
+    return sorted(cols, key=lambda c: int(TARGET_RE.fullmatch(c).group(1) or 0))
+
+
+def _add_features(
+    df: pd.DataFrame, target_priority, horizons=HORIZONS
+) -> tuple[pd.DataFrame, str | None]:
+    """Add the FEATURE_SPEC columns and one t + h target per lead time, in one concat."""
+    parts = [df, FEATURE_SPEC.apply(df)]
+    target = next((c for c in target_priority if c in df.columns), None)
+    if target:
+        # targets t + h for every lead, as one shifted 2-D block
+        y = df[target].to_numpy(dtype="float64")
+        shifted = np.full((len(y), len(horizons)), np.nan)
+        for j, h in enumerate(horizons):
+            if h < len(y):
+                shifted[: len(y) - h, j] = y[h:]
+        parts.append(
+            pd.DataFrame(shifted, index=df.index, columns=[f"y_next_{h}h" for h in horizons])
+        )
+    return pd.concat(parts, axis=1), target
+
+
+def _latest_rows(df: pd.DataFrame, n: int) -> pd.DataFrame:
+    """Last `n` rows whose features are complete; their targets are still in the future."""
+    feats = df.drop(columns=target_columns(df))
+    return feats.dropna().tail(n)
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """float32 for float columns and a categorical location: about half of pandas' defaults."""
+    dtypes = {c: "float32" for c in df.select_dtypes(include=["float64"]).columns}
+    if "location" in df.columns:
+        dtypes["location"] = "category"
+    return df.astype(dtypes)
+
+
+def write_features(df: pd.DataFrame, path: str) -> None:
+    """
+    Write feature rows in the store layout: compact dtypes, rows sorted by
+    (time, location) and cut into FEATURE_ROW_GROUP_ROWS row groups, so the min/max
+    statistics of each group let time-range reads skip the others.
+    """
+    keys = [c for c in ("time", "location") if c in df.columns]
+    df = compact_dtypes(df).sort_values(keys, kind="stable") if keys else compact_dtypes(df)
+    save_parquet(df, path, row_group_size=cfg.FEATURE_ROW_GROUP_ROWS)
+
+
+def _as_utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def read_features(
+    path: str = FEATURES_PATH,
+    parts_dir: str | None = FEATURE_PARTS_DIR,
+    columns=None,
+    start=None,
+    end=None,
+    targets: bool = True,
+) -> pd.DataFrame:
+    """
+    Read the feature store: the full build plus any incrementally appended parts.
+
+    Only `columns` (plus time/location) are decoded, and without the y_next_* targets
+    if `targets` is False. `start` (inclusive) / `end` (exclusive) are pushed down to
+    pyarrow as filters, so row groups outside the range are not read.
+    """
+    paths = [path] if os.path.exists(path) else []
+    if parts_dir:
+        paths += sorted(glob.glob(f"{parts_dir}/part-*.parquet"))
+    if not paths:
+        raise FileNotFoundError(f"No features at {path} or {parts_dir}")
+    filters = []
+    if start is not None:
+        filters.append(("time", ">=", _as_utc(start)))
+    if end is not None:
+        filters.append(("time", "<", _as_utc(end)))
+    wanted = None if columns is None else {"time", "location", *columns}
+
+    frames = []
+    with timer("tempo_parquet_read_seconds", "Parquet read time", source="features"):
+        for p in paths:
+            names = pq.read_schema(p).names
+            cols = [
+                c
+                for c in names
+                if (wanted is None or c in wanted) and (targets or not TARGET_RE.fullmatch(c))
+            ]
+            table = pq.read_table(p, columns=cols, filters=filters or None)
+            frames.append(table.to_pandas())
+    if len(frames) == 1:
+        return frames[0]
+    if any("location" in f.columns for f in frames):
+        # the full build of the default point has no location column, the parts do:
+        # without one its rows would concat as location=NaN
+        frames = [f if "location" in f.columns else f.assign(location="default") for f in frames]
+    df = pd.concat(frames, ignore_index=True)
+    # parts carry their own location categories; concat falls back to object
+    return df.astype({"location": "category"}) if "location" in df.columns else df
+
+
+def read_latest_features() -> pd.DataFrame:
+    """Newest feature rows to forecast from; falls back to the feature store."""
+    if os.path.exists(LATEST_FEATURES_PATH):
+        return pd.read_parquet(LATEST_FEATURES_PATH)
+    return read_features(targets=False)
+
+
+def _reset_incremental_state() -> None:
+    shutil.rmtree(FEATURE_PARTS_DIR, ignore_errors=True)
+    for p in (FEATURE_STATE_PATH, f"{FEATURE_STATE_PATH}.json"):
+        if os.path.exists(p):
+            os.remove(p)
+
+
 # ---------------------------------------------------------------------
 # Features builder
 # ---------------------------------------------------------------------
 def build_features(
     target_priority: list[str] = ("no2", "pm25"),
-    horizon_hours: int = 24,
+    horizons: tuple[int, ...] = HORIZONS,
     impute_limit: int = 3,
 ) -> str | None:
     """
@@ -55,8 +214,9 @@ def build_features(
       2) align hourly timestamps
       3) join
       4) create lags & rolling stats
-      5) create target at t + horizon_hours (column 'y_next_24h')
-      6) dropna & save
+      5) create targets at t + h for every h in `horizons` (columns 'y_next_{h}h')
+      6) dropna & save; the newest rows (features complete, targets not yet known)
+         go to LATEST_FEATURES_PATH for forecasting
     """
 
     # 1) Locate latest files
@@ -82,8 +242,8 @@ def build_features(
             print("[WARN] AQ missing recognizable time column; skipping AQ.")
             aq = pd.DataFrame()
 
-        # Harmonize names (just in case)
-        aq = aq.rename(columns={"pm2.5": "pm25"})
+        # Harmonize names (OpenAQ / Open-Meteo Air)
+        aq = aq.rename(columns=AQ_ALIASES)
     else:
         print("[INFO] AQ is empty (no file or empty fetch).")
 
@@ -108,46 +268,272 @@ def build_features(
     else:
         df = meteo.join(aq, how="left")
 
+    # Newest real pollutant observation: weather extends into the future, and rows past
+    # this point only carry forward-filled pollutant values
+    last_obs = aq.dropna(how="all").index.max() if not aq.empty else df.index.max()
+
     # 5) Light imputation for small gaps
     df = df.sort_index()
     df = df.interpolate(limit=impute_limit).ffill().bfill()
 
-    # 6) Create lags/rolling for pollutants if present
-    pollutants = [c for c in ["no2", "pm25"] if c in df.columns]
-    for col in pollutants:
-        for h in (1, 3, 6):
-            df[f"{col}_lag{h}"] = df[col].shift(h)
-        df[f"{col}_roll6_mean"] = df[col].rolling(6).mean()
-        df[f"{col}_roll6_std"] = df[col].rolling(6).std()
-
-    # 7) Target t + horizon_hours; we write explicit name y_next_24h for compatibility
-    target: str | None = None
-    for cand in target_priority:
-        if cand in df.columns:
-            target = cand
-            break
-
-    if target:
-        target_col = f"y_next_{horizon_hours}h"
-        df[target_col] = df[target].shift(-horizon_hours)
-    else:
+    # 6-7) Lags/rolling for pollutants if present + targets t + h
+    df, target = _add_features(df, target_priority, horizons)
+    if not target:
         print("[WARN] No target column ('no2' or 'pm25') found. Target stays None.")
-        target_col = None
 
-    # 8) Clean and save
+    # 8) Clean and save (a full rebuild supersedes incrementally appended parts)
     df_out = df.dropna().reset_index().rename(columns={"index": "time"})
-    df_out.to_parquet(FEATURES_PATH, index=False)
+    write_features(df_out, FEATURES_PATH)
+    latest_rows = (
+        _latest_rows(df.loc[:last_obs], max(horizons))
+        .reset_index()
+        .rename(columns={"index": "time"})
+    )
+    write_features(latest_rows, LATEST_FEATURES_PATH)
+    _reset_incremental_state()
+    count("tempo_rows_processed_total", len(df_out), "Rows produced per stage", stage="features")
 
     print(
         f"Features OK: {df_out.shape}, "
-        f"target={target!r}, horizon={horizon_hours}h, "
+        f"target={target!r}, horizons={min(horizons)}..{max(horizons)}h, "
         f"saved -> {FEATURES_PATH}"
     )
     return target
 
 
-def main():
-    build_features()
+# ---------------------------------------------------------------------
+# Incremental mode (reads the partitioned raw store)
+# ---------------------------------------------------------------------
+def _hourly_from_store(meteo: pd.DataFrame, aq: pd.DataFrame) -> pd.DataFrame:
+    """Weather spine left-joined with AQ, hourly, for a single location."""
+    frames = []
+    for raw in (meteo, aq):
+        if raw.empty:
+            frames.append(pd.DataFrame())
+            continue
+        hourly = _resample_hourly_mean(raw.drop(columns=["location"]), "time")
+        frames.append(hourly.rename(columns=AQ_ALIASES))
+    meteo, aq = frames
+    if meteo.empty:
+        return aq
+    return meteo if aq.empty else meteo.join(aq, how="left")
+
+
+def _extend_block(prev: pd.DataFrame, fresh: pd.DataFrame, impute_limit: int) -> pd.DataFrame:
+    """Carried-over hourly rows + new ones, gaps imputed like a full build would."""
+    block = pd.concat([prev, fresh]).sort_index()
+    # hours missing between the carried rows and the new ones (a missed run, an outage)
+    # become rows to impute, as in the full build's hourly resample: the row-based lags,
+    # windows and targets must not span the gap
+    block = block.asfreq("1h")
+    block = block.interpolate(limit=impute_limit).ffill()
+    return block.bfill() if prev.empty else block
+
+
+def _complete_rows(feats: pd.DataFrame, after: str | None) -> pd.DataFrame:
+    """Rows with every feature and target known, newer than the last emitted one."""
+    feats = feats.dropna()
+    return feats[feats.index > pd.Timestamp(after)] if after else feats
+
+
+def build_features_incremental(
+    target_priority: list[str] = ("no2", "pm25"),
+    horizons: tuple[int, ...] = HORIZONS,
+    impute_limit: int = 3,
+    store: RawStore | None = None,
+) -> int:
+    """
+    Compute features only for hours that arrived since the previous run.
+
+    Per location we keep the last LOOKBACK_HOURS + max(horizons) hourly rows (enough for
+    the lags, the rolling window and the not-yet-known targets) in FEATURE_STATE_PATH.
+    New raw hours from the store are appended to that state, featurized, and the rows
+    that became complete are written as a new part under FEATURE_PARTS_DIR. Cost is
+    proportional to the new hours, not to the whole history.
+
+    Returns the number of feature rows appended.
+    """
+    store = store or RawStore(RAW_STORE_DIR)
+    state = (
+        pd.read_parquet(FEATURE_STATE_PATH)
+        if os.path.exists(FEATURE_STATE_PATH)
+        else pd.DataFrame(columns=["time", "location"])
+    )
+    emitted_path = f"{FEATURE_STATE_PATH}.json"
+    emitted = load_json(emitted_path) if os.path.exists(emitted_path) else {}
+    now = pd.Timestamp(datetime.now(timezone.utc))
+    keep_rows = LOOKBACK_HOURS + max(horizons)
+    latest_by_loc = {}
+    if os.path.exists(LATEST_FEATURES_PATH):
+        prev_latest = pd.read_parquet(LATEST_FEATURES_PATH)
+        # a file from a full build has no location column: start over
+        if "location" in prev_latest.columns:
+            latest_by_loc = dict(tuple(prev_latest.groupby("location")))
+
+    new_state, new_rows = [], []
+    locations = sorted(set(store.locations("weather")) | set(store.locations("air_quality")))
+    for loc in locations:
+        prev = state[state["location"] == loc].drop(columns=["location"]).set_index("time")
+        after = prev.index.max() + pd.Timedelta(hours=1) if not prev.empty else None
+        fresh = _hourly_from_store(
+            store.read("weather", loc, start=after), store.read("air_quality", loc, start=after)
+        )
+        # forecast hours from upstream are not observations yet: stop at "now"
+        fresh = fresh[fresh.index <= now] if not fresh.empty else fresh
+        if fresh.empty:
+            new_state.append(prev.assign(location=loc).reset_index())
+            continue
+
+        block = _extend_block(prev, fresh, impute_limit)
+        new_state.append(block.tail(keep_rows).assign(location=loc).reset_index())
+
+        feats, _ = _add_features(block.copy(), target_priority, horizons)
+        latest_by_loc[loc] = _latest_rows(feats, max(horizons)).assign(location=loc).reset_index()
+        feats = _complete_rows(feats, emitted.get(loc))
+        if not feats.empty:
+            emitted[loc] = feats.index.max().isoformat()
+            new_rows.append(feats.assign(location=loc).reset_index())
+
+    added = sum(len(f) for f in new_rows)
+    count("tempo_rows_processed_total", added, "Rows produced per stage", stage="features")
+    if added:
+        part = pd.concat(new_rows, ignore_index=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        write_features(part, f"{FEATURE_PARTS_DIR}/part-{stamp}.parquet")
+    if new_state:
+        save_parquet(pd.concat(new_state, ignore_index=True), FEATURE_STATE_PATH)
+    if latest_by_loc:
+        write_features(pd.concat(latest_by_loc.values(), ignore_index=True), LATEST_FEATURES_PATH)
+    save_json(emitted, emitted_path)
+
+    print(f"Features (incremental) OK: +{added} rows over {len(locations)} locations")
+    return added
+
+
+# ---------------------------------------------------------------------
+# Backfill mode (multi-year history, constant memory)
+# ---------------------------------------------------------------------
+def _backfill_location(
+    loc: str,
+    store: RawStore,
+    start: pd.Timestamp | None,
+    end: pd.Timestamp | None,
+    chunk_days: int,
+    out_dir: str,
+    target_priority,
+    horizons,
+    impute_limit: int,
+) -> int:
+    days = sorted(set(store.days("weather", loc)) | set(store.days("air_quality", loc)))
+    if not days:
+        return 0
+    first = max(_as_utc(days[0]), start) if start is not None else _as_utc(days[0])
+    stop = _as_utc(days[-1]) + pd.Timedelta(days=1)
+    # forecast hours from upstream are not observations yet: stop at "now"
+    now = pd.Timestamp(datetime.now(timezone.utc))
+    stop = min(stop, end, now) if end is not None else min(stop, now)
+
+    # a backfill replaces the location's history
+    loc_dir = f"{out_dir}/location={loc}"
+    shutil.rmtree(loc_dir, ignore_errors=True)
+    keep_rows = LOOKBACK_HOURS + max(horizons)
+    carry, emitted, added = pd.DataFrame(), None, 0
+    chunk_start = first
+    while chunk_start < stop:
+        chunk_end = min(chunk_start + pd.Timedelta(days=chunk_days), stop)
+        fresh = _hourly_from_store(
+            store.read("weather", loc, start=chunk_start, end=chunk_end),
+            store.read("air_quality", loc, start=chunk_start, end=chunk_end),
+        )
+        if not fresh.empty:
+            block = _extend_block(carry, fresh, impute_limit)
+            feats, _ = _add_features(block.copy(), target_priority, horizons)
+            feats = _complete_rows(feats, emitted)
+            if not feats.empty:
+                emitted = feats.index.max().isoformat()
+                added += len(feats)
+                write_features(
+                    feats.assign(location=loc).reset_index().rename(columns={"index": "time"}),
+                    f"{loc_dir}/part-{chunk_start:%Y%m%d}.parquet",
+                )
+            # the overlap the next chunk needs: lookback for its first features, and the
+            # last max(horizons) hours whose targets it will complete
+            carry = block.tail(keep_rows)
+        chunk_start = chunk_end
+    return added
+
+
+def build_features_backfill(
+    start=None,
+    end=None,
+    chunk_days: int = cfg.BACKFILL_CHUNK_DAYS,
+    target_priority: list[str] = ("no2", "pm25"),
+    horizons: tuple[int, ...] = HORIZONS,
+    impute_limit: int = 3,
+    store: RawStore | None = None,
+    out_dir: str | None = None,
+) -> int:
+    """
+    Featurize the raw store's whole history (or [start, end)) in `chunk_days` slices.
+
+    Each location is walked chunk by chunk: only that chunk's day partitions are read,
+    joined onto the last LOOKBACK_HOURS + max(horizons) hourly rows carried over from the
+    previous chunk, and the rows completed by it are written as one part under
+    FEATURE_HISTORY_DIR/location=<loc>/. Peak memory is one chunk plus the carry-over,
+    whatever the length of the history; the output matches a single full build.
+    `train --out-of-core` consumes the result.
+
+    Returns the number of feature rows written.
+    """
+    store = store or RawStore(RAW_STORE_DIR)
+    out_dir = out_dir or FEATURE_HISTORY_DIR
+    start = _as_utc(start) if start is not None else None
+    end = _as_utc(end) if end is not None else None
+    locations = sorted(set(store.locations("weather")) | set(store.locations("air_quality")))
+    added = 0
+    for loc in locations:
+        added += _backfill_location(
+            loc, store, start, end, chunk_days, out_dir, target_priority, horizons, impute_limit
+        )
+    count("tempo_rows_processed_total", added, "Rows produced per stage", stage="features")
+    print(f"Features (backfill) OK: {added} rows over {len(locations)} locations -> {out_dir}")
+    return added
+
+
+def compact_features() -> None:
+    """Fold the incremental parts into FEATURES_PATH (keeps the incremental state)."""
+    df = read_features()
+    write_features(df, FEATURES_PATH)
+    shutil.rmtree(FEATURE_PARTS_DIR, ignore_errors=True)
+    print(f"Features compacted: {df.shape} -> {FEATURES_PATH}")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Build the features dataset.")
+    parser.add_argument(
+        "--incremental", action="store_true", help="only featurize new hours from the raw store"
+    )
+    parser.add_argument(
+        "--compact", action="store_true", help="merge incremental parts into features.parquet"
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="featurize the raw store's history chunk by chunk into features_history/",
+    )
+    parser.add_argument("--start", help="backfill from this day (YYYY-MM-DD)")
+    parser.add_argument("--end", help="backfill up to this day, exclusive")
+    parser.add_argument("--chunk-days", type=int, default=cfg.BACKFILL_CHUNK_DAYS)
+    args = parser.parse_args(argv)
+    with run_stage("features", cfg.RUN_REPORTS_DIR, incremental=args.incremental):
+        if args.backfill:
+            build_features_backfill(args.start, args.end, args.chunk_days)
+        elif args.incremental:
+            build_features_incremental()
+        elif args.compact:
+            compact_features()
+        else:
+            build_features()
 
 
 if __name__ == "__main__":
@@ -1,30 +1,88 @@
 # src/pipelines/ingest.py
 from __future__ import annotations
 
+import argparse
+import csv
+import functools
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 
-import pandas as pd
 import requests
 
 from src.config import (
+    BACKFILL_CHUNK_DAYS,
     DATA_WINDOW_DAYS,
     DEFAULT_LAT,
     DEFAULT_LON,
+    INGEST_OVERLAP_HOURS,
+    LOCATIONS_PATH,
+    OPEN_METEO_AIR_BASE_URL,
+    OPEN_METEO_ARCHIVE_URL,
     OPEN_METEO_BASE_URL,
     OPENAQ_BASE_URL,
     RAW_DIR,
+    RAW_STORE_DIR,
+    RUN_REPORTS_DIR,
 )
+from src.utils import http_cache
+from src.utils.geo import record_locations
+from src.utils.http import make_session
+from src.utils.instrument import count, run_stage, timer
 from src.utils.io import save_parquet, today_stamp
+from src.utils.lazy import lazy_import
+from src.utils.raw_store import RawStore
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+
+
+def _instrumented(source: str):
+    """Record upstream latency and returned rows for a fetch_* function."""
+
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer("tempo_upstream_fetch_seconds", "Upstream fetch latency", source=source):
+                df = fn(*args, **kwargs)
+            count(
+                "tempo_rows_processed_total",
+                len(df),
+                "Rows produced per stage",
+                stage="ingest",
+                source=source,
+            )
+            return df
+
+        return wrapper
+
+    return deco
 
 
 # ---------- OpenAQ (fixed: no 'temporal'/'order_by', simple pagination) ----------
-def fetch_openaq(lat: float, lon: float, days: int = 7, radius_m: int = 15000) -> pd.DataFrame:
+@_instrumented("openaq")
+def fetch_openaq(
+    lat: float,
+    lon: float,
+    days: int = 7,
+    radius_m: int = 15000,
+    session: requests.Session | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> pd.DataFrame:
     """
-    Fetch NO2/PM2.5 near (lat, lon) over the last `days` from OpenAQ v2.
-    Avoid 'temporal'/'order_by' (can trigger 410). We aggregate to hourly locally.
+    Fetch NO2/PM2.5 near (lat, lon) over the last `days` (or since `start`, up to `end`)
+    from OpenAQ v2. Avoid 'temporal'/'order_by' (can trigger 410). We aggregate to hourly
+    locally.
     """
-    end = datetime.now(timezone.utc)
-    start = end - timedelta(days=days)
+    if end is None:
+        # window end on the next hour boundary: the query (and its cache key) is stable
+        # for the whole hour
+        end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        end += timedelta(hours=1)
+    start = start or end - timedelta(days=days)
 
     params = {
         "coordinates": f"{lat},{lon}",
@@ -36,70 +94,157 @@ def fetch_openaq(lat: float, lon: float, days: int = 7, radius_m: int = 15000) -
         "page": 1,
     }
 
-    all_rows = []
+    http = session or requests
+    acc: pd.DataFrame | None = None
     try:
         while True:
-            r = requests.get(f"{OPENAQ_BASE_URL}/measurements", params=params, timeout=45)
+            r = http_cache.get(
+                http, f"{OPENAQ_BASE_URL}/measurements", params=params, timeout=45, source="openaq"
+            )
             r.raise_for_status()
-            payload = r.json()
-            results = payload.get("results", [])
+            results = r.json().get("results", [])
             if not results:
                 break
-            all_rows.extend(results)
+            # fold each page into per-(datetime, parameter) sums as it arrives, so
+            # memory is bounded by the page size + distinct timestamps, not total rows
+            page = _openaq_page_sums(results)
+            acc = page if acc is None else acc.add(page, fill_value=0)
+            n_results = len(results)
+            del results
 
             # naive pagination: if we got a full page, try next page
-            if len(results) >= params["limit"]:
+            if n_results >= params["limit"]:
                 params["page"] += 1
             else:
                 break
 
-        if not all_rows:
-            return pd.DataFrame()
-
-        df = pd.DataFrame(all_rows)
-
-        # Parse datetime (date may be {"utc": "...", "local": "..."})
-        if "date" in df.columns:
-            df["datetime"] = pd.to_datetime(
-                df["date"].apply(lambda d: d.get("utc") if isinstance(d, dict) else None),
-                utc=True,
-                errors="coerce",
-            )
-        elif "date_utc" in df.columns:
-            df["datetime"] = pd.to_datetime(df["date_utc"], utc=True, errors="coerce")
-        else:
-            df["datetime"] = pd.to_datetime(df.get("datetime"), utc=True, errors="coerce")
-
-        keep = [c for c in ["datetime", "parameter", "value", "unit"] if c in df.columns]
-        df = df[keep].dropna(subset=["datetime", "parameter", "value"])
-        if df.empty:
+        if acc is None or acc.empty:
             return pd.DataFrame()
 
-        # pivot to wide, then resample hourly
+        # mean per timestamp, pivot to wide, then resample hourly
         pivot = (
-            df.pivot_table(index="datetime", columns="parameter", values="value", aggfunc="mean")
+            (acc["sum"] / acc["count"])
+            .unstack("parameter")
             .rename(columns={"pm2.5": "pm25"})
             .sort_index()
-            .resample("1H")
+            .resample("1h")
             .mean()
         )
+        pivot.columns.name = None
         return pivot
     except Exception as e:
         print(f"[WARN] OpenAQ fetch failed: {e}")
         return pd.DataFrame()
 
 
-# ---------- Open-Meteo Weather (unchanged) ----------
-def fetch_openmeteo(lat: float, lon: float, days: int = 7) -> pd.DataFrame:
+@functools.cache
+def _openaq_row_type():
+    # Only the fields we use; pyarrow skips every other key while converting.
+    return pa.struct(
+        [
+            ("date", pa.struct([("utc", pa.string())])),
+            ("date_utc", pa.string()),
+            ("datetime", pa.string()),
+            ("parameter", pa.string()),
+            ("value", pa.float64()),
+        ]
+    )
+
+
+def _openaq_clean(row) -> dict:
+    """`row` reduced to the fields of `_openaq_row_type`; None where a field has the wrong type."""
+
+    def text(v):
+        return v if isinstance(v, str) else None
+
+    if not isinstance(row, dict):
+        return {}
+    date = row.get("date")
+    try:
+        value = float(row.get("value"))
+    except (TypeError, ValueError):
+        value = None
+    return {
+        "date": {"utc": text(date.get("utc"))} if isinstance(date, dict) else None,
+        "date_utc": text(row.get("date_utc")),
+        "datetime": text(row.get("datetime")),
+        "parameter": text(row.get("parameter")),
+        "value": value,
+    }
+
+
+def _openaq_page_sums(results: list[dict]) -> pd.DataFrame:
+    """
+    Columnar parse of one OpenAQ page -> sum/count of `value` per (datetime, parameter).
+
+    The nested `date.utc` (or flat `date_utc` / `datetime`) timestamp is extracted with
+    Arrow kernels instead of a per-row Python lambda. Malformed rows are dropped, not the page.
+    """
+    try:
+        rows = pa.array(results, type=_openaq_row_type())
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # one malformed row (a string `date`, a non-numeric `value`, ...) fails the
+        # typed conversion of the whole page: convert a sanitized copy instead
+        rows = pa.array([_openaq_clean(r) for r in results], type=_openaq_row_type())
+    ts = pc.coalesce(
+        pc.struct_field(rows, ["date", "utc"]),
+        pc.struct_field(rows, ["date_utc"]),
+        pc.struct_field(rows, ["datetime"]),
+    )
+    df = pd.DataFrame(
+        {
+            "datetime": pd.to_datetime(
+                ts.to_numpy(zero_copy_only=False), utc=True, errors="coerce"
+            ),
+            "parameter": pc.struct_field(rows, ["parameter"]).to_numpy(zero_copy_only=False),
+            "value": pc.struct_field(rows, ["value"]).to_numpy(zero_copy_only=False),
+        }
+    ).dropna()
+    return df.groupby(["datetime", "parameter"])["value"].agg(["sum", "count"])
+
+
+def _openmeteo_window(
+    days: int, start: datetime | None, forecast_days: int = 2, end: datetime | None = None
+) -> dict:
+    """
+    Open-Meteo time window: whole past days, an exact hourly range from `start`, or the
+    whole days of [start, end) for a historical range.
+    """
+    if start is not None and end is not None:
+        return {
+            "start_date": start.strftime("%Y-%m-%d"),
+            "end_date": (end - timedelta(hours=1)).strftime("%Y-%m-%d"),
+        }
+    if start is None:
+        return {"past_days": days, "forecast_days": forecast_days}
+    end = datetime.now(timezone.utc) + timedelta(days=forecast_days)
+    return {
+        "start_hour": start.strftime("%Y-%m-%dT%H:00"),
+        "end_hour": end.strftime("%Y-%m-%dT%H:00"),
+    }
+
+
+# ---------- Open-Meteo Weather ----------
+@_instrumented("open_meteo")
+def fetch_openmeteo(
+    lat: float,
+    lon: float,
+    days: int = 7,
+    session: requests.Session | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> pd.DataFrame:
     params = {
         "latitude": lat,
         "longitude": lon,
         "hourly": "temperature_2m,relative_humidity_2m,pressure_msl,wind_speed_10m,wind_direction_10m",
-        "past_days": days,
-        "forecast_days": 2,
+        **_openmeteo_window(days, start, end=end),
         "timezone": "UTC",
     }
-    r = requests.get(OPEN_METEO_BASE_URL, params=params, timeout=30)
+    # closed historical ranges come from the archive API (the forecast API only keeps
+    # a few months of past days)
+    url = OPEN_METEO_ARCHIVE_URL if end is not None else OPEN_METEO_BASE_URL
+    r = http_cache.get(session or requests, url, params=params, timeout=30, source="open_meteo")
     r.raise_for_status()
     j = r.json()
     hourly = j.get("hourly", {})
@@ -112,18 +257,30 @@ def fetch_openmeteo(lat: float, lon: float, days: int = 7) -> pd.DataFrame:
 
 
 # ---------- Open-Meteo Air Quality (fallback if OpenAQ empty) ----------
-def fetch_openmeteo_air(lat: float, lon: float, days: int = 7) -> pd.DataFrame:
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
+@_instrumented("open_meteo_air")
+def fetch_openmeteo_air(
+    lat: float,
+    lon: float,
+    days: int = 7,
+    session: requests.Session | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> pd.DataFrame:
     params = {
         "latitude": lat,
         "longitude": lon,
         "hourly": "pm2_5,pm10,nitrogen_dioxide,ozone,carbon_monoxide,sulphur_dioxide",
-        "past_days": days,
-        "forecast_days": 2,
+        **_openmeteo_window(days, start, end=end),
         "timezone": "UTC",
     }
     try:
-        r = requests.get(url, params=params, timeout=45)
+        r = http_cache.get(
+            session or requests,
+            OPEN_METEO_AIR_BASE_URL,
+            params=params,
+            timeout=45,
+            source="open_meteo_air",
+        )
         r.raise_for_status()
         j = r.json()
         hourly = j.get("hourly", {})
@@ -140,17 +297,187 @@ def fetch_openmeteo_air(lat: float, lon: float, days: int = 7) -> pd.DataFrame:
         return pd.DataFrame()
 
 
-def main():
+# ---------- Multi-location ingestion ----------
+@dataclass(frozen=True)
+class Location:
+    name: str
+    lat: float
+    lon: float
+
+    @property
+    def slug(self) -> str:
+        return re.sub(r"[^A-Za-z0-9_-]+", "_", self.name).strip("_").lower() or "loc"
+
+
+def parse_location(spec: str) -> Location:
+    """Parse `name=lat,lon` (or bare `lat,lon`) from the CLI."""
+    name, _, coords = spec.rpartition("=")
+    lat, lon = (float(x) for x in coords.split(","))
+    return Location(name or f"{lat:.4f}_{lon:.4f}", lat, lon)
+
+
+def load_locations(path: str) -> list[Location]:
+    """Read a CSV with `name,lat,lon` columns."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [Location(r["name"], float(r["lat"]), float(r["lon"])) for r in csv.DictReader(f)]
+
+
+def ingest_location(
+    loc: Location,
+    session: requests.Session,
+    days: int = DATA_WINDOW_DAYS,
+    stamp: str | None = None,
+) -> dict:
+    """Fetch weather + air quality for one location into data/raw/locations/<slug>/."""
+    stamp = stamp or today_stamp()
+    out_dir = f"{RAW_DIR}/locations/{loc.slug}"
+
+    meteo = fetch_openmeteo(loc.lat, loc.lon, days, session=session)
+    if not meteo.empty:
+        save_parquet(meteo.reset_index(), f"{out_dir}/openmeteo_{stamp}.parquet")
+
+    aq = fetch_openaq(loc.lat, loc.lon, days, session=session)
+    if aq.empty:
+        aq = fetch_openmeteo_air(loc.lat, loc.lon, days, session=session)
+    if not aq.empty:
+        save_parquet(aq.reset_index(), f"{out_dir}/air_quality_{stamp}.parquet")
+
+    return {"location": loc.slug, "meteo_rows": len(meteo), "aq_rows": len(aq)}
+
+
+def ingest_location_incremental(
+    loc: Location,
+    session: requests.Session,
+    days: int = DATA_WINDOW_DAYS,
+    store: RawStore | None = None,
+    overlap_hours: int = INGEST_OVERLAP_HOURS,
+) -> dict:
+    """
+    Fetch only the hours after each series' high-water mark (minus a small overlap)
+    and merge them into the partitioned raw store. A series seen for the first time
+    is backfilled over the usual `days` window.
+    """
+    store = store or RawStore(RAW_STORE_DIR)
+    now = datetime.now(timezone.utc)
+
+    def since(source: str) -> datetime:
+        mark = store.watermark(source, loc.slug)
+        if mark is None:
+            return now - timedelta(days=days)
+        return (mark - timedelta(hours=overlap_hours)).to_pydatetime()
+
+    meteo = fetch_openmeteo(loc.lat, loc.lon, session=session, start=since("weather"))
+    aq_start = since("air_quality")
+    aq = fetch_openaq(loc.lat, loc.lon, session=session, start=aq_start)
+    if aq.empty:
+        aq = fetch_openmeteo_air(loc.lat, loc.lon, session=session, start=aq_start)
+
+    return {
+        "location": loc.slug,
+        "meteo_rows": len(meteo),
+        "aq_rows": len(aq),
+        "meteo_new": store.append("weather", loc.slug, meteo),
+        "aq_new": store.append("air_quality", loc.slug, aq),
+    }
+
+
+def backfill_location(
+    loc: Location,
+    session: requests.Session,
+    start: datetime,
+    end: datetime,
+    chunk_days: int = BACKFILL_CHUNK_DAYS,
+    store: RawStore | None = None,
+) -> dict:
+    """
+    Fetch [start, end) in `chunk_days` slices into the partitioned raw store.
+
+    Each slice is fetched, appended to its day partitions and dropped before the next
+    one, so memory is bounded by one slice whatever the length of the range. Re-running
+    a backfill only rewrites the days it covers (appends dedupe on time).
+    """
+    store = store or RawStore(RAW_STORE_DIR)
+    out = {"location": loc.slug, "chunks": 0, "meteo_new": 0, "aq_new": 0}
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), end)
+        window = {"session": session, "start": chunk_start, "end": chunk_end}
+        meteo = fetch_openmeteo(loc.lat, loc.lon, **window)
+        aq = fetch_openaq(loc.lat, loc.lon, **window)
+        if aq.empty:
+            aq = fetch_openmeteo_air(loc.lat, loc.lon, **window)
+        out["meteo_new"] += store.append("weather", loc.slug, meteo)
+        out["aq_new"] += store.append("air_quality", loc.slug, aq)
+        out["chunks"] += 1
+        chunk_start = chunk_end
+    return out
+
+
+def ingest_many(
+    locations: list[Location],
+    workers: int = 8,
+    rate_per_host: float = 10.0,
+    days: int = DATA_WINDOW_DAYS,
+    incremental: bool = False,
+    backfill: tuple[datetime, datetime] | None = None,
+    chunk_days: int = BACKFILL_CHUNK_DAYS,
+) -> list[dict]:
+    """
+    Ingest many locations through a bounded thread pool.
+
+    All workers share one keep-alive session (pool sized to `workers`) and a
+    per-host rate limit, so hundreds of cities reuse a handful of connections.
+    A failing location is reported in its summary instead of aborting the run.
+    With `incremental=True`, locations go to the partitioned raw store instead of
+    daily snapshots (see `ingest_location_incremental`); `backfill=(start, end)` fills
+    the store with that historical range instead (see `backfill_location`).
+    """
     stamp = today_stamp()
+    store = RawStore(RAW_STORE_DIR)
+    # coordinates of every location, for the API's spatial index
+    record_locations(LOCATIONS_PATH, {loc.slug: (loc.lat, loc.lon) for loc in locations})
+    session = make_session(pool_size=workers, rate_per_host=rate_per_host)
+    results = []
+    with session, ThreadPoolExecutor(max_workers=workers) as pool:
+        if backfill:
+            futures = {
+                pool.submit(backfill_location, loc, session, *backfill, chunk_days, store): loc
+                for loc in locations
+            }
+        elif incremental:
+            futures = {
+                pool.submit(ingest_location_incremental, loc, session, days, store): loc
+                for loc in locations
+            }
+        else:
+            futures = {
+                pool.submit(ingest_location, loc, session, days, stamp): loc for loc in locations
+            }
+        for fut in as_completed(futures):
+            loc = futures[fut]
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                print(f"[WARN] Ingest failed for {loc.name}: {e}")
+                results.append({"location": loc.slug, "error": str(e)})
+    return results
 
-    # weather
+
+def ingest_weather(stamp: str | None = None) -> pd.DataFrame:
+    """Default-point weather snapshot -> RAW_DIR/openmeteo_<stamp>.parquet."""
+    stamp = stamp or today_stamp()
     meteo = fetch_openmeteo(DEFAULT_LAT, DEFAULT_LON, DATA_WINDOW_DAYS)
     if not meteo.empty:
         save_parquet(meteo.reset_index(), f"{RAW_DIR}/openmeteo_{stamp}.parquet")
     else:
         print("[WARN] Weather fetch returned empty.")
+    return meteo
+
 
-    # air quality: try OpenAQ first, then fallback to Open-Meteo Air
+def ingest_air_quality(stamp: str | None = None) -> pd.DataFrame:
+    """Default-point AQ snapshot -> RAW_DIR/air_quality_<stamp>.parquet."""
+    stamp = stamp or today_stamp()
+    # try OpenAQ first, then fallback to Open-Meteo Air
     aq = fetch_openaq(DEFAULT_LAT, DEFAULT_LON, DATA_WINDOW_DAYS)
     if aq.empty:
         print("[INFO] Falling back to Open-Meteo Air Quality…")
@@ -161,6 +488,13 @@ def main():
         save_parquet(aq.reset_index(), f"{RAW_DIR}/air_quality_{stamp}.parquet")
     else:
         print("[WARN] Air quality fetch returned empty.")
+    return aq
+
+
+def ingest_default():
+    stamp = today_stamp()
+    meteo = ingest_weather(stamp)
+    aq = ingest_air_quality(stamp)
 
     print(
         "Ingest OK:",
@@ -169,5 +503,75 @@ def main():
     )
 
 
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Fetch raw weather and air-quality data.")
+    parser.add_argument("--locations-file", help="CSV with name,lat,lon columns")
+    parser.add_argument("--location", action="append", default=[], help="name=lat,lon (repeatable)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=10.0, help="max requests/s per host")
+    parser.add_argument("--days", type=int, default=DATA_WINDOW_DAYS)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="fetch only new hours into the partitioned raw store (data/raw/store)",
+    )
+    parser.add_argument(
+        "--backfill-start",
+        type=_parse_day,
+        help="YYYY-MM-DD: fetch history from that day into the raw store, in chunks",
+    )
+    parser.add_argument(
+        "--backfill-end", type=_parse_day, help="YYYY-MM-DD, exclusive (default: today)"
+    )
+    parser.add_argument("--chunk-days", type=int, default=BACKFILL_CHUNK_DAYS)
+    parser.add_argument(
+        "--http-cache",
+        choices=http_cache.MODES,
+        help="upstream response cache mode (default: HTTP_CACHE_MODE); replay = no network",
+    )
+    args = parser.parse_args(argv)
+    if args.http_cache:
+        http_cache.default_cache().mode = args.http_cache
+
+    with run_stage(
+        "ingest",
+        RUN_REPORTS_DIR,
+        incremental=args.incremental,
+        backfill=args.backfill_start is not None,
+    ):
+        _run(args)
+
+
+def _parse_day(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+def _run(args) -> None:
+    backfill = None
+    if args.backfill_start:
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        backfill = (args.backfill_start, args.backfill_end or today)
+    locations = [parse_location(s) for s in args.location]
+    if args.locations_file:
+        locations += load_locations(args.locations_file)
+    if not locations:
+        if not args.incremental and not backfill:
+            ingest_default()
+            return
+        locations = [Location("default", DEFAULT_LAT, DEFAULT_LON)]
+
+    results = ingest_many(
+        locations,
+        workers=args.workers,
+        rate_per_host=args.rate,
+        days=args.days,
+        incremental=args.incremental,
+        backfill=backfill,
+        chunk_days=args.chunk_days,
+    )
+    failed = [r for r in results if "error" in r]
+    print(f"Ingest OK: {len(results) - len(failed)}/{len(results)} locations")
+
+
 if __name__ == "__main__":
     main()
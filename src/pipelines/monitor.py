@@ -0,0 +1,274 @@
+"""
+Online accuracy and drift monitor for the served forecasts.
+
+    python -m src.pipelines.monitor          # hourly, after ingest
+
+Each run:
+  1) joins the stored forecast tables with the observations that arrived since the
+     previous run (each (table, location) pair keeps a scored-through hour);
+  2) folds the new errors into per (location, lead, day) sums of SUM_FIELDS, so MAE,
+     RMSE, MAPE and bias over any window of whole days are ratios of summed buckets.
+     Buckets older than the longest window are dropped: the state is bounded by
+     locations x leads x days, however long the monitor runs;
+  3) folds the new feature rows into decayed histogram sketches and scores each feature's
+     PSI against the training distribution (models/feature_sketch.json);
+  4) writes MONITOR_DIR/accuracy.parquet (window, location, lead, metrics) and
+     MONITOR_DIR/report.json (per-window summaries, drifted features).
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+from datetime import datetime, timezone
+
+import src.config as cfg
+from src.pipelines.feature_spec import CALENDAR_COLUMNS
+from src.pipelines.features import (
+    AQ_ALIASES,
+    _resample_hourly_mean,
+    latest,
+    read_latest_features,
+    target_columns,
+)
+from src.utils.instrument import count, run_stage
+from src.utils.io import load_json, save_json, save_parquet
+from src.utils.lazy import lazy_import
+from src.utils.metrics import SUM_FIELDS, error_terms, metrics_from_sums
+from src.utils.raw_store import RawStore
+from src.utils.sketch import FeatureSketches
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+KEYS = ["location", "lead", "day"]
+
+
+def _floats(row: dict) -> dict:
+    # JSON has no NaN: metrics of an empty window are null
+    return {k: None if v != v else float(v) for k, v in row.items()}
+
+
+# ---------- Observations ----------
+def _observed(
+    store: RawStore, location: str, start, end, target_priority=("no2", "pm25")
+) -> pd.Series:
+    """Hourly observed target for one location over [start, end] (empty if none)."""
+    raw = store.read("air_quality", location, start=start, end=end + pd.Timedelta(hours=1))
+    if raw.empty:
+        # the default point is ingested as daily snapshots, not into the store
+        path = latest(cfg.AIR_QUALITY_RAW_PATTERN) if location == "default" else None
+        if not path:
+            return pd.Series(dtype="float64")
+        raw = pd.read_parquet(path).rename(columns={"datetime": "time"})
+    hourly = _resample_hourly_mean(raw.drop(columns=["location"], errors="ignore"), "time")
+    hourly = hourly.rename(columns=AQ_ALIASES)
+    target = next((c for c in target_priority if c in hourly.columns), None)
+    if target is None:
+        return pd.Series(dtype="float64")
+    return hourly[target].loc[start:end].dropna()
+
+
+def pending_pairs(
+    tables: dict[str, pd.DataFrame], scored: dict[str, str], store: RawStore
+) -> tuple[pd.DataFrame, dict[str, str]]:
+    """
+    (location, lead, time, y_pred, y_obs) rows not scored yet, and the updated
+    scored-through marks ("<version>/<location>" -> ISO hour).
+    """
+    pending = []
+    for version, table in tables.items():
+        for loc, rows in table.groupby("location", sort=False):
+            mark = scored.get(f"{version}/{loc}")
+            if mark is not None:
+                rows = rows[rows["time"] > pd.Timestamp(mark)]
+            if not rows.empty:
+                pending.append(rows.assign(version=version))
+    if not pending:
+        return pd.DataFrame(columns=["location", "lead", "time", "y_pred", "y_obs"]), scored
+    pending = pd.concat(pending, ignore_index=True)
+    # a forecast is scored against the hour it was issued for, by lead time
+    pending["lead"] = (pending["time"] - pending["origin_time"]) // pd.Timedelta(hours=1)
+    pending = pending[pending["lead"] >= 1]
+
+    pairs, scored = [], dict(scored)
+    for loc, rows in pending.groupby("location", sort=False):
+        obs = _observed(store, str(loc), rows["time"].min(), rows["time"].max())
+        joined = rows.join(obs.rename("y_obs"), on="time", how="inner")
+        if joined.empty:
+            continue
+        pairs.append(joined)
+        for version, t in joined.groupby("version")["time"].max().items():
+            scored[f"{version}/{loc}"] = t.isoformat()
+    if not pairs:
+        return pd.DataFrame(columns=["location", "lead", "time", "y_pred", "y_obs"]), scored
+    out = pd.concat(pairs, ignore_index=True)
+    return out[["location", "lead", "time", "y_pred", "y_obs"]], scored
+
+
+# ---------- Error sums ----------
+def fold_errors(sums: pd.DataFrame, pairs: pd.DataFrame, oldest_day: str) -> pd.DataFrame:
+    """Add the pairs' error terms into the (location, lead, day) sums; drop old days."""
+    if not pairs.empty:
+        terms = pd.DataFrame(error_terms(pairs["y_obs"], pairs["y_pred"]))
+        terms["location"] = pairs["location"].astype(str).to_numpy()
+        terms["lead"] = pairs["lead"].astype("int64").to_numpy()
+        terms["day"] = pairs["time"].dt.strftime("%Y-%m-%d").to_numpy()
+        sums = pd.concat([sums, terms], ignore_index=True) if len(sums) else terms
+        sums = sums.groupby(KEYS, as_index=False)[list(SUM_FIELDS)].sum()
+    return sums[sums["day"] >= oldest_day].reset_index(drop=True)
+
+
+def window_metrics(sums: pd.DataFrame, today: pd.Timestamp, days: int, by: list[str]):
+    """Metrics over the last `days` whole days (today included), grouped `by`."""
+    first = (today - pd.Timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    recent = sums[sums["day"] >= first]
+    if by:
+        totals = recent.groupby(by, as_index=False)[list(SUM_FIELDS)].sum()
+    else:
+        totals = recent[list(SUM_FIELDS)].sum().to_frame().T
+    # float sums: an empty window gives NaN metrics, not a ZeroDivisionError
+    totals = totals.astype({f: "float64" for f in SUM_FIELDS})
+    return totals.assign(**metrics_from_sums(totals))
+
+
+# ---------- Drift ----------
+def update_sketches(
+    live: FeatureSketches, features: pd.DataFrame, after: dict[str, str], hours: float
+) -> tuple[int, dict[str, str]]:
+    """Decay `live` by the hours elapsed, then add feature rows newer than `after`."""
+    live.decay(0.5 ** (hours / cfg.DRIFT_HALF_LIFE_HOURS))
+    if "location" not in features.columns:
+        features = features.assign(location="default")
+    after, added = dict(after), 0
+    for loc, rows in features.groupby(features["location"].astype(str), sort=False):
+        times = pd.to_datetime(rows["time"], utc=True)
+        mark = after.get(loc)
+        fresh = rows[times > pd.Timestamp(mark)] if mark else rows
+        if fresh.empty:
+            continue
+        X = fresh.drop(columns=target_columns(fresh)).select_dtypes(include=["number"])
+        added += live.update(X)
+        after[loc] = times.max().isoformat()
+    return added, after
+
+
+# ---------- Run ----------
+def _load_tables(directory: str) -> dict[str, pd.DataFrame]:
+    tables = {}
+    for path in sorted(glob.glob(f"{directory}/forecast_*.parquet")):
+        version = os.path.basename(path)[len("forecast_") : -len(".parquet")]
+        tables[version] = pd.read_parquet(path)
+    return tables
+
+
+def run_monitor(
+    store: RawStore | None = None,
+    directory: str | None = None,
+    now: pd.Timestamp | None = None,
+) -> dict:
+    """One monitoring step (see the module docstring); returns the report."""
+    store = store or RawStore(cfg.RAW_STORE_DIR)
+    directory = directory or cfg.MONITOR_DIR
+    now = pd.Timestamp(now or datetime.now(timezone.utc))
+    today = now.normalize()
+    windows = cfg.MONITOR_WINDOWS_DAYS
+    state_path, sums_path = f"{directory}/state.json", f"{directory}/errors.parquet"
+    state = load_json(state_path) if os.path.exists(state_path) else {}
+    sums = (
+        pd.read_parquet(sums_path)
+        if os.path.exists(sums_path)
+        else pd.DataFrame(columns=[*KEYS, *SUM_FIELDS])
+    )
+
+    # 1-2) accuracy
+    tables = _load_tables(cfg.FORECASTS_DIR)
+    # marks of tables that were rotated out are of no further use
+    scored = {k: v for k, v in state.get("scored", {}).items() if k.split("/")[0] in tables}
+    pairs, scored = pending_pairs(tables, scored, store)
+    oldest = (today - pd.Timedelta(days=max(windows) - 1)).strftime("%Y-%m-%d")
+    sums = fold_errors(sums, pairs, oldest)
+    count("tempo_rows_processed_total", len(pairs), "Rows produced per stage", stage="monitor")
+
+    accuracy, summary = [], {}
+    for days in windows:
+        accuracy.append(
+            window_metrics(sums, today, days, ["location", "lead"]).assign(window_days=days)
+        )
+        overall = window_metrics(sums, today, days, [])
+        by_lead = window_metrics(sums, today, days, ["lead"])
+        summary[f"{days}d"] = {
+            "overall": _floats(overall.iloc[0].to_dict()),
+            "by_lead": {
+                int(lead): _floats(row)
+                for lead, row in by_lead.set_index("lead")[["n", "MAE", "RMSE", "MAPE", "bias"]]
+                .to_dict(orient="index")
+                .items()
+            },
+        }
+
+    # 3) drift
+    drift = {}
+    if os.path.exists(cfg.FEATURE_SKETCH_PATH):
+        reference = FeatureSketches.from_dict(load_json(cfg.FEATURE_SKETCH_PATH))
+        sketch_path = f"{directory}/sketch.json"
+        live = (
+            FeatureSketches.from_dict(load_json(sketch_path))
+            if os.path.exists(sketch_path)
+            else reference.empty()
+        )
+        last = state.get("sketch_at")
+        hours = (now - pd.Timestamp(last)) / pd.Timedelta(hours=1) if last else 0.0
+        try:
+            features = read_latest_features()
+        except FileNotFoundError:
+            features = pd.DataFrame(columns=["time"])
+        added, state["features_after"] = update_sketches(
+            live, features, state.get("features_after", {}), hours
+        )
+        psi = live.psi(reference)
+        drift = {
+            "rows_added": added,
+            "psi": psi,
+            # a recent window covers only some hours/weekdays: calendar columns always
+            # "drift" and say nothing about the data
+            "drifted": sorted(
+                c
+                for c, v in psi.items()
+                if v > cfg.DRIFT_PSI_THRESHOLD and c not in CALENDAR_COLUMNS
+            ),
+        }
+        save_json(live.to_dict(), sketch_path)
+        state["sketch_at"] = now.isoformat()
+    else:
+        print(f"[INFO] No reference sketch at {cfg.FEATURE_SKETCH_PATH}; drift skipped.")
+
+    # 4) persist
+    state["scored"] = scored
+    save_parquet(sums, sums_path)
+    save_parquet(pd.concat(accuracy, ignore_index=True), f"{directory}/accuracy.parquet")
+    save_json(state, state_path)
+    report = {
+        "generated_at": now.isoformat(),
+        "pairs_scored": int(len(pairs)),
+        "windows": summary,
+        "drift": drift,
+    }
+    save_json(report, f"{directory}/report.json")
+    print(
+        f"Monitor OK: +{len(pairs)} pairs, {windows[0]}d MAE="
+        f"{summary[f'{windows[0]}d']['overall']['MAE']}, drifted={drift.get('drifted', [])}"
+    )
+    return report
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Score served forecasts and feature drift.")
+    parser.parse_args(argv)
+    with run_stage("monitor", cfg.RUN_REPORTS_DIR):
+        run_monitor()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,119 @@
 from __future__ import annotations
 
-import joblib
-import pandas as pd
+import glob
+import os
+from datetime import datetime, timezone
 
-from src.config import MODELS_DIR, PROCESSED_DIR
+from src.config import (
+    FORECAST_QUANTILES,
+    FORECASTS_DIR,
+    MAX_HORIZON_HOURS,
+    MODELS_DIR,
+    RUN_REPORTS_DIR,
+)
+from src.pipelines.features import read_latest_features, target_columns
+from src.utils.forest import load_model, predict_intervals, quantile_name
+from src.utils.instrument import count, run_stage, timer
+from src.utils.io import save_parquet
+from src.utils.lazy import lazy_import
 
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
-def batch_predict():
-    df = pd.read_parquet(f"{PROCESSED_DIR}/features.parquet").select_dtypes(include=["number"])
-    X = df.drop(columns=[c for c in df.columns if c == "y_next_24h"], errors="ignore")
-    model = joblib.load(f"{MODELS_DIR}/model.pkl")
-    preds = model.predict(X)
-    out = df.copy()
-    out["y_pred"] = preds
-    print("Predict OK:", out.tail(5)[["y_pred"]])
+DEFAULT_LOCATION = "default"
+
+
+def model_leads(model) -> list[int]:
+    """Lead hours of the model outputs (models trained before multi-horizon: one 24h output)."""
+    return list(getattr(model, "lead_hours_", [24]))
+
+
+def rows_needed(model, horizon: int) -> int:
+    """Feature rows to score: the latest one for a multi-horizon model, else one per hour."""
+    return 1 if len(model_leads(model)) > 1 else horizon
+
+
+def to_series(model, index: pd.Index, preds, horizon: int) -> tuple[pd.Index, np.ndarray]:
+    """
+    (valid times, values) for one location from its scored feature rows.
+
+    A multi-horizon model turns the latest row into the trajectory origin + 1..horizon
+    hours. A single-output model keeps the previous behaviour: one value per feature row.
+    """
+    leads = np.asarray(model_leads(model))
+    preds = np.asarray(preds).reshape(len(index), len(leads))
+    if len(leads) > 1:
+        keep = leads <= horizon
+        times = pd.DatetimeIndex([index[-1]]).repeat(keep.sum()) + pd.to_timedelta(
+            leads[keep], unit="h"
+        )
+        return times, preds[-1, keep]
+    return index[-horizon:], preds[-horizon:, 0]
+
+
+def to_bands(model, index: pd.Index, bands, horizon: int) -> np.ndarray | None:
+    """`to_series` values of each quantile band, shape (quantiles, hours); None if no bands."""
+    if bands is None:
+        return None
+    return np.stack([to_series(model, index, band, horizon)[1] for band in bands])
+
+
+def batch_predict(horizon: int = MAX_HORIZON_HOURS, keep_versions: int = 24) -> str:
+    """
+    Forecast every location from its newest feature rows and write the result as a
+    versioned forecast table (location, issue_time, origin_time, time, y_pred, and one
+    y_p<q> column per FORECAST_QUANTILES band) under FORECASTS_DIR; `time` is the hour
+    the value is served for. All locations are scored in one pass over the trees, which
+    yields the point forecast and the quantile bands together. The API serves /forecast
+    from the newest table, so inference runs once per pipeline cycle. Only the newest
+    `keep_versions` tables are kept.
+    """
+    df = read_latest_features()
+    if "location" not in df.columns:
+        df["location"] = DEFAULT_LOCATION
+    with timer("tempo_model_load_seconds", "Model load time", component="predict"):
+        model = load_model(f"{MODELS_DIR}/model.pkl", f"{MODELS_DIR}/model.forest")
+
+    n = rows_needed(model, horizon)
+    df = df.sort_values(["location", "time"]).groupby("location", sort=False).tail(n)
+    X = df.drop(columns=target_columns(df)).select_dtypes(include=["number"])
+    with timer("tempo_predict_seconds", "Model predict time", component="batch"):
+        preds, bands = predict_intervals(model, X, FORECAST_QUANTILES)
+        preds = preds.reshape(len(X), -1)
+    count("tempo_rows_processed_total", len(X), "Rows produced per stage", stage="predict")
+
+    issue_time = datetime.now(timezone.utc).replace(microsecond=0)
+    times = pd.DatetimeIndex(pd.to_datetime(df["time"], utc=True))
+    frames = []
+    for loc, pos in df.groupby("location", sort=False).indices.items():
+        valid, values = to_series(model, times[pos], preds[pos], horizon)
+        frame = {
+            "location": str(loc),
+            "issue_time": pd.Timestamp(issue_time),
+            "origin_time": times[pos][-1],
+            "time": valid,
+            "y_pred": values,
+        }
+        if bands is not None:
+            loc_bands = to_bands(model, times[pos], bands[:, pos], horizon)
+            for q, band in zip(FORECAST_QUANTILES, loc_bands):
+                frame[f"y_{quantile_name(q)}"] = band
+        frames.append(pd.DataFrame(frame))
+    table = pd.concat(frames, ignore_index=True)
+    version = issue_time.strftime("%Y%m%dT%H%M%SZ")
+    path = f"{FORECASTS_DIR}/forecast_{version}.parquet"
+    save_parquet(table, path)
+
+    for old in sorted(glob.glob(f"{FORECASTS_DIR}/forecast_*.parquet"))[:-keep_versions]:
+        os.remove(old)
+
+    print("Predict OK:", table.tail(5)[["location", "time", "y_pred"]], f"-> {path}")
+    return path
 
 
 def main():
-    batch_predict()
+    with run_stage("predict", RUN_REPORTS_DIR):
+        batch_predict()
 
 
 if __name__ == "__main__":
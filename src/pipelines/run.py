@@ -0,0 +1,403 @@
+"""
+Run the whole pipeline as a DAG of memoized stages.
+
+    python -m src.pipelines.run                   # everything that is out of date
+    python -m src.pipelines.run --dry-run         # show what would run
+    python -m src.pipelines.run --stages train    # train and whatever it depends on
+    python -m src.pipelines.run --force features  # rerun features even if fresh
+
+    ingest_weather ─┐
+                    ├─> features ─> train ─> predict
+    ingest_air_quality ─┘
+
+Each stage is fingerprinted from the content hash of its input files, the config
+values it reads and the source of the modules that implement it. A stage is skipped
+when its fingerprint matches the one recorded in the manifest
+(PIPELINE_MANIFEST_PATH) after its last successful run and its outputs still exist.
+The manifest is rewritten after every stage, so rerunning after a failure resumes at
+the stage that failed. Stages whose dependencies are done run in parallel (the two
+upstream fetches do).
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import src.config as cfg
+from src.utils.instrument import run_stage
+from src.utils.io import atomic_write, today_stamp
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    fn: Callable[[], object]
+    deps: tuple[str, ...] = ()
+    # input files, resolved when the stage is about to run (after its deps)
+    inputs: Callable[[], list[str]] = lambda: []
+    # glob patterns that must each match a file for the stage to count as done
+    outputs: tuple[str, ...] = ()
+    params: Callable[[], dict] = lambda: {}
+    code: tuple[str, ...] = field(default_factory=tuple)
+
+
+# ---------- Fingerprints ----------
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_hash(path: str, cache: dict) -> str | None:
+    """Content hash of `path`, reused from `cache` while its size and mtime are unchanged."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    entry = cache.get(path)
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry["sha256"]
+    digest = _sha256(path)
+    cache[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+    return digest
+
+
+def code_version(modules: Iterable[str], cache: dict) -> dict:
+    """Source hash of each module (found without importing it)."""
+    out = {}
+    for name in modules:
+        spec = importlib.util.find_spec(name)
+        out[name] = file_hash(spec.origin, cache) if spec and spec.origin else None
+    return out
+
+
+def fingerprint(stage: Stage, cache: dict) -> str:
+    doc = {
+        "inputs": {p: file_hash(p, cache) for p in sorted(stage.inputs())},
+        "params": stage.params(),
+        "code": code_version(stage.code, cache),
+    }
+    return hashlib.sha256(json.dumps(doc, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def outputs_exist(stage: Stage) -> bool:
+    return all(glob.glob(pattern) for pattern in stage.outputs)
+
+
+# ---------- Manifest ----------
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+    manifest.setdefault("stages", {})
+    manifest.setdefault("files", {})
+    return manifest
+
+
+def save_manifest(manifest: dict, path: str) -> None:
+    with atomic_write(path) as tmp, open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+# ---------- Scheduler ----------
+def _select(stages: list[Stage], targets: Iterable[str] | None) -> list[Stage]:
+    """`stages` restricted to `targets` and everything upstream of them (order kept)."""
+    by_name = {s.name: s for s in stages}
+    if not targets:
+        return list(stages)
+    unknown = set(targets) - set(by_name)
+    if unknown:
+        raise ValueError(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    keep, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in keep:
+            keep.add(name)
+            todo.extend(by_name[name].deps)
+    return [s for s in stages if s.name in keep]
+
+
+def is_fresh(stage: Stage, fp: str, manifest: dict) -> bool:
+    entry = manifest["stages"].get(stage.name, {})
+    return entry.get("status") == "ok" and entry.get("fingerprint") == fp and outputs_exist(stage)
+
+
+def run_pipeline(
+    stages: list[Stage],
+    manifest_path: str,
+    targets: Iterable[str] | None = None,
+    force: Iterable[str] = (),
+    workers: int = 4,
+    dry_run: bool = False,
+) -> dict[str, str]:
+    """
+    Run out-of-date stages in dependency order, up to `workers` at a time. Returns
+    name -> 'ran' | 'skipped' | 'failed' | 'blocked' (a dependency failed), or with
+    `dry_run` name -> 'fresh' | 'stale' without running anything.
+    """
+    stages = _select(stages, targets)
+    names = {s.name for s in stages}
+    for s in stages:
+        missing = set(s.deps) - names
+        if missing:
+            raise ValueError(f"stage {s.name!r} depends on unknown {sorted(missing)}")
+    force = set(names if "all" in force else force)
+    manifest = load_manifest(manifest_path)
+    cache = manifest["files"]
+
+    if dry_run:
+        plan: dict[str, str] = {}
+        for s in stages:  # declared order is topological
+            upstream_stale = any(plan[d] == "stale" for d in s.deps)
+            fresh = not upstream_stale and s.name not in force
+            plan[s.name] = (
+                "fresh" if fresh and is_fresh(s, fingerprint(s, cache), manifest) else "stale"
+            )
+        return plan
+
+    status: dict[str, str] = {}
+    pending = list(stages)
+    running: dict = {}
+
+    def record(stage: Stage, fp: str | None, outcome: str, seconds: float = 0.0) -> None:
+        manifest["stages"][stage.name] = {
+            "status": outcome,
+            "fingerprint": fp,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "seconds": round(seconds, 3),
+        }
+        save_manifest(manifest, manifest_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="stage") as pool:
+        while pending or running:
+            progressed = False
+            for s in list(pending):
+                if any(status.get(d) in ("failed", "blocked") for d in s.deps):
+                    status[s.name] = "blocked"
+                    pending.remove(s)
+                    progressed = True
+                elif all(status.get(d) in ("ran", "skipped") for d in s.deps):
+                    pending.remove(s)
+                    progressed = True
+                    fp = fingerprint(s, cache)
+                    if s.name not in force and is_fresh(s, fp, manifest):
+                        status[s.name] = "skipped"
+                        print(f"[INFO] {s.name}: up to date")
+                        continue
+                    print(f"[INFO] {s.name}: running")
+                    running[pool.submit(s.fn)] = (s, fp, time.perf_counter())
+            if not running:
+                if not progressed:
+                    raise ValueError(f"dependency cycle among {[s.name for s in pending]}")
+                # stages were just skipped or blocked: rescan for newly ready ones
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                s, fp, t0 = running.pop(fut)
+                elapsed = time.perf_counter() - t0
+                if fut.exception() is None:
+                    status[s.name] = "ran"
+                    # inputs are re-hashed so edits made while the stage ran are not missed
+                    record(s, fingerprint(s, cache), "ok", elapsed)
+                else:
+                    status[s.name] = "failed"
+                    print(f"[WARN] {s.name} failed: {fut.exception()!r}")
+                    record(s, None, "error", elapsed)
+    return status
+
+
+# ---------- Project DAG ----------
+def _newest(pattern: str) -> list[str]:
+    files = sorted(glob.glob(pattern))
+    return files[-1:]
+
+
+def _ingest_params() -> dict:
+    return {
+        "lat": cfg.DEFAULT_LAT,
+        "lon": cfg.DEFAULT_LON,
+        "days": cfg.DATA_WINDOW_DAYS,
+        "urls": [cfg.OPENAQ_BASE_URL, cfg.OPEN_METEO_BASE_URL, cfg.OPEN_METEO_AIR_BASE_URL],
+        # upstream data moves on; raw snapshots are named per UTC day
+        "day": today_stamp(),
+    }
+
+
+def _stage(name: str, fn: Callable[[], object]) -> Callable[[], object]:
+    def call():
+        with run_stage(name, cfg.RUN_REPORTS_DIR, orchestrated=True):
+            return fn()
+
+    return call
+
+
+def _ingest_weather():
+    from src.pipelines.ingest import ingest_weather
+
+    ingest_weather()
+
+
+def _ingest_air_quality():
+    from src.pipelines.ingest import ingest_air_quality
+
+    ingest_air_quality()
+
+
+def _features():
+    from src.pipelines.features import build_features
+
+    build_features()
+
+
+def _train():
+    from src.pipelines.train import train_model
+
+    train_model()
+
+
+def _predict():
+    from src.pipelines.predict import batch_predict
+
+    batch_predict()
+
+
+def _alerts():
+    from src.pipelines.alerts import run_alerts
+
+    run_alerts()
+
+
+def _monitor():
+    from src.pipelines.monitor import run_monitor
+
+    run_monitor()
+
+
+def _model_params() -> dict:
+    from src.pipelines.train import MODEL_PARAMS
+
+    return dict(MODEL_PARAMS)
+
+
+def default_stages() -> list[Stage]:
+    """ingest (weather, AQ in parallel) -> features -> train -> predict -> alerts, monitor."""
+    weather = f"{cfg.RAW_DIR}/openmeteo_{today_stamp()}.parquet"
+    air = f"{cfg.RAW_DIR}/air_quality_{today_stamp()}.parquet"
+    return [
+        Stage(
+            "ingest_weather",
+            _stage("ingest_weather", _ingest_weather),
+            outputs=(weather,),
+            params=_ingest_params,
+            code=("src.pipelines.ingest", "src.utils.http", "src.utils.http_cache"),
+        ),
+        Stage(
+            "ingest_air_quality",
+            _stage("ingest_air_quality", _ingest_air_quality),
+            outputs=(air,),
+            params=_ingest_params,
+            code=("src.pipelines.ingest", "src.utils.http", "src.utils.http_cache"),
+        ),
+        Stage(
+            "features",
+            _stage("features", _features),
+            deps=("ingest_weather", "ingest_air_quality"),
+            inputs=lambda: _newest(cfg.OPENMETEO_RAW_PATTERN)
+            + _newest(cfg.AIR_QUALITY_RAW_PATTERN),
+            outputs=(cfg.FEATURES_PATH, cfg.LATEST_FEATURES_PATH),
+            params=lambda: {"max_horizon": cfg.MAX_HORIZON_HOURS},
+            code=("src.pipelines.features", "src.pipelines.feature_spec"),
+        ),
+        Stage(
+            "train",
+            _stage("train", _train),
+            deps=("features",),
+            inputs=lambda: [cfg.FEATURES_PATH],
+            outputs=(cfg.MODEL_PATH, cfg.FOREST_PATH, cfg.METRICS_PATH, cfg.FEATURE_SKETCH_PATH),
+            params=_model_params,
+            code=(
+                "src.pipelines.train",
+                "src.utils.forest",
+                "src.utils.metrics",
+                "src.utils.sketch",
+            ),
+        ),
+        Stage(
+            "predict",
+            _stage("predict", _predict),
+            deps=("features", "train"),
+            inputs=lambda: [cfg.LATEST_FEATURES_PATH, cfg.MODEL_PATH, cfg.FOREST_PATH],
+            outputs=(f"{cfg.FORECASTS_DIR}/forecast_*.parquet",),
+            params=lambda: {"max_horizon": cfg.MAX_HORIZON_HOURS},
+            code=("src.pipelines.predict", "src.utils.forest"),
+        ),
+        Stage(
+            "alerts",
+            _stage("alerts", _alerts),
+            deps=("predict",),
+            inputs=lambda: _newest(f"{cfg.FORECASTS_DIR}/forecast_*.parquet")
+            + [cfg.ALERT_RULES_PATH],
+            outputs=(f"{cfg.ALERTS_DIR}/active.parquet",),
+            params=lambda: {
+                "threshold": cfg.ALERT_AQI_THRESHOLD,
+                "clear_ratio": cfg.ALERT_CLEAR_RATIO,
+                "pollutant": cfg.ALERT_POLLUTANT,
+            },
+            code=("src.pipelines.alerts",),
+        ),
+        Stage(
+            "monitor",
+            _stage("monitor", _monitor),
+            deps=("ingest_air_quality", "predict"),
+            inputs=lambda: _newest(f"{cfg.FORECASTS_DIR}/forecast_*.parquet")
+            + _newest(cfg.AIR_QUALITY_RAW_PATTERN)
+            + [cfg.FEATURE_SKETCH_PATH],
+            outputs=(f"{cfg.MONITOR_DIR}/report.json",),
+            # observations keep arriving: score at most once per hour
+            params=lambda: {"hour": datetime.now(timezone.utc).strftime("%Y%m%dT%H")},
+            code=("src.pipelines.monitor", "src.utils.metrics", "src.utils.sketch"),
+        ),
+    ]
+
+
+def main(argv: list[str] | None = None) -> int:
+    stages = default_stages()
+    parser = argparse.ArgumentParser(description="Run the out-of-date pipeline stages.")
+    parser.add_argument("--stages", nargs="+", help="targets (their dependencies run too)")
+    parser.add_argument(
+        "--force", nargs="+", default=[], help="stages to rerun even if fresh ('all' for every one)"
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    result = run_pipeline(
+        stages,
+        cfg.PIPELINE_MANIFEST_PATH,
+        targets=args.stages,
+        force=args.force,
+        workers=args.workers,
+        dry_run=args.dry_run,
+    )
+    for name, outcome in result.items():
+        print(f"{name:<20} {outcome}")
+    return 1 if {"failed", "blocked"} & set(result.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,62 +1,249 @@
 # src/pipelines/train.py
 from __future__ import annotations
 
+import argparse
+import glob
 import os
-
-import joblib
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import r2_score
-from sklearn.model_selection import train_test_split
+from typing import TYPE_CHECKING
 
 import src.config as cfg
-from src.utils.io import save_json
+from src.pipelines.features import TARGET_RE, read_features, target_columns
+from src.utils.forest import export_forest
+from src.utils.instrument import count, run_stage, timer
+from src.utils.io import atomic_write, save_json
+from src.utils.lazy import lazy_import
 from src.utils.metrics import compute_metrics
+from src.utils.sketch import FeatureSketches
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestRegressor
+
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
 
 PROCESSED_DIR = cfg.PROCESSED_DIR
 MODELS_DIR = cfg.MODELS_DIR
 FEATURES_PATH = getattr(cfg, "FEATURES_PATH", str(PROCESSED_DIR / "features.parquet"))
+FEATURE_HISTORY_DIR = cfg.FEATURE_HISTORY_DIR
+TRAIN_ARRAYS_DIR = cfg.TRAIN_ARRAYS_DIR
+# share of the covered time span used for training; the newest rest validates
+TRAIN_FRACTION = 0.8
+
+
+def lead_hours(target_cols: list[str]) -> list[int]:
+    """Lead time of each target column (legacy 'y_next_h' was built at 24h)."""
+    return [int(TARGET_RE.fullmatch(c).group(1) or 24) for c in target_cols]
+
+
+# Default forest; `src.pipelines.backtest` searches around it
+MODEL_PARAMS = {"n_estimators": 200, "max_depth": None}
 
 
-def train_model():
-    # Load features
-    df = pd.read_parquet(FEATURES_PATH)
+def make_model(params: dict | None = None, n_jobs: int = -1) -> RandomForestRegressor:
+    from sklearn.ensemble import RandomForestRegressor
 
-    # Prefer new explicit name 'y_next_24h'; otherwise fallback to 'y_next_h'
-    target_col_candidates = ["y_next_24h", "y_next_h"]
-    target_col = next((c for c in target_col_candidates if c in df.columns), None)
-    if target_col is None:
+    return RandomForestRegressor(
+        **{**MODEL_PARAMS, **(params or {})}, n_jobs=n_jobs, random_state=42
+    )
+
+
+def xy(df) -> tuple:
+    """(X, Y, target_cols): numeric features and the y_next_{h}h targets, time order kept."""
+    # All y_next_{h}h targets are learnt by one multi-output forest sharing X
+    target_cols = target_columns(df)
+    if not target_cols:
         raise KeyError(
-            f"No target column found. Expected one of: {target_col_candidates}. "
-            f"Make sure features were built with horizon 24h or adjust train.py accordingly."
+            "No target column found. Expected y_next_{h}h columns (or legacy 'y_next_h'). "
+            "Make sure features were built by src.pipelines.features."
         )
-
-    y = df[target_col]
-    # Drop only the target col; keep all numeric features
-    X = df.drop(columns=[target_col], errors="ignore")
+    df = df.dropna(subset=target_cols)
+    Y = df[target_cols]
+    # Drop only the target cols; keep all numeric features
+    X = df.drop(columns=target_cols, errors="ignore")
     X = X.select_dtypes(include=["number"]).copy()
+    return X, Y, target_cols
 
-    # Time-aware split (no shuffle)
-    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, shuffle=False)
 
-    model = RandomForestRegressor(n_estimators=200, max_depth=None, n_jobs=-1, random_state=42)
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_val)
+def train_model(out_of_core: bool = False, batch_rows: int = 65_536):
+    # scikit-learn/joblib are only needed once training actually runs
+    from sklearn.model_selection import train_test_split
 
-    metrics = compute_metrics(y_val.values, y_pred)
-    metrics["R2"] = float(r2_score(y_val.values, y_pred))
-    metrics["target_col"] = target_col
-    metrics["n_train"] = int(X_train.shape[0])
-    metrics["n_val"] = int(X_val.shape[0])
+    if out_of_core:
+        X, Y, feature_cols, target_cols, n_train = stream_arrays(
+            training_files(), batch_rows=batch_rows
+        )
+        X_train, y_train, X_val, y_val = X[:n_train], Y[:n_train], X[n_train:], Y[n_train:]
+    else:
+        # Load features
+        df = read_features(FEATURES_PATH)
+        X, Y, target_cols = xy(df)
+        # Time-aware split (no shuffle)
+        X_train, X_val, y_train, y_val = train_test_split(X, Y, test_size=0.2, shuffle=False)
+        y_train, y_val = y_train.to_numpy(), y_val.to_numpy()
+        feature_cols = list(X.columns)
+
+    model = make_model()
+    with timer("tempo_model_fit_seconds", "Model fit time"):
+        model.fit(X_train, y_train if len(target_cols) > 1 else y_train[:, 0])
+    # fitted attribute read by predict/API to map outputs to lead times
+    model.lead_hours_ = lead_hours(target_cols)
+    with timer("tempo_predict_seconds", "Model predict time", component="validation"):
+        # in slices: the validation rows may be a memory-mapped array larger than RAM
+        y_pred = np.concatenate(
+            [
+                model.predict(X_val[i : i + batch_rows]).reshape(-1, len(target_cols))
+                for i in range(0, len(X_val), batch_rows)
+            ]
+        )
+    if out_of_core:
+        # fitted on plain arrays: record the column order so DataFrame callers (API,
+        # predict, the compact forest) select the right columns
+        model.feature_names_in_ = np.array(feature_cols, dtype=object)
+    count("tempo_rows_processed_total", len(X_train), "Rows produced per stage", stage="train")
+    # reference distribution of the training features, for the drift monitor
+    sketch = FeatureSketches.fit(X_train, feature_cols, batch_rows=batch_rows)
+    _save(model, target_cols, np.asarray(y_val), y_pred, len(X_train), sketch)
+
+
+def _save(
+    model, target_cols: list[str], y_true, y_pred, n_train: int, sketch: FeatureSketches
+) -> None:
+    from sklearn.metrics import r2_score
+
+    # Headline metrics on the 24h lead (comparable with single-horizon runs)
+    main_idx = target_cols.index("y_next_24h") if "y_next_24h" in target_cols else 0
+    metrics = compute_metrics(y_true[:, main_idx], y_pred[:, main_idx])
+    metrics["R2"] = float(r2_score(y_true[:, main_idx], y_pred[:, main_idx]))
+    metrics["target_col"] = target_cols[main_idx]
+    metrics["n_train"] = int(n_train)
+    metrics["n_val"] = int(y_true.shape[0])
+    metrics["lead_hours"] = model.lead_hours_
+    if len(target_cols) > 1:
+        metrics["per_horizon"] = {
+            col: compute_metrics(y_true[:, i], y_pred[:, i]) for i, col in enumerate(target_cols)
+        }
+
+    import joblib
 
     os.makedirs(MODELS_DIR, exist_ok=True)
-    joblib.dump(model, str(MODELS_DIR / "model.pkl"))
+    with atomic_write(str(MODELS_DIR / "model.pkl")) as tmp:
+        joblib.dump(model, tmp)
+    # flat node arrays the API and predict map instead of unpickling
+    export_forest(model, str(MODELS_DIR / "model.forest"))
     save_json(metrics, str(MODELS_DIR / "metrics.json"))
-    print("Train OK:", metrics)
-
-
-def main():
-    train_model()
+    save_json(sketch.to_dict(), cfg.FEATURE_SKETCH_PATH)
+    print("Train OK:", {k: v for k, v in metrics.items() if k != "per_horizon"})
+
+
+# ---------- Out-of-core training ----------
+def training_files() -> list[str]:
+    """The backfilled history if there is one, else the regular feature store files."""
+    history = sorted(glob.glob(f"{FEATURE_HISTORY_DIR}/location=*/part-*.parquet"))
+    if history:
+        return history
+    paths = [FEATURES_PATH] if os.path.exists(FEATURES_PATH) else []
+    paths += sorted(glob.glob(f"{cfg.FEATURE_PARTS_DIR}/part-*.parquet"))
+    if not paths:
+        raise FileNotFoundError(f"No features under {FEATURE_HISTORY_DIR} or at {FEATURES_PATH}")
+    return paths
+
+
+def _epoch_us(col) -> np.ndarray:
+    # files may store ns or us timestamps: compare on one unit
+    return col.cast(pa.timestamp("us", tz=col.type.tz)).cast(pa.int64()).to_numpy()
+
+
+def _array_columns(paths: list[str]) -> tuple[list[str], list[str]]:
+    """Numeric feature columns and target columns present in every file, in order."""
+    schemas = [pq.read_schema(p) for p in paths]
+    common = set(schemas[0].names).intersection(*(s.names for s in schemas[1:]))
+    numeric = [
+        f.name
+        for f in schemas[0]
+        if f.name in common and (pa.types.is_floating(f.type) or pa.types.is_integer(f.type))
+    ]
+    targets = [c for c in numeric if TARGET_RE.fullmatch(c)]
+    targets.sort(key=lambda c: int(TARGET_RE.fullmatch(c).group(1) or 0))
+    return [c for c in numeric if c not in targets], targets
+
+
+def stream_arrays(
+    paths: list[str], out_dir: str | None = None, batch_rows: int = 65_536
+) -> tuple[np.memmap, np.memmap, list[str], list[str], int]:
+    """
+    Stream feature files into memory-mapped X (float32) / Y (float64) .npy arrays.
+
+    Two passes of `batch_rows` record batches: the first reads only `time` to place
+    the train/validation cut at TRAIN_FRACTION of the covered time span, the second
+    decodes the columns and writes each batch's training rows from the front of the
+    arrays and its validation rows from the back. Resident memory is one batch, so the
+    history can be far larger than RAM; scikit-learn fits on the memmaps without copying.
+
+    Returns (X, Y, feature_cols, target_cols, n_train): rows [:n_train] train, the
+    remaining rows validate.
+    """
+    feature_cols, target_cols = _array_columns(paths)
+    if not target_cols:
+        raise KeyError("No y_next_{h}h target columns in the feature files.")
+    lo, hi = None, None
+    for p in paths:
+        for batch in pq.ParquetFile(p).iter_batches(batch_size=batch_rows, columns=["time"]):
+            t = _epoch_us(batch.column(0))
+            if len(t):
+                lo = t.min() if lo is None else min(lo, t.min())
+                hi = t.max() if hi is None else max(hi, t.max())
+    if lo is None:
+        raise ValueError("Feature files hold no rows.")
+    cutoff = lo + TRAIN_FRACTION * (hi - lo)
+
+    out_dir = out_dir or TRAIN_ARRAYS_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    n = sum(pq.ParquetFile(p).metadata.num_rows for p in paths)
+    X = np.lib.format.open_memmap(
+        f"{out_dir}/X.npy", mode="w+", dtype="float32", shape=(n, len(feature_cols))
+    )
+    Y = np.lib.format.open_memmap(
+        f"{out_dir}/Y.npy", mode="w+", dtype="float64", shape=(n, len(target_cols))
+    )
+    front, back = 0, n
+    columns = ["time", *feature_cols, *target_cols]
+    for p in paths:
+        for batch in pq.ParquetFile(p).iter_batches(batch_size=batch_rows, columns=columns):
+            block = np.column_stack(
+                [batch.column(c).to_numpy(zero_copy_only=False) for c in columns[1:]]
+            )
+            x, y = block[:, : len(feature_cols)], block[:, len(feature_cols) :]
+            ok = np.isfinite(y).all(axis=1)
+            val = _epoch_us(batch.column(0)) >= cutoff
+            train_rows, val_rows = ok & ~val, ok & val
+            k = int(train_rows.sum())
+            X[front : front + k], Y[front : front + k] = x[train_rows], y[train_rows]
+            front += k
+            k = int(val_rows.sum())
+            X[back - k : back], Y[back - k : back] = x[val_rows], y[val_rows]
+            back -= k
+    # rows dropped for unknown targets leave a gap between the two regions: close it
+    # batch by batch (never the whole validation block at once)
+    for i in range(0, n - back if back > front else 0, batch_rows):
+        src = slice(back + i, min(back + i + batch_rows, n))
+        dst = slice(front + i, front + i + src.stop - src.start)
+        X[dst], Y[dst] = X[src], Y[src]
+    X.flush(), Y.flush()
+    n_rows = front + n - back
+    return X[:n_rows], Y[:n_rows], feature_cols, target_cols, front
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Train the multi-horizon forecast model.")
+    parser.add_argument(
+        "--out-of-core",
+        action="store_true",
+        help="stream the feature files (backfilled history first) into memmapped arrays",
+    )
+    args = parser.parse_args(argv)
+    with run_stage("train", cfg.RUN_REPORTS_DIR, out_of_core=args.out_of_core):
+        train_model(out_of_core=args.out_of_core)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+"""
+Compact, memory-mappable export of a fitted RandomForestRegressor.
+
+    export_forest(model, "models/model.forest")
+    forest = load_forest("models/model.forest")   # np.memmap views, no unpickling
+    forest.predict(X)                             # == model.predict(X)
+    forest.predict_intervals(X, (0.1, 0.5, 0.9))  # + quantiles of the trees' leaf values
+
+All trees are flattened into one set of contiguous node arrays (children, feature,
+threshold, value) written to a single file: a small JSON header followed by the raw
+arrays, each 64-byte aligned. Loading maps the file read-only, so every API worker on
+a host shares the same page-cache pages instead of holding a private unpickled copy.
+
+Prediction intervals come from the same traversal as the point forecast: `apply` walks
+every (sample, tree) pair at once, and the leaf values it reaches are both averaged
+(the forecast) and reduced to quantiles (the band), so no tree is evaluated twice.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import weakref
+
+from src.utils.io import atomic_write
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+MAGIC = b"TEMPOFST"
+VERSION = 1
+_ALIGN = 64
+_LEAF = -1
+# (rows x trees x outputs) leaf values gathered at once for the quantiles
+BLOCK_CELLS = 4_000_000
+
+
+def quantile_name(q: float) -> str:
+    """Field name of a forecast quantile: 0.1 -> "p10"."""
+    return f"p{q * 100:g}"
+
+
+def _flatten(model) -> tuple[dict[str, np.ndarray], dict]:
+    """Concatenate the node arrays of every tree; child ids become global node ids."""
+    trees = [est.tree_ for est in model.estimators_]
+    sizes = np.array([t.node_count for t in trees], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    def children(attr: str) -> np.ndarray:
+        parts = []
+        for t, off in zip(trees, offsets):
+            c = getattr(t, attr).astype(np.int64)
+            parts.append(np.where(c == _LEAF, _LEAF, c + off))
+        return np.concatenate(parts)
+
+    n_outputs = int(model.n_outputs_)
+    arrays = {
+        "roots": offsets.astype(np.int64),
+        "left": children("children_left"),
+        "right": children("children_right"),
+        "feature": np.concatenate([t.feature for t in trees]).astype(np.int64),
+        "threshold": np.concatenate([t.threshold for t in trees]).astype(np.float64),
+        # regression trees store value as (node, output, 1)
+        "value": np.concatenate([t.value.reshape(t.node_count, n_outputs) for t in trees]),
+    }
+    if all(hasattr(t, "missing_go_to_left") for t in trees):
+        arrays["missing_left"] = np.concatenate([t.missing_go_to_left for t in trees]).astype(
+            np.bool_
+        )
+    meta = {
+        "n_trees": len(trees),
+        "n_outputs": n_outputs,
+        "n_features": int(model.n_features_in_),
+        "feature_names": [str(c) for c in getattr(model, "feature_names_in_", [])],
+        "lead_hours": [int(h) for h in getattr(model, "lead_hours_", [])],
+    }
+    return arrays, meta
+
+
+def export_forest(model, path: str) -> str:
+    """Write `model` (a fitted sklearn forest regressor) as a single mappable file."""
+    arrays, meta = _flatten(model)
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        offset = -(-offset // _ALIGN) * _ALIGN
+        layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += arr.nbytes
+    header = json.dumps({"version": VERSION, "meta": meta, "arrays": layout}).encode()
+    # data starts on an aligned boundary after magic + header length + header
+    start = -(-(len(MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+    with atomic_write(path) as tmp, open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, arr in arrays.items():
+            f.seek(start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+    return path
+
+
+class CompactForest:
+    """
+    Inference-only forest over flat node arrays (memory-mapped by `load_forest`).
+
+    Mirrors the parts of the sklearn API the pipeline uses: `predict`,
+    `n_features_in_`, `feature_names_in_`, `n_outputs_` and `lead_hours_`; adds
+    `predict_intervals`.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray], meta: dict):
+        self.roots = arrays["roots"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]
+        self.missing_left = arrays.get("missing_left")
+        self.n_trees = meta["n_trees"]
+        self.n_outputs_ = meta["n_outputs"]
+        self.n_features_in_ = meta["n_features"]
+        if meta["feature_names"]:
+            self.feature_names_in_ = np.array(meta["feature_names"], dtype=object)
+        if meta["lead_hours"]:
+            self.lead_hours_ = meta["lead_hours"]
+
+    def apply(self, X) -> np.ndarray:
+        """Global leaf id reached by each sample in each tree, shape (n_samples, n_trees)."""
+        # trees split on float32 features (as sklearn does) against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n = X.shape[0]
+        rows = np.repeat(np.arange(n), self.n_trees)
+        node = np.tile(np.asarray(self.roots), n)
+        # walk all (sample, tree) pairs one level at a time, dropping those at a leaf
+        active = np.flatnonzero(self.left[node] != _LEAF)
+        while active.size:
+            cur = node[active]
+            x = X[rows[active], self.feature[cur]]
+            go_left = x <= self.threshold[cur]
+            if self.missing_left is not None:
+                go_left |= np.isnan(x) & self.missing_left[cur]
+            nxt = np.where(go_left, self.left[cur], self.right[cur])
+            node[active] = nxt
+            active = active[self.left[nxt] != _LEAF]
+        return node.reshape(n, self.n_trees)
+
+    def _matrix(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame) and hasattr(self, "feature_names_in_"):
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, expected (n, {self.n_features_in_})")
+        return X
+
+    def _average(self, leaves: np.ndarray) -> np.ndarray:
+        # accumulate tree by tree, in sklearn's order, so the float sums match exactly
+        out = np.zeros((leaves.shape[0], self.n_outputs_))
+        for t in range(self.n_trees):
+            out += self.value[leaves[:, t]]
+        out /= self.n_trees
+        return out[:, 0] if self.n_outputs_ == 1 else out
+
+    def predict(self, X) -> np.ndarray:
+        return self._average(self.apply(self._matrix(X)))
+
+    def predict_intervals(self, X, quantiles) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (`predict(X)`, quantiles of the trees' leaf values) from one traversal. The
+        quantiles have shape (len(quantiles), *point.shape): one `predict`-shaped
+        array per quantile.
+        """
+        leaves = self.apply(self._matrix(X))
+        n = leaves.shape[0]
+        # np.quantile's default (linear) method, from one sort of the tree axis: cheaper
+        # than np.quantile itself, which partitions once per order statistic
+        pos = np.asarray(quantiles, dtype="float64") * (self.n_trees - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, self.n_trees - 1)
+        frac = (pos - lo)[:, None, None]
+        bands = np.empty((len(pos), n, self.n_outputs_))
+        step = max(1, BLOCK_CELLS // max(1, self.n_trees * self.n_outputs_))
+        for i in range(0, n, step):
+            # (rows, trees, outputs), each (row, output) sorted over the trees
+            ordered = np.sort(self.value[leaves[i : i + step]], axis=1)
+            low, high = ordered[:, lo].swapaxes(0, 1), ordered[:, hi].swapaxes(0, 1)
+            bands[:, i : i + step] = low + frac * (high - low)
+        return self._average(leaves), bands[:, :, 0] if self.n_outputs_ == 1 else bands
+
+
+def load_forest(path: str) -> CompactForest:
+    """Map an exported forest read-only; nothing is copied into process memory."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a forest export")
+        (size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(size))
+    if header["version"] != VERSION:
+        raise ValueError(f"Unsupported forest export version {header['version']}")
+    start = -(-(len(MAGIC) + 8 + size) // _ALIGN) * _ALIGN
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        if not np.prod(shape):
+            arrays[name] = np.empty(shape, dtype=spec["dtype"])
+            continue
+        arrays[name] = np.memmap(
+            path, dtype=spec["dtype"], mode="r", offset=start + spec["offset"], shape=shape
+        )
+    return CompactForest(arrays, header["meta"])
+
+
+def load_model(model_path: str, forest_path: str | None = None):
+    """
+    The compact export when it is at least as recent as the pickle, else the pickle.
+    A stale export (older than model.pkl) is ignored rather than served.
+    """
+    import joblib
+
+    if forest_path and os.path.exists(forest_path):
+        if not os.path.exists(model_path) or (
+            os.stat(forest_path).st_mtime_ns >= os.stat(model_path).st_mtime_ns
+        ):
+            return load_forest(forest_path)
+    return joblib.load(model_path)
+
+
+# in-memory compact views of pickled sklearn forests, built once per model object
+_compact: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def as_compact(model) -> CompactForest | None:
+    """`model` as a CompactForest (itself, or a cached flat copy of an sklearn forest)."""
+    if isinstance(model, CompactForest):
+        return model
+    trees = getattr(model, "estimators_", None)
+    # averaged regression trees only (a boosted ensemble's estimators_ is not a list)
+    if not isinstance(trees, list) or not all(hasattr(t, "tree_") for t in trees):
+        return None
+    forest = _compact.get(model)
+    if forest is None:
+        forest = _compact[model] = CompactForest(*_flatten(model))
+    return forest
+
+
+def predict_intervals(model, X, quantiles) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    (point forecast, quantile bands) for a served model, from one batched traversal of
+    all trees. Bands are None for a model that is not a forest or when no quantiles
+    are asked; the point forecast is then `model.predict(X)`.
+    """
+    forest = as_compact(model) if len(quantiles) else None
+    if forest is None:
+        return model.predict(X), None
+    return forest.predict_intervals(X, quantiles)
@@ -1,5 +1,231 @@
+"""
+Coordinates of the ingested locations and a spatial index over them.
+
+    index = GridIndex.build({"paris": (48.85, 2.35), "lyon": (45.76, 4.83)})
+    index.nearest(48.0, 2.0, k=2)    # [("paris", 95.3), ("lyon", 340.1)]  (name, km)
+    index.weights(48.0, 2.0, k=2)    # inverse-distance weights, summing to 1
+
+Points are bucketed into fixed `cell_deg` x `cell_deg` lat/lon cells. A query scans
+rings of cells around its own cell and stops as soon as no unvisited ring can hold a
+closer point, so a lookup touches a handful of dict entries (a few microseconds) instead
+of every location. Sparse indexes fall back to a linear scan once that is cheaper.
+Indexes are never mutated once built: `extended()` returns a new index sharing the
+untouched cells, so adding locations does not re-bucket the existing ones.
+"""
+
 from __future__ import annotations
 
+import json
+import math
+import os
+
+from src.utils.io import atomic_write
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+
 
 def point_to_bbox(lat: float, lon: float, delta: float = 0.1):
     return (lat - delta, lon - delta, lat + delta, lon + delta)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _unit(lat: float, lon: float) -> tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+def _chord2(km: float) -> float:
+    """Squared chord length (unit sphere) of a great-circle distance."""
+    return (2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)) ** 2
+
+
+def _chord_km(chord2: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord2) / 2))
+
+
+# ---------- Location registry ----------
+def read_locations(path: str) -> dict[str, tuple[float, float]]:
+    """name -> (lat, lon) recorded by ingest (empty if nothing was recorded yet)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return {name: (float(p["lat"]), float(p["lon"])) for name, p in raw.items()}
+
+
+def record_locations(path: str, points: dict[str, tuple[float, float]]) -> None:
+    """Upsert `points` into the registry at `path` (atomic rewrite)."""
+    merged = {**read_locations(path), **points}
+    body = {name: {"lat": lat, "lon": lon} for name, (lat, lon) in sorted(merged.items())}
+    with atomic_write(path) as tmp, open(tmp, "w", encoding="utf-8") as f:
+        json.dump(body, f, indent=2)
+
+
+# ---------- Spatial index ----------
+class GridIndex:
+    def __init__(self, cell_deg: float = 1.0):
+        self.cell_deg = cell_deg
+        self.n_lon = math.ceil(360 / cell_deg)
+        self.n_lat = math.ceil(180 / cell_deg)
+        self._cells: dict[tuple[int, int], tuple[str, ...]] = {}
+        self._points: dict[str, tuple[float, float]] = {}
+        # unit vectors: the squared chord length ranks points like the great-circle
+        # distance, at the cost of three multiplications
+        self._vecs: dict[str, tuple[float, float, float]] = {}
+
+    @classmethod
+    def build(cls, points: dict[str, tuple[float, float]], cell_deg: float = 1.0) -> GridIndex:
+        return cls(cell_deg).extended(points)
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._points
+
+    @property
+    def points(self) -> dict[str, tuple[float, float]]:
+        return dict(self._points)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return (
+            min(int((lat + 90) // self.cell_deg), self.n_lat - 1),
+            int((lon + 180) // self.cell_deg) % self.n_lon,
+        )
+
+    def extended(self, points: dict[str, tuple[float, float]]) -> GridIndex:
+        """
+        A new index with `points` added (or moved). Only the cells they touch are
+        copied; everything else is shared with this index.
+        """
+        new = GridIndex(self.cell_deg)
+        new._cells = dict(self._cells)
+        new._points = dict(self._points)
+        new._vecs = dict(self._vecs)
+        for name, (lat, lon) in points.items():
+            old = new._points.get(name)
+            if old == (lat, lon):
+                continue
+            if old is not None:
+                cell = new._cell(*old)
+                new._cells[cell] = tuple(n for n in new._cells[cell] if n != name)
+            cell = new._cell(lat, lon)
+            new._cells[cell] = new._cells.get(cell, ()) + (name,)
+            new._points[name] = (lat, lon)
+            new._vecs[name] = _unit(lat, lon)
+        return new
+
+    def _ring(self, ci: int, cj: int, r: int):
+        """Cells at Chebyshev distance `r` from (ci, cj), longitude wrapped, each once."""
+        if r == 0:
+            yield ci, cj
+            return
+        n_lon = self.n_lon
+        width = min(2 * r + 1, n_lon)  # a ring wider than the globe wraps onto itself
+        for di in range(-r, r + 1):
+            i = ci + di
+            if not 0 <= i < self.n_lat:
+                continue
+            if abs(di) == r:
+                # full top/bottom rows
+                for dj in range(width):
+                    yield i, (cj - r + dj) % n_lon
+            elif 2 * r + 1 <= n_lon:
+                # only the two side cells in between
+                yield i, (cj - r) % n_lon
+                yield i, (cj + r) % n_lon
+
+    def nearest(self, lat: float, lon: float, k: int = 1, allowed=None) -> list[tuple[str, float]]:
+        """Up to `k` (name, km) pairs, closest first; `allowed` restricts the names."""
+        if not self._points or k < 1:
+            return []
+        q = _unit(lat, lon)
+        ci, cj = self._cell(lat, lon)
+        cells, vecs = self._cells, self._vecs
+        best: list[tuple[float, str]] = []  # (squared chord length, name)
+        # past this many cell visits a linear scan is cheaper
+        budget = len(self._points) // 2 + 16
+        visited = 0
+        width_km = self.cell_deg * KM_PER_DEG
+        for r in range(max(self.n_lat, self.n_lon // 2) + 1):
+            for cell in self._ring(ci, cj, r):
+                visited += 1
+                for name in cells.get(cell, ()):
+                    if allowed is None or name in allowed:
+                        v = vecs[name]
+                        d = (v[0] - q[0]) ** 2 + (v[1] - q[1]) ** 2 + (v[2] - q[2]) ** 2
+                        best.append((d, name))
+            if visited > budget:
+                return self._scan(q, k, allowed)
+            if len(best) >= k:
+                best.sort()
+                del best[k:]
+                # any point beyond ring r is at least r cells away: the narrowest cell is
+                # its longitude width at the highest latitude that ring reaches
+                lat_edge = min(90.0, abs(lat) + (r + 2) * self.cell_deg)
+                bound_km = r * width_km * math.cos(math.radians(lat_edge))
+                if best[-1][0] <= _chord2(bound_km):
+                    break
+        best.sort()
+        return [(name, _chord_km(d)) for d, name in best[:k]]
+
+    def _scan(self, q, k: int, allowed) -> list[tuple[str, float]]:
+        dists = sorted(
+            ((v[0] - q[0]) ** 2 + (v[1] - q[1]) ** 2 + (v[2] - q[2]) ** 2, name)
+            for name, v in self._vecs.items()
+            if allowed is None or name in allowed
+        )
+        return [(name, _chord_km(d)) for d, name in dists[:k]]
+
+    def weights(
+        self, lat: float, lon: float, k: int = 1, power: float = 2.0, allowed=None
+    ) -> list[tuple[str, float]]:
+        """
+        Inverse-distance weights (summing to 1) of the `k` nearest points; a point
+        closer than 10 m takes the whole weight.
+        """
+        hits = self.nearest(lat, lon, k, allowed)
+        if not hits:
+            return []
+        if hits[0][1] < 0.01 or len(hits) == 1:
+            return [(hits[0][0], 1.0)]
+        raw = [(name, 1.0 / km**power) for name, km in hits]
+        total = sum(w for _, w in raw)
+        return [(name, w / total) for name, w in raw]
+
+
+class LocationIndex:
+    """
+    The `GridIndex` over the location registry file, rebuilt only when the file
+    changes, and then by extending the previous index with the new locations.
+    """
+
+    def __init__(self, path: str, defaults: dict[str, tuple[float, float]], cell_deg: float = 1.0):
+        self.path = path
+        self.defaults = defaults
+        self.cell_deg = cell_deg
+        self._index = GridIndex.build(defaults, cell_deg)
+        self._mtime: int | None = None
+
+    def get(self) -> GridIndex:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            points = {**self.defaults, **read_locations(self.path)}
+            if set(self._index._points) <= set(points):
+                self._index = self._index.extended(points)
+            else:
+                # locations were removed: start over
+                self._index = GridIndex.build(points, self.cell_deg)
+            self._mtime = mtime
+        return self._index
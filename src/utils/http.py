@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HostRateLimiter:
+    """Space out requests to the same host so we stay under `rate_per_sec` (0 = unlimited)."""
+
+    def __init__(self, rate_per_sec: float = 0.0):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self._next_slot: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PooledSession(requests.Session):
+    """requests.Session whose calls go through a shared per-host rate limiter."""
+
+    def __init__(self, limiter: HostRateLimiter | None = None):
+        super().__init__()
+        self.limiter = limiter or HostRateLimiter()
+
+    def request(self, method, url, *args, **kwargs):
+        self.limiter.acquire(urlsplit(url).netloc)
+        return super().request(method, url, *args, **kwargs)
+
+
+def make_session(pool_size: int = 10, rate_per_host: float = 0.0, retries: int = 3):
+    """
+    Build a keep-alive session safe to share across worker threads.
+
+    `pool_size` should be >= the number of workers, otherwise urllib3 discards
+    connections instead of returning them to the pool.
+    """
+    session = PooledSession(HostRateLimiter(rate_per_host))
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,230 @@
+"""
+Persistent on-disk cache for upstream GET responses.
+
+    from src.utils import http_cache
+    r = http_cache.get(session, url, params=params, timeout=30, source="open_meteo")
+
+Entries are keyed by the method and the normalized URL (scheme/host lowercased, query
+parameters sorted), stored gzip-compressed under HTTP_CACHE_DIR and expire after the
+per-source TTL (HTTP_CACHE_TTLS). Only 200 responses are stored. When the cache grows
+past HTTP_CACHE_MAX_MB, the least recently used entries are evicted.
+
+Modes (HTTP_CACHE_MODE, or `ingest --http-cache`):
+- use:     serve fresh entries, fetch and store otherwise (default);
+- refresh: always fetch, store the result;
+- replay:  serve from the cache only, whatever the age; a miss raises `CacheMiss`
+           and nothing touches the network (offline tests, benchmarks, demos);
+- off:     plain pass-through.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import src.config as cfg
+from src.utils.instrument import count
+from src.utils.io import atomic_write
+
+MODES = ("use", "refresh", "replay", "off")
+
+
+class CacheMiss(requests.ConnectionError):
+    """Replay mode found no cached response; callers treat it like a network failure."""
+
+
+def cache_key(url: str, params: dict | None = None, method: str = "GET") -> str:
+    """Hash of the request with query parameters in a canonical order."""
+    prepared = requests.Request(method, url, params=params).prepare()
+    parts = urlsplit(prepared.url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    normalized = urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, "")
+    )
+    return hashlib.sha256(f"{method.upper()} {normalized}".encode()).hexdigest()
+
+
+def _response(meta: dict, body: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = meta["status"]
+    resp.reason = "OK"
+    resp.url = meta["url"]
+    resp.headers = CaseInsensitiveDict(meta["headers"])
+    resp._content = body
+    return resp
+
+
+class HttpCache:
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 256 * 2**20,
+        ttls: dict[str, int] | None = None,
+        mode: str = "use",
+    ):
+        if mode not in MODES:
+            raise ValueError(f"unknown cache mode {mode!r} (expected one of {MODES})")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = ttls or {"default": 3600}
+        self.mode = mode
+        self._size: int | None = None  # bytes on disk, scanned on first store
+        self._lock = threading.Lock()
+
+    def ttl(self, source: str) -> int:
+        return self.ttls.get(source, self.ttls.get("default", 0))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    # ---------- Entries ----------
+    def load(self, key: str) -> tuple[dict, bytes] | None:
+        try:
+            with gzip.open(self._path(key), "rb") as f:
+                raw = f.read()
+        except (FileNotFoundError, OSError, EOFError):
+            return None
+        header, _, body = raw.partition(b"\n")
+        try:
+            return json.loads(header), body
+        except ValueError:
+            return None
+
+    def store(self, key: str, resp: requests.Response, source: str) -> None:
+        meta = {
+            "url": resp.url,
+            "status": resp.status_code,
+            "headers": {k: v for k, v in resp.headers.items() if k.lower() == "content-type"},
+            "source": source,
+            "fetched_at": time.time(),
+        }
+        path = self._path(key)
+        old = os.path.getsize(path) if os.path.exists(path) else 0
+        with atomic_write(path) as tmp, gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(json.dumps(meta).encode() + b"\n")
+            f.write(resp.content)
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += os.path.getsize(path) - old
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        out = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    p = os.path.join(root, name)
+                    try:
+                        st = os.stat(p)
+                    except FileNotFoundError:
+                        continue
+                    out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, target: float = 0.9) -> int:
+        """Drop least recently used entries until under `target` * max_bytes."""
+        with self._lock:
+            entries = sorted(self._entries())
+            size = sum(s for _, s, _ in entries)
+            removed = 0
+            for _, s, p in entries:
+                if size <= self.max_bytes * target:
+                    break
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+                size -= s
+                removed += 1
+            self._size = size
+        count("tempo_http_cache_evictions_total", removed, "HTTP cache entries evicted")
+        return removed
+
+    # ---------- Lookups ----------
+    def get(
+        self,
+        http,
+        url: str,
+        params: dict | None = None,
+        timeout: float | None = None,
+        source: str = "default",
+    ) -> requests.Response:
+        """`http.get(url, params=..., timeout=...)` through the cache (see module docstring)."""
+        if self.mode == "off":
+            return http.get(url, params=params, timeout=timeout)
+
+        key = cache_key(url, params)
+        if self.mode != "refresh":
+            entry = self.load(key)
+            if entry is not None:
+                meta, body = entry
+                if self.mode == "replay" or time.time() - meta["fetched_at"] <= self.ttl(source):
+                    os.utime(self._path(key))  # LRU order = mtime
+                    self._count(source, "hit")
+                    return _response(meta, body)
+            if self.mode == "replay":
+                self._count(source, "miss")
+                raise CacheMiss(f"no cached response for {url} (replay mode)")
+
+        self._count(source, "miss" if self.mode == "use" else "refresh")
+        resp = http.get(url, params=params, timeout=timeout)
+        if resp.status_code == 200:
+            self.store(key, resp, source)
+        return resp
+
+    @staticmethod
+    def _count(source: str, outcome: str) -> None:
+        count(
+            "tempo_http_cache_requests_total",
+            1,
+            "HTTP cache lookups",
+            source=source,
+            outcome=outcome,
+        )
+
+
+# ---------- Process-wide cache ----------
+_default: HttpCache | None = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> HttpCache:
+    """The cache configured from settings, created on first use."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = HttpCache(
+                    cfg.HTTP_CACHE_DIR,
+                    max_bytes=cfg.HTTP_CACHE_MAX_MB * 2**20,
+                    ttls=cfg.HTTP_CACHE_TTLS,
+                    mode=cfg.HTTP_CACHE_MODE,
+                )
+    return _default
+
+
+def set_default_cache(cache: HttpCache | None) -> HttpCache | None:
+    """Replace the process-wide cache (None = rebuild from settings); returns the old one."""
+    global _default
+    with _default_lock:
+        old, _default = _default, cache
+    return old
+
+
+def get(http, url: str, params: dict | None = None, timeout: float | None = None, source="default"):
+    return default_cache().get(http, url, params=params, timeout=timeout, source=source)
@@ -0,0 +1,225 @@
+"""
+Lightweight in-process metrics: counters, histograms and timers.
+
+    from src.utils.instrument import REGISTRY, timed, timer
+
+    with timer("tempo_stage_seconds", stage="features"):
+        ...
+
+    @timed("tempo_upstream_fetch_seconds", source="open_meteo")
+    def fetch(...): ...
+
+The API exposes the registry at /metrics in Prometheus text format; pipeline stages
+dump it as a JSON run report with `write_run_report`.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name, self.help = name, help
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in items]
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [{"labels": dict(k), "value": v} for k, v in sorted(self._values.items())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts..., sum, count]
+        self._series: dict[tuple, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            s = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def count(self, **labels) -> int:
+        s = self._series.get(_label_key(labels))
+        return int(s[-1]) if s else 0
+
+    def render(self) -> list[str]:
+        lines = []
+        with self._lock:
+            items = sorted((k, list(s)) for k, s in self._series.items())
+        for key, s in items:
+            for b, c in zip(self.buckets, s):
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, (('le', _fmt_value(b)),))} {c}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {s[-1]}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(s[-2])}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {s[-1]}")
+        return lines
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            items = sorted((k, list(s)) for k, s in self._series.items())
+        return [
+            {"labels": dict(k), "count": int(s[-1]), "sum": s[-2], "mean": s[-2] / s[-1]}
+            for k, s in items
+            if s[-1]
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, **kw):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kw)
+            elif not isinstance(metric, cls):
+                raise TypeError(f"metric {name!r} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        return {name: m.snapshot() for name, m in sorted(self._metrics.items())}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def timer(name: str, help: str = "", **labels):
+    """Observe the block's wall time (seconds) into histogram `name`."""
+    hist = REGISTRY.histogram(name, help)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        hist.observe(time.perf_counter() - t0, **labels)
+
+
+def timed(name: str, help: str = "", **labels):
+    """Decorator form of `timer`."""
+
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name, help, **labels):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+def count(name: str, value: float = 1.0, help: str = "", **labels) -> None:
+    REGISTRY.counter(name, help).inc(value, **labels)
+
+
+@contextmanager
+def run_stage(stage: str, reports_dir: str, **extra):
+    """Time a pipeline stage and write its JSON run report, even if the stage fails."""
+    status = "ok"
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        REGISTRY.histogram("tempo_stage_seconds", "Pipeline stage wall time").observe(
+            elapsed, stage=stage
+        )
+        path = write_run_report(stage, reports_dir, status=status, seconds=elapsed, **extra)
+        print(f"[INFO] Run report -> {path}")
+
+
+def write_run_report(stage: str, directory: str, **extra) -> str:
+    """Dump the registry (plus `extra` fields) to <directory>/<stage>_<utc stamp>.json."""
+    now = datetime.now(timezone.utc)
+    path = os.path.join(directory, f"{stage}_{now.strftime('%Y%m%dT%H%M%S%fZ')}.json")
+    os.makedirs(directory, exist_ok=True)
+    report = {
+        "stage": stage,
+        "finished_at": now.isoformat(),
+        **extra,
+        "metrics": REGISTRY.snapshot(),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    return path
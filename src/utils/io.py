@@ -2,20 +2,66 @@ from __future__ import annotations
 
 import json
 import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import datetime
 
-import pandas as pd
+from src.utils.instrument import timer
+from src.utils.lazy import lazy_import
 
+pd = lazy_import("pandas")
+pq = lazy_import("pyarrow.parquet")
+
+
+@contextmanager
+def atomic_write(path: str) -> Iterator[str]:
+    """Yield a temporary path next to `path`; it replaces `path` only if the block succeeds.
+
+    Readers polling `path` (e.g. the API artifact registry) never see a half-written file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # unique per thread too: thread pools (ingest, HTTP cache, run stages) may write the
+    # same path concurrently, and must not share (or remove) each other's temp file
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
-def save_parquet(df: pd.DataFrame, path: str) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    df.to_parquet(path, index=False)
+
+def save_parquet(df: pd.DataFrame, path: str, **kwargs) -> None:
+    """Atomic `df.to_parquet`; extra kwargs (e.g. row_group_size) go to pyarrow."""
+    with timer("tempo_parquet_write_seconds", "Parquet write time"), atomic_write(path) as tmp:
+        df.to_parquet(tmp, index=False, **kwargs)
 
 
 def load_parquet(path: str) -> pd.DataFrame:
     return pd.read_parquet(path)
 
 
+def read_parquet_tail(path: str, rows: int, columns=None) -> pd.DataFrame:
+    """
+    Last `rows` rows of a parquet file, reading only `columns` (those that exist) and
+    only the trailing row groups needed to cover them.
+    """
+    pf = pq.ParquetFile(path)
+    if columns is not None:
+        names = set(pf.schema_arrow.names)
+        columns = [c for c in columns if c in names]
+    groups, n = [], 0
+    for i in reversed(range(pf.num_row_groups)):
+        groups.append(i)
+        n += pf.metadata.row_group(i).num_rows
+        if n >= rows:
+            break
+    with timer("tempo_parquet_read_seconds", "Parquet read time"):
+        table = pf.read_row_groups(sorted(groups), columns=columns)
+    return table.to_pandas().tail(rows).reset_index(drop=True)
+
+
 def save_json(obj: dict, path: str) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "w", encoding="utf-8") as f:
@@ -0,0 +1,50 @@
+"""
+Deferred imports for heavy dependencies (pandas, pyarrow, scikit-learn, ...).
+
+    pd = lazy_import("pandas")      # nothing imported yet
+    pd.DataFrame(...)               # pandas is imported here, once
+
+Entry points (`uvicorn src.api.main:app`, `python -m src.pipelines.x --help`, test
+collection) then only pay for the libraries the code path actually touches.
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__.get("_lazy_module")
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__.get("_lazy_module")
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self) -> list[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if "_lazy_module" in self.__dict__ else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """The module itself if already imported, else a proxy importing it on first use."""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from src.utils.instrument import timer
+from src.utils.io import atomic_write, save_parquet
+from src.utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+WATERMARKS_FILE = "_watermarks.json"
+
+
+def _normalize(df: pd.DataFrame, location: str) -> pd.DataFrame:
+    """Fetchers return a time-indexed frame ('time' or 'datetime'); store a flat 'time' column."""
+    out = df.reset_index()
+    first = out.columns[0]
+    if "time" not in out.columns:
+        out = out.rename(columns={first: "time"})
+    out["time"] = pd.to_datetime(out["time"], utc=True)
+    out["location"] = location
+    return out
+
+
+class RawStore:
+    """
+    Append-only raw store, one parquet file per day:
+
+        <root>/source=<source>/location=<location>/date=YYYY-MM-DD/data.parquet
+
+    Writes merge new rows into the day file and dedupe on (time, location), keeping the
+    newest value (forecast hours get replaced by later fetches). A per-series
+    high-water mark — the latest non-future hour stored — tells the next run where to
+    resume, so hourly runs only fetch the new hours.
+    """
+
+    def __init__(self, root: str | os.PathLike):
+        self.root = str(root)
+        self._lock = threading.Lock()
+
+    # ---------- Paths ----------
+    def partition_path(self, source: str, location: str, day: str) -> str:
+        return f"{self.root}/source={source}/location={location}/date={day}/data.parquet"
+
+    def _watermarks_path(self) -> str:
+        return f"{self.root}/{WATERMARKS_FILE}"
+
+    # ---------- High-water marks ----------
+    def _read_watermarks(self) -> dict:
+        try:
+            with open(self._watermarks_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def watermark(self, source: str, location: str) -> pd.Timestamp | None:
+        raw = self._read_watermarks().get(f"{source}/{location}")
+        return pd.Timestamp(raw) if raw else None
+
+    def _set_watermark(self, source: str, location: str, ts: pd.Timestamp) -> None:
+        # read-modify-write under the lock: many locations are ingested concurrently
+        with self._lock:
+            marks = self._read_watermarks()
+            key = f"{source}/{location}"
+            if key not in marks or pd.Timestamp(marks[key]) < ts:
+                marks[key] = ts.isoformat()
+                with atomic_write(self._watermarks_path()) as tmp:
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        json.dump(marks, f, indent=2, sort_keys=True)
+
+    def locations(self, source: str) -> list[str]:
+        return sorted(
+            os.path.basename(p).split("=", 1)[1]
+            for p in glob.glob(f"{self.root}/source={source}/location=*")
+        )
+
+    def days(self, source: str, location: str) -> list[str]:
+        """YYYY-MM-DD of the day partitions stored for one series, oldest first."""
+        return sorted(
+            p.split("date=")[1][:10]
+            for p in glob.glob(f"{self.root}/source={source}/location={location}/date=*")
+        )
+
+    # ---------- Read / write ----------
+    def append(self, source: str, location: str, df: pd.DataFrame) -> int:
+        """Merge `df` into the day partitions; returns the number of new (time, location) rows."""
+        if df.empty:
+            return 0
+        rows = _normalize(df, location).dropna(subset=["time"])
+        added = 0
+        for day, part in rows.groupby(rows["time"].dt.strftime("%Y-%m-%d")):
+            path = self.partition_path(source, location, day)
+            old = pd.read_parquet(path) if os.path.exists(path) else None
+            merged = part if old is None else pd.concat([old, part], ignore_index=True)
+            merged = (
+                merged.drop_duplicates(subset=["time", "location"], keep="last")
+                .sort_values("time")
+                .reset_index(drop=True)
+            )
+            added += len(merged) - (0 if old is None else len(old))
+            save_parquet(merged, path)
+
+        now = pd.Timestamp(datetime.now(timezone.utc))
+        observed = rows.loc[rows["time"] <= now, "time"]
+        if not observed.empty:
+            self._set_watermark(source, location, observed.max())
+        return added
+
+    def read(
+        self,
+        source: str,
+        location: str | None = None,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> pd.DataFrame:
+        """
+        Concatenate a source's partitions, optionally for one location and within
+        [start, end). Only the day files overlapping the range are opened, so reading a
+        slice of a multi-year history costs the slice, not the history.
+        """
+        loc = location or "*"
+        paths = sorted(glob.glob(f"{self.root}/source={source}/location={loc}/date=*/data.parquet"))
+        if start is not None:
+            first_day = pd.Timestamp(start).strftime("%Y-%m-%d")
+            paths = [p for p in paths if p.split("date=")[1][:10] >= first_day]
+        if end is not None:
+            last_day = (pd.Timestamp(end) - pd.Timedelta(microseconds=1)).strftime("%Y-%m-%d")
+            paths = [p for p in paths if p.split("date=")[1][:10] <= last_day]
+        if not paths:
+            return pd.DataFrame()
+        with timer("tempo_parquet_read_seconds", "Parquet read time", source="raw_store"):
+            out = pd.concat([pd.read_parquet(p) for p in paths], ignore_index=True)
+        if start is not None:
+            out = out[out["time"] >= start]
+        if end is not None:
+            out = out[out["time"] < end]
+        return out.sort_values(["location", "time"]).reset_index(drop=True)
@@ -0,0 +1,98 @@
+"""
+Fixed-size streaming histograms of the model features, for drift detection.
+
+    reference = FeatureSketches.fit(X_train)     # decile edges + counts per feature
+    live = reference.empty()
+    live.update(new_rows)                        # bins stay fixed, memory stays O(bins)
+    live.decay(0.5)                              # halve the weight of what was seen so far
+    live.psi(reference)                          # {feature: population stability index}
+
+Edges are set once, from the training data; afterwards a sketch only holds one count
+per bin, so updating it costs a `searchsorted` over the new rows and never needs the
+rows seen before. Decaying the counts between updates turns them into a sliding view of
+the recent distribution.
+"""
+
+from __future__ import annotations
+
+from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+class FeatureSketches:
+    def __init__(self, edges: dict, counts: dict | None = None):
+        self.edges = {c: np.asarray(e, dtype="float64") for c, e in edges.items()}
+        self.counts = {
+            c: np.asarray(counts[c], dtype="float64") if counts else np.zeros(len(e) + 1)
+            for c, e in self.edges.items()
+        }
+
+    @classmethod
+    def fit(
+        cls,
+        X,
+        columns: list[str] | None = None,
+        bins: int = 10,
+        sample_rows: int = 100_000,
+        batch_rows: int = 65_536,
+    ) -> FeatureSketches:
+        """
+        Quantile edges from (a strided sample of) `X`, then counts over all of it.
+        `X` is a DataFrame or a 2-D array (memmaps are read `batch_rows` at a time).
+        """
+        columns = list(X.columns) if columns is None else list(columns)
+        values = X.to_numpy(dtype="float64") if hasattr(X, "columns") else X
+        sample = np.asarray(values[:: max(1, len(values) // sample_rows)], dtype="float64")
+        probs = np.linspace(0, 1, bins + 1)[1:-1]
+        edges = {}
+        for j, col in enumerate(columns):
+            finite = sample[:, j][np.isfinite(sample[:, j])]
+            edges[col] = np.unique(np.quantile(finite, probs)) if len(finite) else []
+        sketches = cls(edges)
+        for i in range(0, len(values), batch_rows):
+            sketches.update(values[i : i + batch_rows], columns)
+        return sketches
+
+    def empty(self) -> FeatureSketches:
+        return FeatureSketches(self.edges)
+
+    def update(self, X, columns: list[str] | None = None) -> int:
+        """Add the rows of `X` (DataFrame, or array with `columns`); returns rows added."""
+        if hasattr(X, "columns"):
+            columns = [c for c in X.columns if c in self.edges]
+            X = X[columns].to_numpy(dtype="float64")
+        X = np.asarray(X, dtype="float64")
+        for j, col in enumerate(columns):
+            if col not in self.edges:
+                continue
+            v = X[:, j][np.isfinite(X[:, j])]
+            idx = np.searchsorted(self.edges[col], v, side="right")
+            self.counts[col] += np.bincount(idx, minlength=len(self.edges[col]) + 1)
+        return len(X)
+
+    def decay(self, factor: float) -> None:
+        for c in self.counts.values():
+            c *= factor
+
+    def psi(self, reference: FeatureSketches, eps: float = 1e-4) -> dict[str, float]:
+        """Population stability index of each feature with counts, against `reference`."""
+        out = {}
+        for col, counts in self.counts.items():
+            ref = reference.counts.get(col)
+            if ref is None or counts.sum() <= 0 or ref.sum() <= 0:
+                continue
+            p = np.clip(counts / counts.sum(), eps, None)
+            q = np.clip(ref / ref.sum(), eps, None)
+            out[col] = float(((p - q) * np.log(p / q)).sum())
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            "edges": {c: e.tolist() for c, e in self.edges.items()},
+            "counts": {c: n.tolist() for c, n in self.counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> FeatureSketches:
+        return cls(raw["edges"], raw.get("counts"))
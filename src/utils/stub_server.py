@@ -0,0 +1,184 @@
+"""
+Local stand-in for the three upstream APIs (Open-Meteo weather, Open-Meteo air
+quality, OpenAQ v2 measurements), for offline tests and benchmarks.
+
+    python -m src.utils.stub_server --port 8765
+
+prints the environment variables that point the ingest pipeline at it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+WEATHER_PATH = "/v1/forecast"
+ARCHIVE_PATH = "/v1/archive"
+AIR_PATH = "/v1/air-quality"
+OPENAQ_PATH = "/v2/measurements"
+
+
+def _hours(params: dict) -> list[datetime]:
+    if "start_hour" in params:
+        start = datetime.fromisoformat(params["start_hour"][0]).replace(tzinfo=timezone.utc)
+        end = datetime.fromisoformat(params["end_hour"][0]).replace(tzinfo=timezone.utc)
+        n = int((end - start).total_seconds() // 3600) + 1
+        return [start + timedelta(hours=i) for i in range(n)]
+    if "start_date" in params:
+        # whole days, end_date included
+        start = datetime.fromisoformat(params["start_date"][0]).replace(tzinfo=timezone.utc)
+        end = datetime.fromisoformat(params["end_date"][0]).replace(tzinfo=timezone.utc)
+        n = ((end - start).days + 1) * 24
+        return [start + timedelta(hours=i) for i in range(n)]
+    past = int(params.get("past_days", ["7"])[0])
+    future = int(params.get("forecast_days", ["0"])[0])
+    end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=past)
+    n = (past + future) * 24
+    return [start + timedelta(hours=i) for i in range(n)]
+
+
+def _wave(i: int, lat: float, base: float, amp: float) -> float:
+    # deterministic daily cycle, shifted by latitude so locations differ
+    return round(base + amp * math.sin((i + lat) * 2 * math.pi / 24), 3)
+
+
+def weather_payload(params: dict) -> dict:
+    lat = float(params.get("latitude", ["0"])[0])
+    hours = _hours(params)
+    return {
+        "hourly": {
+            "time": [h.strftime("%Y-%m-%dT%H:%M") for h in hours],
+            "temperature_2m": [_wave(i, lat, 15, 6) for i in range(len(hours))],
+            "relative_humidity_2m": [_wave(i, lat, 65, 15) for i in range(len(hours))],
+            "pressure_msl": [_wave(i, lat, 1013, 4) for i in range(len(hours))],
+            "wind_speed_10m": [_wave(i, lat, 12, 5) for i in range(len(hours))],
+            "wind_direction_10m": [(i * 15) % 360 for i in range(len(hours))],
+        }
+    }
+
+
+def air_payload(params: dict) -> dict:
+    lat = float(params.get("latitude", ["0"])[0])
+    hours = _hours(params)
+    n = len(hours)
+    return {
+        "hourly": {
+            "time": [h.strftime("%Y-%m-%dT%H:%M") for h in hours],
+            "pm2_5": [_wave(i, lat, 12, 5) for i in range(n)],
+            "pm10": [_wave(i, lat, 20, 8) for i in range(n)],
+            "nitrogen_dioxide": [_wave(i, lat, 30, 12) for i in range(n)],
+            "ozone": [_wave(i, lat, 60, 20) for i in range(n)],
+            "carbon_monoxide": [_wave(i, lat, 200, 40) for i in range(n)],
+            "sulphur_dioxide": [_wave(i, lat, 3, 1) for i in range(n)],
+        }
+    }
+
+
+def openaq_payload(params: dict, total_rows: int) -> dict:
+    """Paginated measurements: `total_rows` rows split in pages of `limit`."""
+    lat = float(params.get("coordinates", ["0,0"])[0].split(",")[0])
+    limit = int(params.get("limit", ["100"])[0])
+    page = int(params.get("page", ["1"])[0])
+    end_ts = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if "date_from" in params:
+        since = datetime.fromisoformat(params["date_from"][0])
+        hours_back = int((end_ts - since).total_seconds() // 3600) + 1
+        total_rows = min(total_rows, max(hours_back, 0) * 2)
+    start = (page - 1) * limit
+    results = []
+    for i in range(start, min(start + limit, total_rows)):
+        hour, param = divmod(i, 2)
+        ts = end_ts - timedelta(hours=hour)
+        name = ("pm25", "no2")[param]
+        results.append(
+            {
+                "locationId": 1,
+                "location": "stub",
+                "parameter": name,
+                "value": _wave(hour, lat, 12 if name == "pm25" else 30, 5),
+                "date": {"utc": ts.isoformat(), "local": ts.isoformat()},
+                "unit": "µg/m³",
+                "coordinates": {"latitude": lat, "longitude": 0.0},
+            }
+        )
+    return {"meta": {"found": total_rows, "page": page, "limit": limit}, "results": results}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real upstreams
+    openaq_rows = 0
+    latency_sec = 0.0
+
+    def do_GET(self):  # noqa: N802 (http.server naming)
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query)
+        if parts.path in (WEATHER_PATH, ARCHIVE_PATH):
+            body = weather_payload(params)
+        elif parts.path == AIR_PATH:
+            body = air_payload(params)
+        elif parts.path == OPENAQ_PATH:
+            body = openaq_payload(params, self.openaq_rows)
+        else:
+            self.send_error(404)
+            return
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        raw = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(
+    port: int = 0, openaq_rows: int = 0, latency_sec: float = 0.0
+) -> tuple[ThreadingHTTPServer, str]:
+    """Serve in a daemon thread; returns (server, base_url). Call `server.shutdown()` to stop."""
+    handler = type(
+        "Handler", (StubHandler,), {"openaq_rows": openaq_rows, "latency_sec": latency_sec}
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stub_urls(base_url: str) -> dict[str, str]:
+    """Config overrides (env var name -> URL) pointing the pipelines at the stub."""
+    return {
+        "OPEN_METEO_BASE_URL": f"{base_url}{WEATHER_PATH}",
+        "OPEN_METEO_AIR_BASE_URL": f"{base_url}{AIR_PATH}",
+        "OPEN_METEO_ARCHIVE_URL": f"{base_url}{ARCHIVE_PATH}",
+        "OPENAQ_BASE_URL": f"{base_url}/v2",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake upstream APIs locally.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--openaq-rows", type=int, default=0, help="0 = OpenAQ returns nothing")
+    parser.add_argument("--latency", type=float, default=0.0, help="added seconds per response")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.openaq_rows, args.latency)
+    for name, url in stub_urls(base_url).items():
+        print(f"export {name}={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
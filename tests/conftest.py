@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_http_cache(tmp_path_factory):
+    """Each test gets an empty upstream response cache instead of data/cache/http."""
+    from src.utils import http_cache
+
+    cache = http_cache.HttpCache(str(tmp_path_factory.mktemp("http_cache")))
+    previous = http_cache.set_default_cache(cache)
+    yield cache
+    http_cache.set_default_cache(previous)
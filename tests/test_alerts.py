@@ -0,0 +1,94 @@
+def _table(values: dict, origin="2025-01-01T00:00"):
+    import pandas as pd
+
+    origin = pd.Timestamp(origin, tz="UTC")
+    frames = [
+        pd.DataFrame(
+            {
+                "location": loc,
+                "issue_time": origin,
+                "origin_time": origin,
+                "time": origin + pd.to_timedelta(range(1, len(v) + 1), unit="h"),
+                "y_pred": [float(x) for x in v],
+            }
+        )
+        for loc, v in values.items()
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_sustained_rules_with_hysteresis_emit_only_changes():
+    from src.pipelines.alerts import AlertRule, _empty_active, step
+
+    rules = [
+        AlertRule("r1", 50, subscriber="alice", clear_threshold=40, min_hours=2, horizon_hours=4),
+        AlertRule("r2", 30, subscriber="bob", locations=("lyon",), horizon_hours=2),
+    ]
+    active = _empty_active()
+
+    # paris: 2 consecutive hours >= 50 -> raise; lyon: one spike only, r1 needs 2 hours
+    active, events = step(
+        rules,
+        _table({"paris": [10, 55, 60, 20, 99], "lyon": [20, 51, 20, 20]}),
+        active,
+        "2025-01-01",
+    )
+    assert sorted(zip(events["rule_id"], events["location"], events["event"])) == [
+        ("r1", "paris", "raised"),
+        ("r2", "lyon", "raised"),
+    ]
+    raised = events.set_index("rule_id").loc["r1"]
+    assert raised["peak"] == 60 and str(raised["onset"]) == "2025-01-01 02:00:00"
+
+    # paris drops under the threshold but stays above the clear level: no event
+    active, events = step(
+        rules,
+        _table({"paris": [45, 42, 10, 10], "lyon": [40, 40, 0, 0]}),
+        active,
+        "2025-01-01T01:00",
+    )
+    assert events.empty
+    assert set(active["rule_id"] + "/" + active["location"]) == {"r1/paris", "r2/lyon"}
+
+    # below the clear level (and lyon's window) -> cleared
+    active, events = step(
+        rules,
+        _table({"paris": [39, 10, 10, 10], "lyon": [0, 0, 0, 99]}),
+        active,
+        "2025-01-01T02:00",
+    )
+    assert sorted(events["event"]) == ["cleared", "cleared"]
+    assert active.empty
+
+
+def test_step_with_nothing_firing_is_a_no_op():
+    from src.pipelines.alerts import AlertRule, _empty_active, step
+
+    rules = [
+        AlertRule("low", 500, subscriber="alice"),
+        AlertRule("pm", 10, subscriber="bob", pollutant="pm25"),
+        AlertRule("nowhere", 10, subscriber="carol", locations=("marseille",)),
+    ]
+    active, events = step(rules, _table({"paris": [10, 20, 30]}), _empty_active(), "2025-01-01")
+    assert active.empty and events.empty
+
+
+def test_run_alerts_keeps_state_between_runs(tmp_path, monkeypatch):
+    import pandas as pd
+
+    import src.config as cfg
+    from src.pipelines import alerts
+
+    monkeypatch.setattr(cfg, "FORECASTS_DIR", str(tmp_path / "forecasts"))
+    (tmp_path / "forecasts").mkdir()
+    rules = [alerts.AlertRule("high", 50)]
+    _table({"a": [60] * 3, "b": [10] * 3}).to_parquet(
+        tmp_path / "forecasts" / "forecast_20250101T000000Z.parquet"
+    )
+    first = alerts.run_alerts(rules, str(tmp_path / "alerts"))
+    again = alerts.run_alerts(rules, str(tmp_path / "alerts"))
+
+    assert list(first["location"]) == ["a"] and again.empty
+    assert len(list((tmp_path / "alerts" / "events").glob("*.parquet"))) == 1
+    active = pd.read_parquet(tmp_path / "alerts" / "active.parquet")
+    assert list(active["location"]) == ["a"]
@@ -1,8 +1,333 @@
+import pytest
 from fastapi.testclient import TestClient
 from src.api.main import app
 
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    """Tiny model + features on disk, served through a fresh registry."""
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import RandomForestRegressor
+
+    from src.api import main
+    from src.api.registry import ArtifactRegistry, ForecastTable
+
+    rng = np.random.default_rng(0)
+    n = 120
+    feats = pd.DataFrame(
+        {
+            "time": pd.date_range("2025-01-01", periods=n, freq="h", tz="UTC"),
+            "temperature_2m": rng.normal(15, 3, n),
+            "no2": rng.normal(30, 10, n),
+            "no2_lag1": rng.normal(30, 10, n),
+        }
+    )
+    feats["y_next_24h"] = feats["no2"] * 4
+    feats.to_parquet(tmp_path / "features.parquet", index=False)
+    X = feats[["temperature_2m", "no2", "no2_lag1"]]
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, feats["y_next_24h"])
+    joblib.dump(model, tmp_path / "model.pkl")
+
+    reg = ArtifactRegistry(str(tmp_path / "model.pkl"), str(tmp_path / "features.parquet"))
+    monkeypatch.setattr(main, "registry", reg)
+    monkeypatch.setattr(main, "forecast_table", ForecastTable(str(tmp_path / "forecasts")))
+    return reg
+
+
 def test_health_ok():
     client = TestClient(app)
     r = client.get("/health")
     assert r.status_code == 200
     assert r.json()["status"] == "ok"
+
+
+def test_registry_reloads_on_change(tmp_path):
+    import os
+
+    import joblib
+    import pandas as pd
+    from sklearn.dummy import DummyRegressor
+
+    from src.api.registry import ArtifactRegistry
+
+    feats = pd.DataFrame(
+        {"time": pd.date_range("2025-01-01", periods=4, freq="h", tz="UTC"), "no2": [1.0, 2, 3, 4]}
+    )
+    feats["y_next_24h"] = feats["no2"]
+    feats.to_parquet(tmp_path / "features.parquet", index=False)
+    joblib.dump(DummyRegressor(constant=1.0).fit([[0]], [1.0]), tmp_path / "model.pkl")
+
+    reg = ArtifactRegistry(str(tmp_path / "model.pkl"), str(tmp_path / "features.parquet"))
+    first = reg.get()
+    assert reg.get() is first
+    assert list(first.X.columns) == ["no2"]
+
+    joblib.dump(DummyRegressor(constant=2.0).fit([[0]], [2.0]), tmp_path / "model.pkl")
+    os.utime(tmp_path / "model.pkl", ns=(0, 1))
+    second = reg.get()
+    assert second is not first
+    assert second.version != first.version
+    assert reg.info()["version"] == second.version
+
+
+def test_forecast_batch_matches_single_and_reports_item_errors(artifacts):
+    client = TestClient(app)
+    single = client.post("/forecast", json={"lat": 48.85, "lon": 2.35, "horizon_hours": 6}).json()
+    r = client.post(
+        "/forecast/batch",
+        json={
+            "items": [
+                {"lat": 48.85, "lon": 2.35, "horizon_hours": 6},
+                {"lat": 45.76, "lon": 4.83, "horizon_hours": 24},
+                {"lat": 123.0, "lon": 2.35},
+            ]
+        },
+    )
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert results[0]["items"] == single["items"]
+    assert len(results[1]["items"]) == 24
+    assert results[2] == {"index": 2, "error": "lat/lon out of range"}
+
+
+def test_forecast_rejects_invalid_request(artifacts):
+    client = TestClient(app)
+    r = client.post("/forecast", json={"lat": 48.85, "lon": 2.35, "horizon_hours": 0})
+    assert r.status_code == 422 and r.json()["detail"] == "horizon_hours must be >= 1"
+    r = client.post("/forecast", json={"lat": 91, "lon": 2.35})
+    assert r.status_code == 422 and r.json()["detail"] == "lat/lon out of range"
+
+
+def test_forecast_batch_rejects_empty_batch(artifacts):
+    r = TestClient(app).post("/forecast/batch", json={"items": []})
+    assert r.status_code == 422
+
+
+def test_forecast_served_from_precomputed_table_with_etag(artifacts, tmp_path, monkeypatch):
+    from src.api import main
+    from src.pipelines import features, predict
+
+    client = TestClient(app)
+    body = {"lat": 48.85, "lon": 2.35, "horizon_hours": 12}
+    live = client.post("/forecast", json=body).json()
+
+    monkeypatch.setattr(features, "LATEST_FEATURES_PATH", str(tmp_path / "features.parquet"))
+    monkeypatch.setattr(predict, "MODELS_DIR", tmp_path)
+    monkeypatch.setattr(predict, "FORECASTS_DIR", str(tmp_path / "forecasts"))
+    predict.batch_predict()
+    assert main.forecast_table.get() is not None
+
+    r = client.post("/forecast", json=body)
+    assert r.status_code == 200
+    assert r.json()["items"] == live["items"]
+    etag = r.headers["etag"]
+
+    again = client.post("/forecast", json=body, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    since = client.post(
+        "/forecast", json=body, headers={"If-Modified-Since": r.headers["last-modified"]}
+    )
+    assert since.status_code == 304
+    other = client.post(
+        "/forecast", json={**body, "horizon_hours": 6}, headers={"If-None-Match": etag}
+    )
+    assert other.status_code == 200
+
+
+def test_multi_horizon_model_serves_trajectory_from_latest_row(tmp_path, monkeypatch):
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import RandomForestRegressor
+
+    from src.api import main
+    from src.api.registry import ArtifactRegistry, ForecastTable
+    from src.pipelines import features, predict
+
+    n = 60
+    feats = pd.DataFrame(
+        {
+            "time": pd.date_range("2025-01-01", periods=n, freq="h", tz="UTC"),
+            "no2": np.linspace(10, 70, n),
+        }
+    )
+    Y = np.column_stack([feats["no2"] + h for h in (1, 2, 3)])
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(feats[["no2"]], Y)
+    model.lead_hours_ = [1, 2, 3]
+    joblib.dump(model, tmp_path / "model.pkl")
+    feats.tail(3).to_parquet(tmp_path / "latest.parquet", index=False)
+
+    reg = ArtifactRegistry(
+        str(tmp_path / "model.pkl"),
+        str(tmp_path / "none.parquet"),
+        None,
+        str(tmp_path / "latest.parquet"),
+    )
+    monkeypatch.setattr(main, "registry", reg)
+    monkeypatch.setattr(main, "forecast_table", ForecastTable(str(tmp_path / "forecasts")))
+    client = TestClient(app)
+    body = {"lat": 48.85, "lon": 2.35, "horizon_hours": 2}
+    live = client.post("/forecast", json=body).json()["items"]
+    assert [r["time"] for r in live] == ["2025-01-03T12:00:00+00:00", "2025-01-03T13:00:00+00:00"]
+    expected = model.predict(feats[["no2"]].tail(1))[0, :2]
+    np.testing.assert_allclose([r["forecast"] for r in live], expected)
+
+    batch = client.post("/forecast/batch", json={"items": [body]}).json()
+    assert batch["results"][0]["items"] == live
+
+    monkeypatch.setattr(features, "LATEST_FEATURES_PATH", str(tmp_path / "latest.parquet"))
+    monkeypatch.setattr(predict, "MODELS_DIR", tmp_path)
+    monkeypatch.setattr(predict, "FORECASTS_DIR", str(tmp_path / "forecasts"))
+    predict.batch_predict()
+    assert client.post("/forecast", json=body).json()["items"] == live
+
+
+def test_forecast_content_negotiation(artifacts):
+    import io
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    client = TestClient(app)
+    body = {"lat": 48.85, "lon": 2.35, "horizon_hours": 8}
+    rows = client.post("/forecast", json=body).json()["items"]
+
+    cols = client.post(
+        "/forecast", json=body, headers={"Accept": "application/vnd.tempo.columnar+json"}
+    )
+    assert cols.headers["content-type"].startswith("application/vnd.tempo.columnar+json")
+    assert cols.json()["time"] == [r["time"] for r in rows]
+    assert cols.json()["forecast"] == [r["forecast"] for r in rows]
+
+    arrow = client.post(
+        "/forecast", json=body, headers={"Accept": "application/vnd.apache.arrow.stream"}
+    )
+    table = pa.ipc.open_stream(arrow.content).read_all()
+    assert table.column("forecast").to_pylist() == [r["forecast"] for r in rows]
+
+    parquet = client.post(
+        "/forecast",
+        json=body,
+        headers={"Accept": "application/vnd.apache.parquet;q=0.9, */*;q=0.1"},
+    )
+    assert pq.read_table(io.BytesIO(parquet.content)).num_rows == 8
+
+
+def test_forecast_carries_quantile_bands(artifacts, monkeypatch):
+    import pyarrow as pa
+
+    from src.api import main
+
+    client = TestClient(app)
+    body = {"lat": 48.85, "lon": 2.35, "horizon_hours": 6}
+    rows = client.post("/forecast", json=body).json()["items"]
+    assert all(r["p10"] <= r["p50"] <= r["p90"] for r in rows)
+    arrow = client.post(
+        "/forecast", json=body, headers={"Accept": "application/vnd.apache.arrow.stream"}
+    )
+    table = pa.ipc.open_stream(arrow.content).read_all()
+    assert table.column("p90").to_pylist() == [r["p90"] for r in rows]
+
+    monkeypatch.setattr(main, "FORECAST_QUANTILES", ())
+    plain = client.post("/forecast", json={**body, "horizon_hours": 5}).json()["items"]
+    assert set(plain[0]) == {"time", "forecast", "alert"}
+
+
+def test_metrics_endpoint_exposes_request_and_predict_timings(artifacts):
+    client = TestClient(app)
+    client.post("/forecast", json={"lat": 48.85, "lon": 2.35, "horizon_hours": 4})
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    assert 'tempo_http_request_seconds_count{method="POST",path="/forecast",status="200"}' in r.text
+    assert 'tempo_predict_seconds_bucket{component="forecast"' in r.text
+    assert "tempo_model_load_seconds" in r.text
+
+
+def test_inference_pool_coalesces_identical_calls_and_rejects_when_full():
+    import asyncio
+    import threading
+
+    from src.api.serving import InferencePool, Overloaded
+
+    calls, release = [], threading.Event()
+
+    def slow(x):
+        calls.append(x)
+        release.wait(5)
+        return x * 2
+
+    async def scenario():
+        pool = InferencePool(workers=1, max_pending=1)
+        same = [asyncio.ensure_future(pool.run("k", slow, 21)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(Overloaded):
+            await pool.run("other", slow, 1)
+        release.set()
+        results = await asyncio.gather(*same)
+        pool.shutdown()
+        return results, pool.pending
+
+    results, pending = asyncio.run(scenario())
+    assert results == [42] * 5
+    assert calls == [21]
+    assert pending == 0
+
+
+def test_forecast_answers_503_when_inference_queue_is_full(artifacts, monkeypatch):
+    from src.api import main
+    from src.api.serving import InferencePool
+
+    monkeypatch.setattr(main, "inference", InferencePool(workers=1, max_pending=0))
+    r = TestClient(app).post("/forecast", json={"lat": 48.85, "lon": 2.35, "horizon_hours": 6})
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "1"
+
+
+def test_forecast_resolves_coordinates_to_nearest_location(tmp_path, monkeypatch):
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import RandomForestRegressor
+
+    from src.api import main
+    from src.api.registry import ArtifactRegistry, ForecastTable
+    from src.utils.geo import LocationIndex, record_locations
+
+    times = pd.date_range("2025-01-01", periods=24, freq="h", tz="UTC")
+    feats = pd.concat(
+        [
+            pd.DataFrame({"time": times, "location": "paris", "no2": np.full(24, 10.0)}),
+            pd.DataFrame({"time": times, "location": "lyon", "no2": np.full(24, 50.0)}),
+        ]
+    )
+    feats["y_next_24h"] = feats["no2"]
+    feats.to_parquet(tmp_path / "features.parquet", index=False)
+    model = RandomForestRegressor(n_estimators=5, random_state=0)
+    joblib.dump(model.fit(feats[["no2"]], feats["y_next_24h"]), tmp_path / "model.pkl")
+    record_locations(
+        str(tmp_path / "locations.json"), {"paris": (48.85, 2.35), "lyon": (45.76, 4.83)}
+    )
+
+    reg = ArtifactRegistry(str(tmp_path / "model.pkl"), str(tmp_path / "features.parquet"))
+    monkeypatch.setattr(main, "registry", reg)
+    monkeypatch.setattr(main, "forecast_table", ForecastTable(str(tmp_path / "forecasts")))
+    monkeypatch.setattr(main, "locations", LocationIndex(str(tmp_path / "locations.json"), {}))
+    client = TestClient(app)
+
+    near_lyon = client.post("/forecast", json={"lat": 45.7, "lon": 4.9, "horizon_hours": 3}).json()
+    near_paris = client.post("/forecast", json={"lat": 48.9, "lon": 2.3, "horizon_hours": 3}).json()
+    assert near_lyon["location"] == "lyon" and near_paris["location"] == "paris"
+    assert [r["forecast"] for r in near_lyon["items"]] == [50.0] * 3
+    assert [r["forecast"] for r in near_paris["items"]] == [10.0] * 3
+
+    # halfway between the two, an inverse-distance blend of both
+    monkeypatch.setattr(main, "GEO_NEIGHBOURS", 2)
+    mid = client.post("/forecast", json={"lat": 47.3, "lon": 3.6, "horizon_hours": 3}).json()
+    assert 10.0 < mid["items"][0]["forecast"] < 50.0
+    batch = client.post(
+        "/forecast/batch", json={"items": [{"lat": 47.3, "lon": 3.6, "horizon_hours": 3}]}
+    ).json()
+    assert batch["results"][0]["items"] == mid["items"]
@@ -0,0 +1,65 @@
+from src.pipelines.backtest import walk_forward_folds
+
+
+def test_walk_forward_folds_leave_a_gap_before_each_test_block():
+    folds = walk_forward_folds(100, n_folds=3, test_size=10, gap=5)
+    assert [f.test for f in folds] == [(70, 80), (80, 90), (90, 100)]
+    assert [f.train for f in folds] == [(0, 65), (0, 75), (0, 85)]
+    sliding = walk_forward_folds(100, n_folds=3, test_size=10, mode="sliding", gap=5)
+    assert [f.train for f in sliding] == [(0, 65), (10, 75), (20, 85)]
+
+
+def test_backtest_leaderboard_and_fold_cache(tmp_path):
+    import numpy as np
+    import pandas as pd
+
+    from src.pipelines import backtest
+
+    n = 150
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "time": pd.date_range("2025-01-01", periods=n, freq="h", tz="UTC"),
+            "no2": rng.normal(30, 5, n),
+        }
+    )
+    df["y_next_1h"] = df["no2"].shift(-1)
+    df["y_next_2h"] = df["no2"].shift(-2)
+    grid = {"n_estimators": [5], "max_depth": [2, 4]}
+
+    board = backtest.run_backtest(df, grid, n_folds=3, workers=2, directory=str(tmp_path))
+    assert list(board["rank"]) == [1, 2]
+    assert (board["folds"] == 3).all()
+    assert board["RMSE_mean"].is_monotonic_increasing
+    assert len(list((tmp_path / "cells").glob("*.json"))) == 6
+
+    # a wider grid only fits the new cells
+    grid["max_depth"].append(6)
+    again = backtest.run_backtest(df, grid, n_folds=3, workers=2, directory=str(tmp_path))
+    assert len(again) == 3
+    assert len(list((tmp_path / "cells").glob("*.json"))) == 9
+    kept = again.set_index("params").loc[board["params"], "RMSE_mean"]
+    np.testing.assert_allclose(kept.to_numpy(), board["RMSE_mean"].to_numpy())
+
+
+def test_time_folds_keep_targets_out_of_test_windows_across_locations():
+    import numpy as np
+    import pandas as pd
+
+    from src.pipelines.backtest import time_folds
+
+    hours = pd.date_range("2025-01-01", periods=120, freq="h")
+    # two locations per hour, sorted by time
+    times = np.repeat(hours.to_numpy(), 2)
+    folds = time_folds(times, n_folds=3, test_hours=10, gap_hours=6)
+
+    for fold in folds:
+        (a, b), (c, d) = fold.train, fold.test
+        test_start, test_end = times[c], times[d - 1]
+        # the last training row's target (6h ahead) stays before the test window
+        assert times[b - 1] + np.timedelta64(6, "h") < test_start
+        # whole hours, both locations
+        assert (
+            (d - c) == 20 and times[c - 1] < test_start and (d == len(times) or times[d] > test_end)
+        )
+    assert [f.test for f in folds] == [(180, 200), (200, 220), (220, 240)]
@@ -0,0 +1,28 @@
+from benchmarks.synthetic import AQ_COLS, WEATHER_COLS, make_series, write_raw_store
+
+
+def test_synthetic_series_shape():
+    weather, aq = make_series(days=3, seed=1)
+    assert len(weather) == len(aq) == 72
+    assert tuple(weather.columns) == WEATHER_COLS
+    assert tuple(aq.columns) == AQ_COLS
+    assert weather.index.tz is not None
+    assert (aq >= 0).all().all()
+
+
+def test_synthetic_raw_store(tmp_path):
+    from src.utils.raw_store import RawStore
+
+    names = write_raw_store(str(tmp_path), days=2, locations=3)
+    store = RawStore(tmp_path)
+    assert store.locations("weather") == names
+    assert len(store.read("air_quality")) == 3 * 48
+
+
+def test_entry_points_import_without_heavy_deps_or_disk_writes():
+    from benchmarks.startup import profile_import
+
+    for module in ("src.config", "src.api.main", "src.pipelines.train"):
+        result = profile_import(module, runs=1)
+        assert result["side_effects"] == []
+        assert not {"pandas", "sklearn", "pyarrow"} & set(result["heavy_modules"])
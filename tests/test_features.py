@@ -1,5 +1,237 @@
 from src.pipelines.features import build_features
 
+
 def test_build_features_runs():
     target = build_features()
     assert target in ("no2", "pm25", None)
+
+
+def test_incremental_features_match_full_recompute(tmp_path, monkeypatch):
+    import numpy as np
+    import pandas as pd
+
+    from src.pipelines import features
+    from src.utils.raw_store import RawStore
+
+    monkeypatch.setattr(features, "FEATURE_PARTS_DIR", str(tmp_path / "parts"))
+    monkeypatch.setattr(features, "FEATURE_STATE_PATH", str(tmp_path / "state.parquet"))
+    monkeypatch.setattr(features, "LATEST_FEATURES_PATH", str(tmp_path / "latest.parquet"))
+    store = RawStore(tmp_path / "store")
+
+    times = pd.date_range("2025-01-01", periods=80, freq="h", tz="UTC", name="time")
+    rng = np.random.default_rng(0)
+    meteo = pd.DataFrame({"temperature_2m": rng.normal(15, 3, 80)}, index=times)
+    aq = pd.DataFrame({"no2": rng.normal(30, 5, 80), "pm25": rng.normal(12, 2, 80)}, index=times)
+
+    store.append("weather", "paris", meteo.iloc[:60])
+    store.append("air_quality", "paris", aq.iloc[:60])
+    first = features.build_features_incremental(store=store)
+    store.append("weather", "paris", meteo.iloc[60:])
+    store.append("air_quality", "paris", aq.iloc[60:])
+    second = features.build_features_incremental(store=store)
+    assert features.build_features_incremental(store=store) == 0
+
+    # 80 hours, minus 6 of lookback, minus 48 hours without a known 48h target
+    assert first + second == 80 - 6 - 48
+    assert second == 20
+
+    inc = features.read_features(str(tmp_path / "missing.parquet"), str(tmp_path / "parts"))
+    full, _ = features._add_features(meteo.join(aq), ("no2", "pm25"))
+    full = full.dropna()
+    # the store keeps float32 columns
+    np.testing.assert_allclose(inc[full.columns].to_numpy(), full.to_numpy(), rtol=1e-6)
+    assert features.target_columns(inc)[:2] == ["y_next_1h", "y_next_2h"]
+
+    # the forecast frontier keeps the newest rows, up to the last observed hour
+    latest = features.read_latest_features()
+    assert latest["time"].max() == times[-1]
+    assert not features.target_columns(latest)
+
+
+def test_incremental_features_impute_a_gap_like_the_full_build(tmp_path, monkeypatch):
+    import numpy as np
+    import pandas as pd
+
+    from src.pipelines import features
+    from src.utils.raw_store import RawStore
+
+    monkeypatch.setattr(features, "FEATURE_PARTS_DIR", str(tmp_path / "parts"))
+    monkeypatch.setattr(features, "FEATURE_STATE_PATH", str(tmp_path / "state.parquet"))
+    monkeypatch.setattr(features, "LATEST_FEATURES_PATH", str(tmp_path / "latest.parquet"))
+    store = RawStore(tmp_path / "store")
+
+    times = pd.date_range("2025-01-01", periods=160, freq="h", tz="UTC", name="time")
+    rng = np.random.default_rng(1)
+    meteo = pd.DataFrame({"temperature_2m": rng.normal(15, 3, 160)}, index=times)
+    aq = pd.DataFrame({"no2": rng.normal(30, 5, 160)}, index=times)
+    # an outage: hours 70..79 never arrive
+    seen = np.r_[0:70, 80:160]
+
+    store.append("weather", "paris", meteo.iloc[seen[:70]])
+    store.append("air_quality", "paris", aq.iloc[seen[:70]])
+    features.build_features_incremental(store=store)
+    store.append("weather", "paris", meteo.iloc[seen[70:]])
+    store.append("air_quality", "paris", aq.iloc[seen[70:]])
+    features.build_features_incremental(store=store)
+
+    inc = features.read_features(str(tmp_path / "missing.parquet"), str(tmp_path / "parts"))
+    # the full build: hourly spine, then the same imputation
+    hourly = meteo.join(aq).iloc[seen].asfreq("1h").interpolate(limit=3).ffill().bfill()
+    full, _ = features._add_features(hourly, ("no2", "pm25"))
+    full = full.dropna()
+    assert list(inc["time"]) == list(full.index)
+    np.testing.assert_allclose(inc[full.columns].to_numpy(), full.to_numpy(), rtol=1e-6)
+
+
+def test_feature_store_compact_dtypes_and_pushdown(tmp_path, monkeypatch):
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    import src.config as cfg
+    from src.pipelines import features
+
+    monkeypatch.setattr(cfg, "FEATURE_ROW_GROUP_ROWS", 24)
+    times = pd.date_range("2025-01-01", periods=96, freq="h", tz="UTC")
+    df = pd.DataFrame(
+        {
+            "time": list(times) * 2,
+            "location": ["lyon"] * 96 + ["paris"] * 96,
+            "no2": range(192),
+            "temperature_2m": 15.0,
+            "y_next_1h": 1.0,
+        }
+    ).astype({"no2": "float64"})
+    path = str(tmp_path / "features.parquet")
+    features.write_features(df, path)
+    assert pq.ParquetFile(path).num_row_groups == 8
+
+    out = features.read_features(
+        path, None, columns=["no2"], start="2025-01-02", end=times[30], targets=False
+    )
+    assert list(out.columns) == ["time", "location", "no2"]
+    assert out["no2"].dtype == "float32"
+    assert out["location"].dtype == "category"
+    assert len(out) == 2 * 6
+    assert out["time"].is_monotonic_increasing
+
+
+def test_read_features_labels_the_full_build_as_default_location(tmp_path):
+    import pandas as pd
+
+    from src.pipelines import features
+
+    times = pd.date_range("2025-01-01", periods=4, freq="h", tz="UTC")
+    full = pd.DataFrame({"time": times[:2], "no2": [1.0, 2.0], "y_next_1h": 1.0})
+    features.write_features(full, str(tmp_path / "features.parquet"))
+    part = pd.DataFrame(
+        {"time": times[2:], "location": "lyon", "no2": [3.0, 4.0], "y_next_1h": 1.0}
+    )
+    features.write_features(part, str(tmp_path / "parts" / "part-00001.parquet"))
+
+    df = features.read_features(str(tmp_path / "features.parquet"), str(tmp_path / "parts"))
+    assert list(df["location"].astype(str)) == ["default", "default", "lyon", "lyon"]
+    assert df["location"].notna().all()
+
+
+def test_feature_spec_matches_pandas_shift_and_rolling():
+    import numpy as np
+    import pandas as pd
+
+    from src.pipelines.feature_spec import ColumnGroup, FeatureSpec
+
+    times = pd.date_range("2025-01-06", periods=50, freq="h", tz="UTC")
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(
+        {
+            "no2": rng.normal(30, 5, 50),
+            "o3": rng.normal(60, 9, 50),
+            "wind_speed_10m": 10.0,
+            "wind_direction_10m": 90.0,
+        },
+        index=times,
+    )
+    df.iloc[20, 0] = np.nan
+    spec = FeatureSpec(
+        groups=(
+            ColumnGroup(
+                ("no2", "o3", "co"), lags=(1, 3), windows=(4,), aggs=("mean", "std", "max")
+            ),
+        ),
+        calendar=True,
+        wind=("wind_speed_10m", "wind_direction_10m"),
+    )
+    out = spec.apply(df)
+    assert spec.lookback == 4
+    assert list(out.columns[:5]) == [
+        "no2_lag1",
+        "no2_lag3",
+        "no2_roll4_mean",
+        "no2_roll4_std",
+        "no2_roll4_max",
+    ]
+    for col in ("no2", "o3"):
+        pd.testing.assert_series_equal(out[f"{col}_lag3"], df[col].shift(3), check_names=False)
+        roll = df[col].rolling(4)
+        for agg in ("mean", "std", "max"):
+            np.testing.assert_allclose(out[f"{col}_roll4_{agg}"], getattr(roll, agg)(), rtol=1e-9)
+    assert "co_lag1" not in out.columns
+    np.testing.assert_allclose(out[["wind_u", "wind_v"]].iloc[0], [-10.0, 0.0], atol=1e-9)
+    assert out["hour_sin"].iloc[6] == 1.0 and out["dow_cos"].iloc[0] == 1.0  # Monday 00:00
+
+
+def test_backfill_chunks_match_a_full_build(tmp_path):
+    import numpy as np
+    import pandas as pd
+
+    from src.pipelines import features
+    from src.utils.raw_store import RawStore
+
+    store = RawStore(tmp_path / "store")
+    times = pd.date_range("2024-01-01", periods=24 * 9, freq="h", tz="UTC", name="time")
+    rng = np.random.default_rng(1)
+    meteo = pd.DataFrame({"temperature_2m": rng.normal(15, 3, len(times))}, index=times)
+    aq = pd.DataFrame({"no2": rng.normal(30, 5, len(times))}, index=times)
+    store.append("weather", "paris", meteo)
+    store.append("air_quality", "paris", aq)
+
+    out = tmp_path / "history"
+    added = features.build_features_backfill(chunk_days=2, store=store, out_dir=str(out))
+    parts = sorted((out / "location=paris").glob("part-*.parquet"))
+    # the first two-day chunk cannot complete a 48h target yet
+    assert len(parts) == 4
+    hist = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+    assert hist["time"].is_unique and hist["time"].is_monotonic_increasing
+
+    full, _ = features._add_features(meteo.join(aq), ("no2", "pm25"))
+    full = full.dropna()
+    assert added == len(full) == len(hist)
+    np.testing.assert_allclose(hist[full.columns].to_numpy(), full.to_numpy(), rtol=1e-6)
+
+
+def test_backfill_across_an_empty_chunk_matches_a_full_build(tmp_path):
+    import numpy as np
+    import pandas as pd
+
+    from src.pipelines import features
+    from src.utils.raw_store import RawStore
+
+    store = RawStore(tmp_path / "store")
+    times = pd.date_range("2024-01-01", periods=24 * 10, freq="h", tz="UTC", name="time")
+    rng = np.random.default_rng(2)
+    meteo = pd.DataFrame({"temperature_2m": rng.normal(15, 3, len(times))}, index=times)
+    aq = pd.DataFrame({"no2": rng.normal(30, 5, len(times))}, index=times)
+    # days 4-5 (the third two-day chunk) are missing from the store
+    seen = np.r_[0 : 24 * 4, 24 * 6 : 24 * 10]
+    store.append("weather", "paris", meteo.iloc[seen])
+    store.append("air_quality", "paris", aq.iloc[seen])
+
+    out = tmp_path / "history"
+    features.build_features_backfill(chunk_days=2, store=store, out_dir=str(out))
+    parts = sorted((out / "location=paris").glob("part-*.parquet"))
+    hist = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+
+    hourly = meteo.join(aq).iloc[seen].asfreq("1h").interpolate(limit=3).ffill().bfill()
+    full, _ = features._add_features(hourly, ("no2", "pm25"))
+    full = full.dropna()
+    assert list(hist["time"]) == list(full.index)
+    np.testing.assert_allclose(hist[full.columns].to_numpy(), full.to_numpy(), rtol=1e-6)
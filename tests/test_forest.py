@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from src.utils.forest import export_forest, load_forest, load_model, predict_intervals
+
+
+def test_compact_forest_matches_sklearn_predict(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 5)), columns=list("abcde"))
+    Y = np.column_stack([X["a"] * 2 + X["b"] ** 2, X["c"] - X["d"], X["e"]])
+
+    for y, leads in ((Y, [1, 2, 3]), (Y[:, 0], None)):
+        model = RandomForestRegressor(n_estimators=20, random_state=0).fit(X, y)
+        if leads:
+            model.lead_hours_ = leads
+        path = export_forest(model, str(tmp_path / "model.forest"))
+        forest = load_forest(path)
+
+        X_new = pd.DataFrame(rng.normal(size=(50, 5)), columns=list("abcde"))
+        np.testing.assert_array_equal(forest.predict(X_new), model.predict(X_new))
+        # columns are matched by name, as sklearn does
+        np.testing.assert_array_equal(forest.predict(X_new[list("edcba")]), model.predict(X_new))
+        assert isinstance(forest.value, np.memmap)
+        assert getattr(forest, "lead_hours_", None) == leads
+
+
+def test_load_model_ignores_stale_export(tmp_path):
+    import os
+
+    import joblib
+
+    X, y = np.arange(20.0).reshape(-1, 1), np.arange(20.0)
+    model = RandomForestRegressor(n_estimators=3, random_state=0).fit(X, y)
+    export_forest(model, str(tmp_path / "model.forest"))
+    joblib.dump(model, tmp_path / "model.pkl")
+    os.utime(tmp_path / "model.forest", ns=(0, 0))
+
+    assert isinstance(
+        load_model(str(tmp_path / "model.pkl"), str(tmp_path / "model.forest")),
+        RandomForestRegressor,
+    )
+    os.utime(tmp_path / "model.forest")
+    compact = load_model(str(tmp_path / "model.pkl"), str(tmp_path / "model.forest"))
+    np.testing.assert_array_equal(compact.predict(X), model.predict(X))
+
+
+def test_predict_intervals_match_per_tree_quantiles(tmp_path):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(200, 3)), columns=list("abc"))
+    Y = np.column_stack([X["a"] + rng.normal(size=200), X["b"] * 3])
+    model = RandomForestRegressor(n_estimators=15, random_state=0).fit(X, Y)
+    forest = load_forest(export_forest(model, str(tmp_path / "model.forest")))
+
+    X_new = pd.DataFrame(rng.normal(size=(40, 3)), columns=list("abc"))
+    point, bands = forest.predict_intervals(X_new, (0.1, 0.5, 0.9))
+    np.testing.assert_array_equal(point, model.predict(X_new))
+    # the naive way: one predict per tree
+    per_tree = np.stack([est.predict(X_new.to_numpy()) for est in model.estimators_])
+    np.testing.assert_allclose(bands, np.quantile(per_tree, (0.1, 0.5, 0.9), axis=0))
+    assert bands.shape == (3, 40, 2)
+
+    # a pickled forest gets the same bands; other models only a point forecast
+    np.testing.assert_allclose(predict_intervals(model, X_new, (0.1, 0.5, 0.9))[1], bands)
+    linear = LinearRegression().fit(X, Y)
+    assert predict_intervals(linear, X_new, (0.1, 0.5, 0.9))[1] is None
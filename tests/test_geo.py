@@ -0,0 +1,44 @@
+import random
+
+from src.utils.geo import GridIndex, LocationIndex, haversine_km, record_locations
+
+
+def test_grid_nearest_matches_brute_force():
+    rng = random.Random(0)
+    points = {f"p{i}": (rng.uniform(-70, 70), rng.uniform(-180, 180)) for i in range(500)}
+    index = GridIndex.build(points, cell_deg=1.0)
+    for _ in range(300):
+        lat, lon = rng.uniform(-89, 89), rng.uniform(-180, 180)
+        expected = sorted(points, key=lambda n: haversine_km(lat, lon, *points[n]))[:3]
+        assert [name for name, _ in index.nearest(lat, lon, k=3)] == expected
+    # across the antimeridian
+    near = GridIndex.build({"fiji": (-17.7, 178.1), "tonga": (-21.1, -175.2), "x": (0, 0)})
+    assert near.nearest(-18.0, 179.9, k=2)[0][0] == "fiji"
+
+
+def test_idw_weights_and_restriction():
+    index = GridIndex.build({"a": (48.0, 2.0), "b": (48.0, 4.0), "c": (10.0, 10.0)})
+    w = dict(index.weights(48.0, 2.5, k=2))
+    assert set(w) == {"a", "b"} and abs(sum(w.values()) - 1) < 1e-12
+    assert w["a"] > w["b"]
+    assert index.weights(48.0, 2.0, k=2) == [("a", 1.0)]  # on top of a point
+    assert index.nearest(48.0, 2.0, k=1, allowed={"c"})[0][0] == "c"
+
+
+def test_extended_index_leaves_previous_untouched():
+    base = GridIndex.build({"a": (48.0, 2.0)})
+    more = base.extended({"b": (45.0, 5.0), "a": (48.0, 2.0)})
+    assert len(base) == 1 and len(more) == 2
+    moved = more.extended({"a": (45.1, 5.1)})
+    assert moved.nearest(45.1, 5.1)[0][0] == "a"
+    assert more.nearest(45.1, 5.1)[0][0] == "b"
+
+
+def test_location_index_follows_the_registry_file(tmp_path):
+    path = str(tmp_path / "locations.json")
+    locations = LocationIndex(path, {"default": (48.85, 2.35)})
+    assert locations.get().nearest(45.7, 4.8)[0][0] == "default"
+    record_locations(path, {"lyon": (45.76, 4.83)})
+    first = locations.get()
+    assert first.nearest(45.7, 4.8)[0][0] == "lyon"
+    assert locations.get() is first  # unchanged file: same index
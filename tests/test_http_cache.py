@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+
+def _stub(monkeypatch):
+    from src.pipelines import ingest
+    from src.utils.stub_server import start_stub_server, stub_urls
+
+    server, base_url = start_stub_server(openaq_rows=48)
+    for name, url in stub_urls(base_url).items():
+        monkeypatch.setattr(ingest, name, url)
+    return ingest, server
+
+
+def test_cache_key_ignores_param_order():
+    from src.utils.http_cache import cache_key
+
+    a = cache_key("HTTPS://Api.example.com/v1", {"b": 2, "a": [1, 3]})
+    b = cache_key("https://api.example.com/v1", {"a": [1, 3], "b": "2"})
+    assert a == b
+    assert a != cache_key("https://api.example.com/v1", {"a": 1, "b": 2})
+
+
+def test_replay_serves_cached_responses_offline(tmp_path, monkeypatch):
+    from src.utils import http_cache
+
+    cache = http_cache.HttpCache(str(tmp_path))
+    http_cache.set_default_cache(cache)
+    ingest, server = _stub(monkeypatch)
+    try:
+        live = ingest.fetch_openmeteo(48.85, 2.35, days=1)
+    finally:
+        server.shutdown()
+
+    cache.mode = "replay"
+    replayed = ingest.fetch_openmeteo(48.85, 2.35, days=1)  # server is down
+    assert replayed.equals(live)
+    assert list(tmp_path.glob("*/*.json.gz"))
+    with pytest.raises(http_cache.CacheMiss):
+        ingest.fetch_openmeteo(48.85, 2.35, days=2)
+
+
+def test_ttl_expiry_refetches(tmp_path):
+    import requests
+
+    from src.utils import http_cache
+
+    calls = []
+
+    class Http:
+        def get(self, url, params=None, timeout=None):
+            calls.append(url)
+            resp = requests.Response()
+            resp.status_code, resp.url, resp._content = 200, url, b'{"n": %d}' % len(calls)
+            return resp
+
+    cache = http_cache.HttpCache(str(tmp_path), ttls={"fast": 0, "slow": 3600})
+    assert cache.get(Http(), "http://x/slow", source="slow").json() == {"n": 1}
+    assert cache.get(Http(), "http://x/slow", source="slow").json() == {"n": 1}
+    assert cache.get(Http(), "http://x/fast", source="fast").json() == {"n": 2}
+    assert cache.get(Http(), "http://x/fast", source="fast").json() == {"n": 3}
+    assert len(calls) == 3
+
+
+def test_lru_eviction_keeps_recent_entries(tmp_path):
+    import requests
+
+    from src.utils.http_cache import HttpCache, cache_key
+
+    class Http:
+        def get(self, url, params=None, timeout=None):
+            resp = requests.Response()
+            resp.status_code, resp.url, resp._content = 200, url, os.urandom(4000)
+            return resp
+
+    cache = HttpCache(str(tmp_path), max_bytes=20_000)
+    for i in range(10):
+        cache.get(Http(), f"http://x/{i}")
+    files = list(tmp_path.glob("*/*.json.gz"))
+    assert 0 < len(files) < 10
+    assert sum(f.stat().st_size for f in files) <= 20_000
+    # the newest entry survived, the oldest did not
+    assert cache.load(cache_key("http://x/9"))
+    assert cache.load(cache_key("http://x/0")) is None
@@ -4,3 +4,132 @@ def test_openmeteo_fetch_ok():
     df = fetch_openmeteo(48.8566, 2.3522, 1)
     assert df is not None
     assert df.shape[0] > 0
+
+
+def test_ingest_many_against_stub(tmp_path, monkeypatch):
+    from src.pipelines import ingest
+    from src.utils.stub_server import start_stub_server, stub_urls
+
+    server, base_url = start_stub_server(openaq_rows=50)
+    try:
+        for name, url in stub_urls(base_url).items():
+            monkeypatch.setattr(ingest, name, url)
+        monkeypatch.setattr(ingest, "RAW_DIR", tmp_path)
+        monkeypatch.setattr(ingest, "LOCATIONS_PATH", str(tmp_path / "locations.json"))
+        locs = [ingest.parse_location("paris=48.85,2.35"), ingest.Location("Lyon", 45.76, 4.83)]
+        results = ingest.ingest_many(locs, workers=2, days=1)
+    finally:
+        server.shutdown()
+
+    assert sorted(r["location"] for r in results) == ["lyon", "paris"]
+    assert all(r["meteo_rows"] == 72 and r["aq_rows"] > 0 for r in results)
+    assert list((tmp_path / "locations" / "paris").glob("openmeteo_*.parquet"))
+    assert list((tmp_path / "locations" / "lyon").glob("air_quality_*.parquet"))
+    from src.utils.geo import read_locations
+
+    assert read_locations(str(tmp_path / "locations.json"))["lyon"] == (45.76, 4.83)
+
+
+def test_incremental_ingest_only_adds_new_hours(tmp_path, monkeypatch):
+    from src.pipelines import ingest
+    from src.utils.http import make_session
+    from src.utils.raw_store import RawStore
+    from src.utils.stub_server import start_stub_server, stub_urls
+
+    server, base_url = start_stub_server(openaq_rows=500)
+    try:
+        for name, url in stub_urls(base_url).items():
+            monkeypatch.setattr(ingest, name, url)
+        store = RawStore(tmp_path)
+        loc = ingest.Location("paris", 48.85, 2.35)
+        with make_session() as session:
+            first = ingest.ingest_location_incremental(loc, session, days=2, store=store)
+            second = ingest.ingest_location_incremental(loc, session, days=2, store=store)
+    finally:
+        server.shutdown()
+
+    assert first["aq_new"] > 0 and first["meteo_new"] > 0
+    # second run only re-asks the overlap window, all of it already stored
+    assert second["meteo_rows"] < first["meteo_rows"]
+    assert second["aq_new"] == 0
+    weather = store.read("weather", "paris")
+    assert not weather.duplicated(subset=["time", "location"]).any()
+    assert store.watermark("weather", "paris") is not None
+
+
+def test_openaq_page_sums_combine_across_pages():
+    import pandas as pd
+
+    from src.pipelines.ingest import _openaq_page_sums
+
+    rows = [
+        {"parameter": "no2", "value": 10, "date": {"utc": "2025-01-01T00:10:00+00:00"}},
+        {"parameter": "no2", "value": 20, "date": {"utc": "2025-01-01T00:10:00+00:00"}},
+        {"parameter": "pm25", "value": 5.5, "date_utc": "2025-01-01T01:00:00Z", "unit": "x"},
+        {"parameter": "no2", "value": None, "date": {"utc": "2025-01-01T01:00:00+00:00"}},
+        {"parameter": "no2", "value": 40, "date": None},
+    ]
+    whole = _openaq_page_sums(rows)
+    paged = _openaq_page_sums(rows[:1]).add(_openaq_page_sums(rows[1:]), fill_value=0)
+    pd.testing.assert_frame_equal(whole, paged, check_dtype=False)
+    assert whole.loc[(pd.Timestamp("2025-01-01T00:10", tz="UTC"), "no2"), "sum"] == 30
+    assert whole["count"].sum() == 3
+
+
+def test_openaq_page_sums_drop_malformed_rows_only():
+    import pandas as pd
+
+    from src.pipelines.ingest import _openaq_page_sums
+
+    rows = [
+        {"parameter": "no2", "value": 10, "date": {"utc": "2025-01-01T00:00:00+00:00"}},
+        {"parameter": "no2", "value": "n/a", "date": {"utc": "2025-01-01T00:00:00+00:00"}},
+        {"parameter": "no2", "value": 30, "date": "2025-01-01T00:00:00+00:00"},
+        {"parameter": "pm25", "value": "4.5", "date_utc": "2025-01-01T00:00:00Z"},
+    ]
+    sums = _openaq_page_sums(rows)
+    t = pd.Timestamp("2025-01-01", tz="UTC")
+    assert sums.loc[(t, "no2"), "sum"] == 10 and sums.loc[(t, "no2"), "count"] == 1
+    assert sums.loc[(t, "pm25"), "sum"] == 4.5
+
+
+def test_fetch_openaq_against_stub(monkeypatch):
+    from src.pipelines import ingest
+    from src.utils.stub_server import start_stub_server, stub_urls
+
+    server, base_url = start_stub_server(openaq_rows=96)
+    try:
+        monkeypatch.setattr(ingest, "OPENAQ_BASE_URL", stub_urls(base_url)["OPENAQ_BASE_URL"])
+        df = ingest.fetch_openaq(48.85, 2.35, days=2)
+    finally:
+        server.shutdown()
+    assert sorted(df.columns) == ["no2", "pm25"]
+    assert len(df) == 48
+
+
+def test_backfill_fills_the_store_chunk_by_chunk(tmp_path, monkeypatch):
+    from datetime import datetime, timezone
+
+    from src.pipelines import ingest
+    from src.utils.http import make_session
+    from src.utils.raw_store import RawStore
+    from src.utils.stub_server import start_stub_server, stub_urls
+
+    server, base_url = start_stub_server()
+    try:
+        for name, url in stub_urls(base_url).items():
+            monkeypatch.setattr(ingest, name, url)
+        store = RawStore(tmp_path)
+        loc = ingest.Location("paris", 48.85, 2.35)
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        end = datetime(2024, 1, 11, tzinfo=timezone.utc)
+        with make_session() as session:
+            out = ingest.backfill_location(loc, session, start, end, chunk_days=4, store=store)
+    finally:
+        server.shutdown()
+
+    assert out["chunks"] == 3
+    assert out["meteo_new"] == out["aq_new"] == 240
+    days = store.days("weather", "paris")
+    assert (days[0], days[-1], len(days)) == ("2024-01-01", "2024-01-10", 10)
+    assert len(store.read("air_quality", "paris", start=start, end=start.replace(day=3))) == 48
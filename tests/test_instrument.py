@@ -0,0 +1,18 @@
+from src.utils.instrument import MetricsRegistry
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    reg = MetricsRegistry()
+    hist = reg.histogram("demo_seconds", "demo latency", buckets=(0.1, 1.0))
+    hist.observe(0.05, stage="a")
+    hist.observe(0.5, stage="a")
+    reg.counter("demo_rows_total").inc(3, stage="a")
+    reg.counter("demo_rows_total").inc(2, stage="a")
+
+    text = reg.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{stage="a"} 2' in text
+    assert 'demo_rows_total{stage="a"} 5.0' in text
+    assert reg.snapshot()["demo_seconds"][0]["count"] == 2
@@ -0,0 +1,42 @@
+def test_read_parquet_tail_reads_trailing_row_groups_and_columns(tmp_path):
+    import pandas as pd
+
+    from src.utils.io import read_parquet_tail
+
+    df = pd.DataFrame({"time": range(100), "no2": range(100), "other": range(100)})
+    df.to_parquet(tmp_path / "f.parquet", index=False, row_group_size=10)
+
+    tail = read_parquet_tail(str(tmp_path / "f.parquet"), 15, ("time", "no2", "missing"))
+    assert list(tail.columns) == ["time", "no2"]
+    assert tail["time"].tolist() == list(range(85, 100))
+    assert len(read_parquet_tail(str(tmp_path / "f.parquet"), 500)) == 100
+
+
+def test_atomic_write_from_concurrent_threads(tmp_path):
+    import threading
+
+    from src.utils.io import atomic_write
+
+    path = str(tmp_path / "shared.txt")
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def write(i):
+        try:
+            with atomic_write(path) as tmp:
+                with open(tmp, "w") as f:
+                    f.write(str(i) * 1000)
+                    # every thread holds its temp file at the same time
+                    barrier.wait(timeout=5)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    content = open(path).read()
+    assert len(content) == 1000 and len(set(content)) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["shared.txt"]
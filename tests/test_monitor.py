@@ -0,0 +1,71 @@
+def test_compute_metrics_matches_sklearn():
+    import numpy as np
+    from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+    from src.utils.metrics import compute_metrics
+
+    rng = np.random.default_rng(0)
+    y, p = rng.normal(30, 5, 500), rng.normal(30, 5, 500)
+    m = compute_metrics(y, p)
+    assert np.isclose(m["MAE"], mean_absolute_error(y, p))
+    assert np.isclose(m["RMSE"], np.sqrt(mean_squared_error(y, p)))
+
+
+def test_monitor_scores_new_observations_once_and_flags_drift(tmp_path, monkeypatch):
+    import numpy as np
+    import pandas as pd
+
+    import src.config as cfg
+    from src.pipelines import features, monitor
+    from src.utils.raw_store import RawStore
+    from src.utils.sketch import FeatureSketches
+
+    monkeypatch.setattr(cfg, "FORECASTS_DIR", str(tmp_path / "forecasts"))
+    monkeypatch.setattr(cfg, "FEATURE_SKETCH_PATH", str(tmp_path / "sketch.json"))
+    monkeypatch.setattr(cfg, "MONITOR_WINDOWS_DAYS", (1, 7))
+    monkeypatch.setattr(features, "LATEST_FEATURES_PATH", str(tmp_path / "latest.parquet"))
+    store = RawStore(tmp_path / "store")
+
+    origin = pd.Timestamp("2025-01-01T00:00", tz="UTC")
+    times = origin + pd.to_timedelta(range(1, 5), unit="h")
+    obs = pd.DataFrame({"no2": [30.0, 31.0, 32.0, 33.0]}, index=times.rename("time"))
+    # forecast at lead h is off by +h
+    table = pd.DataFrame(
+        {
+            "location": "paris",
+            "issue_time": origin,
+            "origin_time": origin,
+            "time": times,
+            "y_pred": obs["no2"].to_numpy() + np.arange(1, 5),
+        }
+    )
+    (tmp_path / "forecasts").mkdir()
+    table.to_parquet(tmp_path / "forecasts" / "forecast_20250101T000000Z.parquet")
+
+    rng = np.random.default_rng(0)
+    reference = FeatureSketches.fit(pd.DataFrame({"no2": rng.normal(30, 5, 5000)}))
+    from src.utils.io import save_json
+
+    save_json(reference.to_dict(), cfg.FEATURE_SKETCH_PATH)
+    pd.DataFrame({"time": times, "location": "paris", "no2": rng.normal(60, 5, 4)}).to_parquet(
+        tmp_path / "latest.parquet"
+    )
+
+    out = str(tmp_path / "monitor")
+    now = origin + pd.Timedelta(hours=5)
+    store.append("air_quality", "paris", obs.iloc[:2])
+    first = monitor.run_monitor(store, out, now)
+    store.append("air_quality", "paris", obs.iloc[2:])
+    second = monitor.run_monitor(store, out, now)
+    third = monitor.run_monitor(store, out, now)
+
+    assert (first["pairs_scored"], second["pairs_scored"], third["pairs_scored"]) == (2, 2, 0)
+    by_lead = second["windows"]["1d"]["by_lead"]
+    assert {h: by_lead[h]["MAE"] for h in by_lead} == {1: 1.0, 2: 2.0, 3: 3.0, 4: 4.0}
+    assert second["windows"]["7d"]["overall"]["bias"] == 2.5
+    assert second["windows"]["7d"]["overall"]["n"] == 4
+    assert first["drift"]["drifted"] == ["no2"]
+    # the same feature rows are not counted twice
+    assert second["drift"]["rows_added"] == 0
+    accuracy = pd.read_parquet(tmp_path / "monitor" / "accuracy.parquet")
+    assert len(accuracy) == 8
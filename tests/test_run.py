@@ -0,0 +1,63 @@
+import threading
+
+from src.pipelines.run import Stage, load_manifest, run_pipeline
+
+
+def _dag(tmp_path, calls, fail_b=False):
+    src, a_out, b_out = tmp_path / "input.txt", tmp_path / "a.txt", tmp_path / "b.txt"
+
+    def a():
+        calls.append("a")
+        a_out.write_text(src.read_text().upper())
+
+    def b():
+        calls.append("b")
+        if fail_b:
+            raise RuntimeError("boom")
+        b_out.write_text(a_out.read_text() * 2)
+
+    return [
+        Stage("a", a, inputs=lambda: [str(src)], outputs=(str(a_out),)),
+        Stage("b", b, deps=("a",), inputs=lambda: [str(a_out)], outputs=(str(b_out),)),
+    ]
+
+
+def test_skips_fresh_stages_and_reruns_on_input_change(tmp_path):
+    manifest = str(tmp_path / "manifest.json")
+    (tmp_path / "input.txt").write_text("x")
+    calls = []
+    assert run_pipeline(_dag(tmp_path, calls), manifest) == {"a": "ran", "b": "ran"}
+    assert run_pipeline(_dag(tmp_path, calls), manifest) == {"a": "skipped", "b": "skipped"}
+    assert calls == ["a", "b"]
+
+    (tmp_path / "input.txt").write_text("y")
+    assert run_pipeline(_dag(tmp_path, calls), manifest, dry_run=True) == {
+        "a": "stale",
+        "b": "stale",
+    }
+    assert run_pipeline(_dag(tmp_path, calls), manifest) == {"a": "ran", "b": "ran"}
+    assert run_pipeline(_dag(tmp_path, calls), manifest, force=["b"])["b"] == "ran"
+
+
+def test_resumes_after_failure(tmp_path):
+    manifest = str(tmp_path / "manifest.json")
+    (tmp_path / "input.txt").write_text("x")
+    calls = []
+    assert run_pipeline(_dag(tmp_path, calls, fail_b=True), manifest) == {
+        "a": "ran",
+        "b": "failed",
+    }
+    assert load_manifest(manifest)["stages"]["b"]["status"] == "error"
+    assert run_pipeline(_dag(tmp_path, calls), manifest) == {"a": "skipped", "b": "ran"}
+    assert calls == ["a", "b", "b"]
+
+
+def test_independent_stages_run_in_parallel(tmp_path):
+    barrier = threading.Barrier(2, timeout=5)  # breaks unless both leaves run at once
+    stages = [
+        Stage("left", barrier.wait),
+        Stage("right", barrier.wait),
+        Stage("join", lambda: None, deps=("left", "right")),
+    ]
+    status = run_pipeline(stages, str(tmp_path / "manifest.json"), workers=2)
+    assert status == {"left": "ran", "right": "ran", "join": "ran"}
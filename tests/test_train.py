@@ -0,0 +1,34 @@
+def test_out_of_core_arrays_split_on_time(tmp_path):
+    import numpy as np
+    import pandas as pd
+
+    from src.pipelines import features, train
+
+    paths = []
+    for i, loc in enumerate(("lyon", "paris")):
+        times = pd.date_range("2024-01-01", periods=100, freq="h", tz="UTC")
+        df = pd.DataFrame(
+            {
+                "time": times,
+                "location": loc,
+                "no2": np.arange(100.0) + i,
+                "temperature_2m": 15.0,
+                "y_next_2h": np.arange(100.0) + 2,
+                "y_next_1h": np.arange(100.0) + 1,
+            }
+        )
+        df.loc[5, "y_next_1h"] = np.nan
+        paths.append(str(tmp_path / f"{loc}.parquet"))
+        features.write_features(df, paths[-1])
+
+    X, Y, cols, targets, n_train = train.stream_arrays(
+        paths, str(tmp_path / "arrays"), batch_rows=16
+    )
+    assert cols == ["no2", "temperature_2m"]
+    assert targets == ["y_next_1h", "y_next_2h"]
+    assert X.dtype == np.float32 and X.shape == (198, 2)
+    assert isinstance(X, np.memmap)
+    # 80% of the 99h span: hours 0..79 train (one row per file without a target)
+    assert n_train == 2 * 80 - 2
+    assert (X[:n_train, 0] < 81).all() and (X[n_train:, 0] >= 80).all()
+    np.testing.assert_array_equal(Y[:, 1] - Y[:, 0], 1.0)